@@ -0,0 +1,340 @@
+"""Incrementally maintained company-year aggregate tables.
+
+One SQLite store (the tables live next to the watermarks, so rows and offsets
+commit together) replaces the ``generate_scores.py -> fix_scores.py ->
+analyse_scores.py`` chain:
+
+- ``agg_labels``: one row per classified sentence, keyed by ``custom_id``, with
+  the CSV columns it counts towards as a bitmask over ``COLUMNS``,
+- ``agg_sentiment_counts``: ``company_year_sentiment_counts.csv``,
+- ``agg_pos_minus_neg``: ``company_year_pos_minus_neg.csv`` plus an ``all_zero``
+  flag for the rows of ``entries_all_zero_1_17.csv``.
+
+A ``custom_id`` counts once, with the labels of its last labelled row in
+``merged_classifications.jsonl``; the warehouse views apply the same rule.
+Upserts are idempotent: a sentence seen again with the same labels changes
+nothing, and only the company-years whose labels changed are recomputed from
+``agg_labels``. ``replace`` swaps in all rows of one report at once.
+
+New rows are parsed in chunks on a process pool (``WORKERS``, ``CHUNK_ROWS``);
+chunks are folded in in file order, so the last row of a ``custom_id`` wins
+however the pool schedules them.
+
+Usage:
+    python src/analysis/aggregate_store.py             # fold new merged results in, export CSVs
+    python src/analysis/aggregate_store.py --rebuild   # start over from the merged results
+    python src/analysis/aggregate_store.py --check     # compare the store with the original counting loop
+"""
+
+import csv
+import json
+import os
+import sys
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from typing import Iterable, List, Set, Tuple
+
+from tqdm import tqdm
+
+from src.analysis import parsing
+from src.analysis.labels import (COLUMNS, RESULTS_JSONL, core_is_malformed, extract_company_year,
+                                 normalize_sentiment, row_labels)
+from src.utils.file_utils import iter_jsonl
+from src.utils.watermarks import Watermarks
+
+RESULTS_DIR = os.path.join("src", "classification", "results")
+COUNTS_CSV = os.path.join(RESULTS_DIR, "company_year_sentiment_counts.csv")
+DIFF_CSV = os.path.join(RESULTS_DIR, "company_year_pos_minus_neg.csv")
+ALL_ZERO_CSV = os.path.join(RESULTS_DIR, "entries_all_zero_1_17.csv")
+CONSUMER = "aggregate_store"
+CHUNK_ROWS = 20000             # rows per map task
+WORKERS = os.cpu_count() or 1  # map processes; 1 parses in-process
+
+DIFF_COLUMNS = [c for c in COLUMNS if c != "0"]
+ZERO_COLUMNS = [c for c in DIFF_COLUMNS if c != "AI"]  # SDGs 1..17
+BITS = {c: 1 << i for i, c in enumerate(COLUMNS)}
+
+
+def _q(c: str) -> str:
+    return f'"{c}"'
+
+
+def label_mask(columns) -> int:
+    mask = 0
+    for c in columns:
+        mask |= BITS[c]
+    return mask
+
+
+def label_record(row: dict):
+    """``(custom_id, company, year, sentiment, mask)`` of a merged row, or ``(skip_reason, None)``."""
+    key, columns = row_labels(row)
+    if columns is None:
+        return key, None
+    return (row.get("custom_id"),) + key + (label_mask(columns),), columns
+
+
+class AggregateStore:
+    """Materialized sentiment counts, POS-NEG diffs and all-zero flags per company-year.
+
+    Args:
+        conn: SQLite connection; the tables are created if missing. Nothing is
+            committed here, callers commit together with their watermark.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        conn.executescript(f"""
+            CREATE TABLE IF NOT EXISTS agg_labels (
+                custom_id TEXT PRIMARY KEY,
+                company TEXT,
+                year TEXT,
+                sentiment TEXT,
+                mask INTEGER
+            );
+            CREATE INDEX IF NOT EXISTS agg_labels_cy ON agg_labels (company, year);
+            CREATE TABLE IF NOT EXISTS agg_sentiment_counts (
+                company TEXT, year TEXT, sentiment TEXT,
+                {", ".join(f"{_q(c)} INTEGER" for c in COLUMNS)},
+                PRIMARY KEY (company, year, sentiment)
+            );
+            CREATE TABLE IF NOT EXISTS agg_pos_minus_neg (
+                company TEXT, year TEXT,
+                {", ".join(f"{_q(c)} INTEGER" for c in DIFF_COLUMNS)},
+                all_zero INTEGER,
+                PRIMARY KEY (company, year)
+            );
+        """)
+
+    def clear(self) -> None:
+        for table in ("agg_labels", "agg_sentiment_counts", "agg_pos_minus_neg"):
+            self.conn.execute(f"DELETE FROM {table}")
+
+    # ---------------- Writes ----------------
+    def upsert(self, rows: Iterable[dict]) -> Set[Tuple[str, str]]:
+        """Store the labels of merged classification rows; return the company-years that changed.
+
+        Aggregates are not refreshed here, see ``refresh``.
+        """
+        records = (label_record(row) for row in rows)
+        return self.upsert_labels(record for record, columns in records if columns is not None)
+
+    def upsert_labels(self, records: Iterable[tuple]) -> Set[Tuple[str, str]]:
+        """Store ``label_record`` tuples in order, later ones winning; return the changed company-years."""
+        dirty = set()
+        for custom_id, company, year, sentiment, mask in records:
+            new = (company, year, sentiment, mask)
+            old = self.conn.execute(
+                "SELECT company, year, sentiment, mask FROM agg_labels WHERE custom_id = ?", (custom_id,)).fetchone()
+            if old == new:
+                continue
+            self.conn.execute("INSERT OR REPLACE INTO agg_labels VALUES (?, ?, ?, ?, ?)", (custom_id,) + new)
+            if old is not None:
+                dirty.add(old[:2])
+            dirty.add((company, year))
+        return dirty
+
+    def refresh(self, company_years: Iterable[Tuple[str, str]]) -> None:
+        """Recompute the aggregates of ``company_years`` from their stored labels."""
+        counts = ", ".join(f"SUM((mask >> {i}) & 1)" for i in range(len(COLUMNS)))
+        diffs = ", ".join(
+            f"SUM(CASE WHEN sentiment = 'Positive' THEN {_q(c)} ELSE -{_q(c)} END)" for c in DIFF_COLUMNS)
+        all_zero = " AND ".join(f"{_q(c)} = 0" for c in ZERO_COLUMNS)
+        for company, year in company_years:
+            args = (company, year)
+            self.conn.execute("DELETE FROM agg_sentiment_counts WHERE company = ? AND year = ?", args)
+            self.conn.execute("DELETE FROM agg_pos_minus_neg WHERE company = ? AND year = ?", args)
+            self.conn.execute(
+                f"INSERT INTO agg_sentiment_counts SELECT company, year, sentiment, {counts}"
+                f" FROM agg_labels WHERE company = ? AND year = ? GROUP BY sentiment", args)
+            self.conn.execute(
+                f"INSERT INTO agg_pos_minus_neg SELECT company, year, {diffs}, 0"
+                f" FROM agg_sentiment_counts WHERE company = ? AND year = ? GROUP BY company, year", args)
+            self.conn.execute(
+                f"UPDATE agg_pos_minus_neg SET all_zero = ({all_zero}) WHERE company = ? AND year = ?", args)
+
+    def replace(self, company: str, year, rows: Iterable[dict]) -> None:
+        """Make ``rows`` the complete set of classifications of one company-year (e.g. a re-run report)."""
+        year = str(year)
+        self.conn.execute("DELETE FROM agg_labels WHERE company = ? AND year = ?", (company, year))
+        self.refresh(self.upsert(rows) | {(company, year)})
+
+    # ---------------- Reads ----------------
+    def sentiment_counts(self):
+        return self.conn.execute(
+            f"SELECT company, year, sentiment, {', '.join(map(_q, COLUMNS))} FROM agg_sentiment_counts"
+            " ORDER BY company, year, sentiment <> 'Positive'").fetchall()
+
+    def pos_minus_neg(self, only_all_zero: bool = False):
+        where = " WHERE all_zero" if only_all_zero else ""
+        return self.conn.execute(
+            f"SELECT company, year, {', '.join(map(_q, DIFF_COLUMNS))} FROM agg_pos_minus_neg{where}"
+            " ORDER BY company, year").fetchall()
+
+    def export(self, counts_csv: str = COUNTS_CSV, diff_csv: str = DIFF_CSV,
+               all_zero_csv: str = ALL_ZERO_CSV) -> None:
+        """Write the tables in the formats of generate_scores.py, fix_scores.py and analyse_scores.py."""
+        # the counts CSV came from csv.DictWriter (\r\n), the others from pandas (\n)
+        for path, header, rows, newline in [
+            (counts_csv, ["company", "year", "sentiment"] + COLUMNS, self.sentiment_counts(), "\r\n"),
+            (diff_csv, ["company", "year"] + DIFF_COLUMNS, self.pos_minus_neg(), "\n"),
+            (all_zero_csv, ["company", "year"] + DIFF_COLUMNS, self.pos_minus_neg(only_all_zero=True), "\n"),
+        ]:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            with open(path, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, lineterminator=newline)
+                writer.writerow(header)
+                writer.writerows(rows)
+
+
+# ---------------- Map step ----------------
+def label_chunk(lines: List[bytes]) -> Tuple[List[tuple], Counter]:
+    """Map step: ``label_record`` tuples of raw JSONL lines, in order, and row stats."""
+    records, stats = [], Counter()
+    parse_before = Counter(parsing.stats())
+    for line in lines:
+        try:
+            row = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        stats["rows"] += 1
+        record, columns = label_record(row)
+        if columns is None:
+            stats[record] += 1
+        else:
+            records.append(record)
+    # parser counters are per process; report this chunk's share
+    parse_stats = Counter(parsing.stats())
+    parse_stats.subtract(parse_before)
+    stats.update({f"parse_{k}": v for k, v in parse_stats.items() if k != "cached" and v})
+    return records, stats
+
+
+def _chunks(lines, size):
+    """Group ``(line, end_offset)`` pairs into ``(lines, end_offset_of_last)`` chunks."""
+    chunk, end = [], None
+    for line, end in lines:
+        chunk.append(line)
+        if len(chunk) >= size:
+            yield chunk, end
+            chunk = []
+    if chunk:
+        yield chunk, end
+
+
+def sync(wm: Watermarks, store: AggregateStore, path: str = RESULTS_JSONL, workers: int = WORKERS,
+         chunk_rows: int = CHUNK_ROWS) -> Tuple[Set[Tuple[str, str]], Counter]:
+    """Fold rows appended to ``path`` since the last run into ``store``.
+
+    At most ``2 * workers`` chunks are parsed at a time and results are folded
+    in in file order, each chunk committed together with its watermark.
+
+    Returns:
+        tuple: The changed company-years and row stats.
+    """
+    changed, stats = set(), Counter()
+
+    def fold(result, end):
+        records, st = result
+        dirty = store.upsert_labels(records)
+        store.refresh(dirty)
+        changed.update(dirty)
+        stats.update(st)
+        wm.set(CONSUMER, path, end, commit=False)
+        wm.conn.commit()
+
+    chunks = tqdm(_chunks(wm.iter_new_lines(CONSUMER, path), chunk_rows), desc="Aggregates")
+    if workers <= 1:
+        for chunk, end in chunks:
+            fold(label_chunk(chunk), end)
+        return changed, stats
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        pending = deque()
+        for chunk, end in chunks:
+            if len(pending) >= 2 * workers:
+                fut, fut_end = pending.popleft()
+                fold(fut.result(), fut_end)
+            pending.append((pool.submit(label_chunk, chunk), end))
+        while pending:
+            fut, fut_end = pending.popleft()
+            fold(fut.result(), fut_end)
+    return changed, stats
+
+
+def reference_counts(rows: Iterable[dict]):
+    """Sentiment counts by the counting loop of the original ``generate_scores.py``.
+
+    One bucket dict per company/year/sentiment, answers parsed by the
+    uncached legacy parser (or the compact grammar) and counted by its rules;
+    no bitmasks, SQL or process pool. Rows are counted as given, so pass one
+    row per ``custom_id``.
+    """
+    agg = {}
+    for row in rows:
+        company, year = extract_company_year(row.get("custom_id"))
+        if not company or not year:
+            continue
+        content = row.get("assistant_content")
+        parsed = parsing.parse_compact(content) or parsing.parse_assistant_content(content)
+        if not isinstance(parsed, (list, tuple)) or len(parsed) < 1:
+            continue
+        ai_flag = parsed[-2] if len(parsed) >= 2 else None
+        sentiment = normalize_sentiment(parsed[-1])
+        if sentiment is None:
+            continue
+        bucket = agg.setdefault((company, year, sentiment), dict.fromkeys(COLUMNS, 0))
+        core = list(parsed[:-2]) if len(parsed) > 2 else []
+        if (0 in core) or core_is_malformed(core):
+            bucket["0"] += 1
+        else:
+            for v in set(core):
+                bucket[str(v)] += 1
+        if ai_flag is True:
+            bucket["AI"] += 1
+    keys = sorted(agg, key=lambda k: (k[0], k[1], k[2] != "Positive"))
+    return [k + tuple(agg[k][c] for c in COLUMNS) for k in keys]
+
+
+def check(path: str = RESULTS_JSONL) -> None:
+    """Assert that the stored counts equal ``reference_counts`` over the last labelled row per ``custom_id``."""
+    with Watermarks() as wm:
+        stored = AggregateStore(wm.conn).sentiment_counts()
+    last = {}
+    for row in iter_jsonl(path):
+        if row_labels(row)[1] is not None:
+            last[row.get("custom_id")] = row
+    expected = reference_counts(last.values())
+    assert stored == expected, "stored aggregates differ from the reference count"
+    print(f"Stored aggregates match the reference count over {len(stored)} rows ({len(last)} sentences)")
+
+
+def main(rebuild: bool = False):
+    """Fold rows appended to the merged results since the last run in and write the three CSVs."""
+    with Watermarks() as wm:
+        store = AggregateStore(wm.conn)
+        if rebuild or not wm.has(CONSUMER, RESULTS_JSONL):
+            store.clear()
+            wm.reset(consumer=CONSUMER)
+        changed, stats = sync(wm, store) if os.path.exists(RESULTS_JSONL) else (set(), Counter())
+        written = changed or rebuild or not all(map(os.path.exists, (COUNTS_CSV, DIFF_CSV, ALL_ZERO_CSV)))
+        if written:
+            store.export()
+
+    print(f"New rows: {stats['rows']}")
+    print(f"Company-years updated: {len(changed)}")
+    print(f"Skipped (no company/year): {stats['skipped_no_cy']}")
+    print(f"Skipped (no/unknown sentiment): {stats['skipped_no_sent']}")
+    parsed = stats["parse_hits"] + stats["parse_misses"]
+    if parsed:
+        tiers = {k[len("parse_tier_"):]: v for k, v in sorted(stats.items()) if k.startswith("parse_tier_")}
+        print(f"Parser cache hit rate: {stats['parse_hits'] / parsed:.1%} | misses by tier: {tiers}")
+    if written:
+        print(f"Wrote {COUNTS_CSV}, {DIFF_CSV} and {ALL_ZERO_CSV}")
+
+
+if __name__ == "__main__":
+    if "--check" in sys.argv[1:]:
+        check()
+    else:
+        main(rebuild="--rebuild" in sys.argv[1:])
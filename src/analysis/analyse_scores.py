@@ -1,30 +1,25 @@
-import os
 import pandas as pd
 
-IN_CSV  = os.path.join("src", "classification", "results", "company_year_pos_minus_neg.csv")
-OUT_CSV = os.path.join("src", "classification", "results", "entries_all_zero_1_17.csv")
+from src.analysis import aggregate_store
 
-# Load
-df = pd.read_csv(IN_CSV)
+# The all-zero rows are flagged by the aggregate store, which writes both files
+IN_CSV  = aggregate_store.DIFF_CSV
+OUT_CSV = aggregate_store.ALL_ZERO_CSV
 
-# Ensure numeric for label cols 1..17 (coerce and fill NaNs as 0)
-label_cols = [str(i) for i in range(1, 18)]
-for c in label_cols:
-    df[c] = pd.to_numeric(df[c], errors="coerce").fillna(0)
+if __name__ == "__main__":
+    aggregate_store.main()
 
-# Find rows where ALL 1..17 are exactly zero
-mask_all_zero = (df[label_cols] == 0).all(axis=1)
-offenders = df[mask_all_zero].copy()
+    # Load
+    df = pd.read_csv(IN_CSV)
+    offenders = pd.read_csv(OUT_CSV)
+    label_cols = [str(i) for i in range(1, 18)]
 
-# Print summary and a quick peek
-print(f"Total rows: {len(df)}")
-print(f"Rows with all labels 1..17 == 0: {mask_all_zero.sum()}")
+    # Print summary and a quick peek
+    print(f"Total rows: {len(df)}")
+    print(f"Rows with all labels 1..17 == 0: {len(offenders)}")
 
-if not offenders.empty:
-    print("\nSample (up to 20):")
-    print(offenders[["company", "year"] + label_cols].head(20).to_string(index=False))
+    if not offenders.empty:
+        print("\nSample (up to 20):")
+        print(offenders[["company", "year"] + label_cols].head(20).to_string(index=False))
 
-# Save offending rows
-os.makedirs(os.path.dirname(OUT_CSV), exist_ok=True)
-offenders.to_csv(OUT_CSV, index=False)
-print(f"\nSaved offending rows to: {OUT_CSV}")
+    print(f"\nSaved offending rows to: {OUT_CSV}")
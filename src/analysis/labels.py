@@ -0,0 +1,133 @@
+"""Columns a merged classification row counts towards in the company-year CSVs.
+
+``row_labels`` turns one row of ``merged_classifications.jsonl`` into its
+``(company, year, sentiment)`` bucket and the SDG/AI columns it increments;
+the aggregate store and the warehouse both count with it.
+"""
+
+import os
+import re
+
+from src.analysis import parsing
+from src.utils.registry import to_legacy_id
+
+RESULTS_JSONL = os.path.join("src", "classification", "results", "merged_classifications.jsonl")
+
+LABEL_MIN = 0
+LABEL_MAX = 17
+LABELS = list(range(LABEL_MIN, LABEL_MAX + 1))  # 0..17 inclusive
+COLUMNS = [str(k) for k in LABELS] + ["AI"]
+
+# ---------- company/year extraction ----------
+def extract_company_year(custom_id: str):
+    """
+    Examples:
+      task-16-17.e.on_$38.46 b_energy-2014         -> company='e.on_$38.46 b_energy', year='2014'
+      task-16-18.henkel_$35.64 b_consumer staplers-2016
+      task-16-19.hannover rück_$33.67 b_financial service-2021
+      task-16-22.airbus-2019
+      task-16-25.continental-2021
+      task-16-32.rwe-2016
+      task-16-32.rwe-2017
+      task-16-34.vonovia-2015
+      task-16-34.vonovia-2017
+      task-16-34.vonovia-2020
+      task-16-34.vonovia-2021
+      task-16-7.porsche_$67.40 b_consumer discretionary-2017
+      task-16-8.munich re_$63.39_financials-2018
+      task-16-8.munich re_$63.39_financials-2019
+      task-1910-28.freseniusmedicalcare-2023
+      task-2012-6.mercedes-benz_$68.14 b_consumer discretionary-2018
+
+    Rule:
+      - YEAR = last four digits at the end (…-YYYY)
+      - Remove leading 'task-' + [digits and hyphens] + ('.' or '-') once
+      - The remainder (before -YYYY) is the company name (kept as-is)
+
+    Compact ids (``s<gid>``, see src/utils/registry.py) are first rewritten to
+    the legacy form, so both formats land in the same buckets.
+    """
+    if not custom_id:
+        return None, None
+
+    s = to_legacy_id(custom_id.strip())
+
+    # 1) year at the very end: "-YYYY"
+    m_year = re.search(r"-(\d{4})$", s)
+    if not m_year:
+        return None, None
+    year = m_year.group(1)
+
+    # everything before "-YYYY"
+    base = s[:m_year.start()]
+
+    # 2) strip one leading "task-<digits/hyphens><dot or hyphen>"
+    #    handles "task-16-32.rwe", "task-16-7.porsche…", "task-1910-28.fresenius…"
+    base = re.sub(r"^task-[0-9-]+[.\-]", "", base, count=1)
+
+    company = base.strip()
+    if not company:
+        return None, None
+
+    return company, year
+
+def normalize_sentiment(s):
+    if s is None:
+        return None
+    t = str(s).strip().lower()
+    if "pos" in t:
+        return "Positive"
+    if "neg" in t:
+        return "Negative"
+    return None
+
+def core_is_malformed(core):
+    if not isinstance(core, (list, tuple)):
+        return True
+    if len(core) == 0:
+        return True  # treat empty as malformed; change if you prefer otherwise
+    for v in core:
+        if not isinstance(v, int):
+            return True
+        if v < LABEL_MIN or v > LABEL_MAX:
+            return True
+    return False
+
+# ---------- Labels ----------
+def row_labels(row):
+    """Bucket key and counted columns of one merged classification row.
+
+    Returns:
+        tuple: ``((company, year, sentiment), columns)`` where ``columns`` are the
+        CSV columns the row increments, or ``(skip_reason, None)``.
+    """
+    cid = row.get("custom_id")
+    company, year = extract_company_year(cid)
+    if not company or not year:
+        return "skipped_no_cy", None
+
+    parsed = parsing.parse_content(row.get("assistant_content"))
+    if not isinstance(parsed, (list, tuple)) or len(parsed) < 1:
+        return "skipped_no_sent", None
+
+    ai_flag = parsed[-2] if len(parsed) >= 2 else None
+    sentiment = parsed[-1] if len(parsed) >= 1 else None
+    sentiment = normalize_sentiment(sentiment)
+    if sentiment is None:
+        return "skipped_no_sent", None
+
+    core = list(parsed[:-2]) if len(parsed) > 2 else []
+
+    # Rule 1: 0 present OR malformed -> increment only column "0"
+    if (0 in core) or core_is_malformed(core):
+        columns = ["0"]
+    else:
+        # Rule 2: duplicates count once
+        columns = [str(v) for v in sorted(set(core))
+                   if isinstance(v, int) and LABEL_MIN <= v <= LABEL_MAX]
+
+    # AI column
+    if isinstance(ai_flag, bool) and ai_flag is True:
+        columns.append("AI")
+
+    return (company, year, sentiment), columns
@@ -0,0 +1,142 @@
+"""Parsing of assistant_content with a fast path and a bounded memo cache.
+
+The model answers come from a tiny vocabulary: a few thousand distinct strings
+such as ``[7, 9, True, Positive]`` across millions of rows. ``parse_content``
+therefore
+
+1. looks the raw string up in a bounded LRU cache,
+2. on a miss, tries a precompiled regex for the canonical ``[n, ..., bool, sentiment]``
+   format, then the compact ``c1`` grammar,
+3. and only then falls back to the legacy ``parse_assistant_content`` tiers
+   (fence stripping, bracket extraction, ``json.loads``, ``ast.literal_eval``,
+   comma split).
+
+Results are identical to ``parse_compact(s) or parse_assistant_content(s)``.
+``stats()`` reports cache hits and which tier parsed each miss.
+"""
+
+import ast
+import json
+import re
+from collections import Counter
+from functools import lru_cache
+from typing import Dict, Optional, Tuple
+
+from src.classification.output_format import parse_compact
+
+CACHE_SIZE = 65536
+
+_CANONICAL_RE = re.compile(r"\[((?:\d+, )*)(True|False), (Positive|Negative)\]")
+_INT_RE = re.compile(r"[+-]?\d+")
+_FLOAT_RE = re.compile(r"[+-]?\d*\.\d+(e[+-]?\d+)?", flags=re.I)
+_EXP_RE = re.compile(r"[+-]?\d+e[+-]?\d+", flags=re.I)
+_SPLIT_RE = re.compile(r",(?![^\"']*[\"'])")
+
+_tiers: Counter = Counter()
+
+
+# ---------- Legacy parser ----------
+def _coerce_token(tok: str):
+    t = tok.strip().strip('"').strip("'")
+    if t.lower() == "true": return True
+    if t.lower() == "false": return False
+    try:
+        if _INT_RE.fullmatch(t):
+            return int(t)
+        if _FLOAT_RE.fullmatch(t) or _EXP_RE.fullmatch(t):
+            return float(t)
+    except Exception:
+        pass
+    return t
+
+def _parse_legacy(s: str) -> Tuple[object, str]:
+    """Legacy parse of ``s`` and the name of the tier that produced it."""
+    if not s:
+        return None, "empty"
+    s = s.strip()
+    fenced = s.startswith("```")
+    if fenced:
+        s = re.sub(r"^```[^\n]*\n", "", s)
+        s = re.sub(r"\n?```$", "", s).strip()
+    if not (s.startswith("[") and s.endswith("]")):
+        m = re.search(r"\[(.*)\]", s, flags=re.S)
+        if m:
+            s = "[" + m.group(1) + "]"
+        else:
+            parts = [p for p in _SPLIT_RE.split(s)]
+            return [_coerce_token(p) for p in parts if p.strip()], "bare_split"
+    try:
+        return json.loads(s), "fenced_json" if fenced else "json"
+    except json.JSONDecodeError:
+        pass
+    try:
+        return ast.literal_eval(s), "literal_eval"
+    except Exception:
+        pass
+    inner = s[1:-1]
+    parts = [p for p in _SPLIT_RE.split(inner)]
+    return [_coerce_token(p) for p in parts if p.strip()], "split"
+
+def parse_assistant_content(s: str):
+    return _parse_legacy(s)[0]
+
+
+# ---------- Fast path + memo ----------
+def _parse_canonical(s: str):
+    m = _CANONICAL_RE.fullmatch(s)
+    if m is None:
+        return None
+    out = [int(v) for v in m.group(1).split(", ") if v]
+    out.append(m.group(2) == "True")
+    out.append(m.group(3))
+    return out
+
+@lru_cache(maxsize=CACHE_SIZE)
+def _parse_uncached(s: str):
+    parsed = _parse_canonical(s)
+    if parsed is not None:
+        _tiers["canonical"] += 1
+        return parsed
+    parsed = parse_compact(s)
+    if parsed is not None:
+        _tiers["compact"] += 1
+        return parsed
+    parsed, tier = _parse_legacy(s)
+    _tiers[tier] += 1
+    return parsed
+
+def parse_content(s: Optional[str]):
+    """Parse an assistant answer; same result as ``parse_compact(s) or parse_assistant_content(s)``."""
+    if not s:
+        return None
+    parsed = _parse_uncached(s)
+    # cached lists are shared between calls; hand out copies
+    return list(parsed) if isinstance(parsed, list) else parsed
+
+def stats() -> Dict[str, int]:
+    """Cache hits/misses and, per tier, how many misses it parsed (since process start)."""
+    info = _parse_uncached.cache_info()
+    out = {"hits": info.hits, "misses": info.misses, "cached": info.currsize}
+    out.update({f"tier_{k}": v for k, v in _tiers.items()})
+    return out
+
+
+if __name__ == "__main__":
+    import sys
+    import time
+
+    from src.utils.file_utils import iter_jsonl
+
+    path = sys.argv[1] if len(sys.argv) > 1 else \
+        "src/classification/results/merged_classifications.jsonl"
+    contents = [row.get("assistant_content") for row in iter_jsonl(path)]
+
+    t0 = time.perf_counter()
+    legacy = [parse_compact(c) or parse_assistant_content(c) for c in contents]
+    t1 = time.perf_counter()
+    fast = [parse_content(c) for c in contents]
+    t2 = time.perf_counter()
+
+    assert fast == legacy, "memoized parser differs from legacy"
+    print(f"Rows: {len(contents)} | legacy {t1 - t0:.2f}s | memoized {t2 - t1:.2f}s")
+    print(stats())
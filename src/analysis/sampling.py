@@ -0,0 +1,300 @@
+"""Stratified sentence samples for fast approximate corpus statistics.
+
+Strata are ``(company, year, language)``, one per report: the language is
+detected once per partition with langdetect and cached in
+``data/sampling/languages.json``. Within a stratum of ``N`` sentences the
+``n = min(N, max(MIN_PER_STRATUM, ceil(RATE * N)))`` sentences with the
+smallest hash of ``(seed, company, year, sentence_id)`` are drawn, a simple
+random sample that is the same on every run and machine and keeps its old
+members when a report is re-split into more sentences.
+
+Stratum sizes come from the registry (``src/utils/registry.py``) when the
+partition is registered and its ``splits.json`` is not newer than the
+registry, so a sample without token counts rarely reads ``splits.json``. Per sampled sentence the frame holds its token count, its
+max similarity score and, if the aggregate store has it, its classification.
+
+Totals use the stratified estimator ``sum N_h * mean_h`` and rates the
+combined ratio estimator, both with 95% confidence intervals from the
+within-stratum variances (with finite population correction).
+
+Sentences without a similarity score (partitions not scored yet, ids missing
+from ``similarity_scores.csv``) are counted separately: threshold totals
+cover scored sentences only, and the report states how many had no score.
+
+Usage:
+    python src/analysis/sampling.py            # estimates for T=0.5 from a 0.2% sample
+    python src/analysis/sampling.py 0.3 0.01   # threshold, sampling rate
+"""
+
+import hashlib
+import math
+import os
+import sqlite3
+import sys
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+from langdetect import DetectorFactory, detect
+from tqdm import tqdm
+
+from src.analysis.aggregate_store import BITS
+from src.analysis.labels import extract_company_year
+from src.classification.sharding import get_encoding
+from src.filtering.selection import row_max_scores
+from src.utils.file_utils import load_json, save_json
+from src.utils.registry import REGISTRY_PATH, load_registry
+from src.utils.watermarks import WATERMARKS_PATH
+
+DetectorFactory.seed = 0  # Ensures consistent results
+
+TEXTS_DIR = os.path.join("data", "texts")
+SCORES_DIR = os.path.join("data", "scores_csv")
+LANGUAGES_PATH = os.path.join("data", "sampling", "languages.json")
+MODEL = "gpt-4.1-mini"
+
+RATE = 0.002
+MIN_PER_STRATUM = 30
+SEED = 0
+Z = 1.96  # 95% confidence
+STRATA = ["company", "year", "language"]
+LANGUAGE_CHARS = 10000
+
+
+# ---------------- Drawing ----------------
+def _splitmix64(x: np.ndarray) -> np.ndarray:
+    z = x + np.uint64(0x9E3779B97F4A7C15)
+    z = (z ^ (z >> np.uint64(30))) * np.uint64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> np.uint64(27))) * np.uint64(0x94D049BB133111EB)
+    return z ^ (z >> np.uint64(31))
+
+
+def sample_ids(company: str, year, sentence_ids: np.ndarray, n: int, seed: int = SEED) -> np.ndarray:
+    """The ``n`` sentence ids of a partition with the smallest seeded hash, in id order."""
+    sentence_ids = np.asarray(sentence_ids, dtype=np.int64)
+    if n >= len(sentence_ids):
+        return np.sort(sentence_ids)
+    key = int.from_bytes(hashlib.sha256(f"{seed}/{company}/{year}".encode("utf-8")).digest()[:8], "little")
+    with np.errstate(over="ignore"):
+        order = _splitmix64(sentence_ids.astype(np.uint64) ^ np.uint64(key))
+    return np.sort(sentence_ids[np.argpartition(order, n - 1)[:n]])
+
+
+def stratum_size(N: int, rate: float = RATE, min_per_stratum: int = MIN_PER_STRATUM) -> int:
+    return min(N, max(min_per_stratum, math.ceil(rate * N)))
+
+
+def detect_language(splits: dict) -> str:
+    """Language of a report, from its first ``LANGUAGE_CHARS`` characters."""
+    text = " ".join(str(splits[k]) for k in sorted(splits, key=int)[:500])[:LANGUAGE_CHARS]
+    try:
+        return detect(text)
+    except Exception:
+        return "unknown"
+
+
+def _labels(conn, company: str, year: str) -> dict:
+    """``sentence_id -> (mask, sentiment)`` of a partition in the aggregate store."""
+    registry = load_registry()
+    # the store keys rows by the company name of the custom_id, not by directory
+    # (e.g. "14.basf_..." is stored as "basf_..."), so match the directory on resolve
+    stored_company = extract_company_year(f"task-0-{company}-{year}")[0]
+    out = {}
+    rows = conn.execute(
+        "SELECT custom_id, mask, sentiment FROM agg_labels WHERE company = ? AND year = ?", (stored_company, year))
+    for custom_id, mask, sentiment in rows:
+        company_dir, _, sid = registry.resolve(custom_id)
+        if company_dir == company and sid is not None:
+            out[sid] = (mask, sentiment)
+    return out
+
+
+def _open_labels(path: str = WATERMARKS_PATH):
+    if not os.path.exists(path):
+        return None
+    conn = sqlite3.connect(path)
+    if conn.execute("SELECT 1 FROM sqlite_master WHERE name = 'agg_labels'").fetchone() is None:
+        conn.close()
+        return None
+    return conn
+
+
+def draw_sample(rate: float = RATE, min_per_stratum: int = MIN_PER_STRATUM, seed: int = SEED,
+                with_tokens: bool = True, with_scores: bool = True, model: str = MODEL,
+                texts_dir: str = TEXTS_DIR) -> pd.DataFrame:
+    """Draw the stratified sample; one row per sampled sentence.
+
+    Columns: the strata, ``sentence_id``, ``N``/``n`` (stratum and sample
+    size), ``tokens``, ``max_score`` (NaN without scores), ``classified``,
+    ``ai`` and ``positive``.
+    """
+    registry = load_registry()
+    registered_at = os.path.getmtime(REGISTRY_PATH) if os.path.exists(REGISTRY_PATH) else None
+    languages = load_json(LANGUAGES_PATH) if os.path.exists(LANGUAGES_PATH) else {}
+    enc = get_encoding(model) if with_tokens else None
+    labels_conn = _open_labels()
+    frames = []
+
+    partitions = []
+    for company in sorted(os.listdir(texts_dir)):
+        if os.path.isdir(os.path.join(texts_dir, company)):
+            for year in sorted(os.listdir(os.path.join(texts_dir, company))):
+                if os.path.exists(os.path.join(texts_dir, company, year, "splits.json")):
+                    partitions.append((company, year))
+
+    for company, year in tqdm(partitions, desc="Sampling"):
+        json_path = os.path.join(texts_dir, company, year, "splits.json")
+        pid = registry.pid(company, year)
+        splits = None
+        current = pid is not None and registered_at is not None and os.path.getmtime(json_path) <= registered_at
+        if current and registry.partitions[pid][3] == registry.partitions[pid][4]:
+            # registered with contiguous ids 0..count-1, not re-split since
+            ids = np.arange(int(registry.counts[pid]), dtype=np.int64)
+        else:
+            splits = load_json(json_path)
+            ids = np.asarray(sorted(int(k) for k in splits), dtype=np.int64)
+        if len(ids) == 0:
+            continue
+
+        language = languages.get(company, {}).get(year)
+        if language is None or with_tokens:
+            splits = splits if splits is not None else load_json(json_path)
+        if language is None:
+            language = detect_language(splits)
+            languages.setdefault(company, {})[year] = language
+
+        n = stratum_size(len(ids), rate, min_per_stratum)
+        picked = sample_ids(company, year, ids, n, seed)
+        frame = pd.DataFrame({"company": company, "year": year, "language": language,
+                              "sentence_id": picked, "N": len(ids), "n": n})
+
+        if enc is not None:
+            texts = [str(splits.get(str(sid), "")) for sid in picked]
+            frame["tokens"] = [len(t) for t in enc.encode_batch(texts)]
+        else:
+            frame["tokens"] = np.nan
+
+        frame["max_score"] = np.nan
+        csv_path = os.path.join(SCORES_DIR, company, year, "similarity_scores.csv")
+        if with_scores and os.path.exists(csv_path) and os.path.getsize(csv_path) > 0:
+            df = pd.read_csv(csv_path)
+            scores = pd.Series(row_max_scores(df), index=df.iloc[:, 0].astype(np.int64))
+            scores = scores[~scores.index.duplicated()]
+            frame["max_score"] = scores.reindex(picked).to_numpy()
+
+        labels = _labels(labels_conn, company, year) if labels_conn is not None else {}
+        found = [labels.get(int(sid)) for sid in picked]
+        frame["classified"] = [int(f is not None) for f in found]
+        frame["ai"] = [int(f is not None and bool(f[0] & BITS["AI"])) for f in found]
+        frame["positive"] = [int(f is not None and f[1] == "Positive") for f in found]
+        frames.append(frame)
+
+    if labels_conn is not None:
+        labels_conn.close()
+    os.makedirs(os.path.dirname(LANGUAGES_PATH), exist_ok=True)
+    save_json(LANGUAGES_PATH, languages)
+    if not frames:
+        return pd.DataFrame(columns=STRATA + ["sentence_id", "N", "n", "tokens", "max_score",
+                                              "classified", "ai", "positive"])
+    return pd.concat(frames, ignore_index=True)
+
+
+def with_threshold(sample: pd.DataFrame, threshold: float) -> pd.DataFrame:
+    """Add ``scored``/``unscored``, ``passes`` (any score ``>= threshold``) and ``passing_tokens`` columns.
+
+    Unscored sentences (NaN ``max_score``) never pass, so totals of ``passes``
+    and ``passing_tokens`` are over scored sentences; ``estimate_ratio(sample,
+    "passes", "scored")`` is the pass rate among them.
+    """
+    sample = sample.copy()
+    sample["scored"] = sample["max_score"].notna().astype(np.int64)
+    sample["unscored"] = 1 - sample["scored"]
+    sample["passes"] = (sample["max_score"] >= threshold).astype(np.int64)
+    sample["passing_tokens"] = sample["tokens"] * sample["passes"]
+    return sample
+
+
+# ---------------- Estimation ----------------
+def _stratum_moments(sample: pd.DataFrame, columns: List[str]) -> pd.DataFrame:
+    """Per stratum: N, n, and the total and total-variance contribution of each column."""
+    g = sample.groupby(STRATA, sort=False)
+    out = g[["N", "n"]].first()
+    fpc = 1 - out["n"] / out["N"]
+    for c in columns:
+        mean = g[c].mean()
+        var = g[c].var(ddof=1).fillna(0)
+        out[f"{c}_total"] = out["N"] * mean
+        out[f"{c}_var"] = out["N"] ** 2 * fpc * var / out["n"]
+    return out.reset_index()
+
+
+def _group(moments: pd.DataFrame, by: Optional[List[str]]):
+    if by:
+        return moments.groupby(by, sort=True)
+    return moments.assign(_all="all").groupby("_all")
+
+
+def estimate_total(sample: pd.DataFrame, column: str, by: Optional[List[str]] = None) -> pd.DataFrame:
+    """Estimated population total of ``column`` with a 95% confidence interval."""
+    sums = _group(_stratum_moments(sample, [column]), by)[["N", "n", f"{column}_total", f"{column}_var"]].sum()
+    se = np.sqrt(sums[f"{column}_var"])
+    return pd.DataFrame({
+        "estimate": sums[f"{column}_total"],
+        "ci_low": sums[f"{column}_total"] - Z * se,
+        "ci_high": sums[f"{column}_total"] + Z * se,
+        "sampled": sums["n"],
+        "population": sums["N"],
+    })
+
+
+def estimate_ratio(sample: pd.DataFrame, numerator: str, denominator: str,
+                   by: Optional[List[str]] = None) -> pd.DataFrame:
+    """Estimated ``total(numerator) / total(denominator)``, e.g. the AI rate among classified sentences.
+
+    The confidence interval linearizes the ratio: it is the interval of the
+    total of ``numerator - R * denominator``, divided by the denominator total.
+    """
+    keys = by or []
+    moments = _stratum_moments(sample, [numerator, denominator])
+    sums = _group(moments, by)[[f"{numerator}_total", f"{denominator}_total"]].sum()
+    ratio = sums[f"{numerator}_total"] / sums[f"{denominator}_total"]
+
+    if keys:
+        residual = sample.merge(ratio.rename("_r").reset_index(), on=keys, how="left")
+    else:
+        residual = sample.assign(_r=ratio.iloc[0])
+    residual["_e"] = residual[numerator] - residual["_r"] * residual[denominator]
+    var = _group(_stratum_moments(residual, ["_e"]), by)["_e_var"].sum()
+    se = np.sqrt(var) / sums[f"{denominator}_total"]
+    return pd.DataFrame({
+        "estimate": ratio,
+        "ci_low": ratio - Z * se,
+        "ci_high": ratio + Z * se,
+        "denominator": sums[f"{denominator}_total"],
+    })
+
+
+if __name__ == "__main__":
+    threshold = float(sys.argv[1]) if len(sys.argv) > 1 else 0.5
+    rate = float(sys.argv[2]) if len(sys.argv) > 2 else RATE
+    sample = with_threshold(draw_sample(rate=rate), threshold)
+    strata = sample.groupby(STRATA)["N"].first()
+    print(f"Sampled {len(sample)} of {strata.sum()} sentences in {len(strata)} strata")
+    print(f"Sampled sentences without a similarity score: {sample['unscored'].sum()}\n")
+
+    pd.set_option("display.float_format", "{:,.3f}".format)
+    for title, column in [("Sentences without a similarity score", "unscored"),
+                          (f"Scored sentences with a score >= {threshold}", "passes"),
+                          ("Tokens (all sentences)", "tokens"),
+                          (f"Tokens of scored sentences with a score >= {threshold}", "passing_tokens")]:
+        print(title)
+        print(estimate_total(sample, column).to_string(index=False), "\n")
+    if sample["scored"].any():
+        print(f"Share of scored sentences with a score >= {threshold}")
+        print(estimate_ratio(sample, "passes", "scored").to_string(index=False), "\n")
+
+    if sample["classified"].any():
+        print("AI mention rate among classified sentences, by year")
+        print(estimate_ratio(sample, "ai", "classified", by=["year"]).to_string(), "\n")
+        print("Positive share among classified sentences, by language")
+        print(estimate_ratio(sample, "positive", "classified", by=["language"]).to_string())
@@ -0,0 +1,314 @@
+"""Parquet warehouse of pipeline outputs with a DuckDB query layer.
+
+Tables live under ``data/warehouse/<table>/company_dir=<dir>/year=<year>/*.parquet``:
+
+- ``sentences``: ``splits.json`` of every partition (plus the registry gid if registered),
+- ``scores``: the per-sentence ``similarity_scores.csv`` columns,
+- ``classifications``: one row per merged LLM result with its parsed labels,
+  i.e. the CSV columns the row counts towards (``labels.row_labels``).
+
+``build`` is incremental: sentence and score partitions are rewritten only when
+their source file is newer, and classifications are appended from
+``merged_classifications.jsonl`` past the warehouse's watermark.
+
+``connect`` returns an in-memory DuckDB connection with a view per table and
+views that reproduce the CSV outputs of ``aggregate_store.py``:
+
+- ``labels``: the last labelled classification per ``custom_id``, the rows the
+  aggregate store counts,
+- ``sentiment_counts`` = ``company_year_sentiment_counts.csv``,
+- ``pos_minus_neg`` = ``company_year_pos_minus_neg.csv``,
+- ``all_zero`` = ``entries_all_zero_1_17.csv``.
+
+``export`` writes the views to ``data/warehouse/exports`` for comparison; the
+CSVs under ``src/classification/results`` are only written by the store.
+
+Usage:
+    python src/analysis/warehouse.py build
+    python src/analysis/warehouse.py export [out_dir]
+    python src/analysis/warehouse.py sql "SELECT company, SUM(\\"AI\\") FROM sentiment_counts GROUP BY ALL"
+"""
+
+import csv
+import glob
+import os
+import shutil
+import sys
+from collections import defaultdict
+from urllib.parse import quote
+
+import duckdb
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from tqdm import tqdm
+
+from src.analysis.labels import COLUMNS, RESULTS_JSONL, row_labels
+from src.utils.file_utils import load_json
+from src.utils.registry import load_registry
+from src.utils.watermarks import Watermarks
+
+WAREHOUSE_DIR = os.path.join("data", "warehouse")
+TEXTS_DIR = os.path.join("data", "texts")
+SCORES_DIR = os.path.join("data", "scores_csv")
+EXPORT_DIR = os.path.join(WAREHOUSE_DIR, "exports")
+TABLES = ["sentences", "scores", "classifications"]
+CONSUMER = "warehouse"
+CHUNK_ROWS = 200000
+# AI reference terms scored for every report (src/filtering/utils.py ai_terms);
+# German reports have extra columns for the German terms, which AI_Hits leaves out
+AI_TERMS = [
+    "Artificial Intelligence",
+    "Machine Learning",
+    "Reinforcement Learning",
+    "Deep Learning",
+    "Computer Vision",
+    "Natural Language Processing",
+]
+
+CLASSIFICATION_SCHEMA = pa.schema([
+    ("custom_id", pa.string()),
+    ("company_dir", pa.string()),
+    ("year", pa.string()),
+    ("sentence_id", pa.int64()),
+    ("company", pa.string()),
+    ("sentiment", pa.string()),
+    ("labels", pa.list_(pa.string())),
+    ("assistant_content", pa.string()),
+    ("prompt_tokens", pa.int64()),
+    ("completion_tokens", pa.int64()),
+])
+
+
+def partition_dir(table: str, company_dir: str, year) -> str:
+    return os.path.join(WAREHOUSE_DIR, table, f"company_dir={quote(str(company_dir), safe='')}", f"year={year}")
+
+
+def _write(table: pa.Table, path: str) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    pq.write_table(table, path + ".part")
+    os.replace(path + ".part", path)
+
+
+def _stale(src: str, dest: str) -> bool:
+    return not os.path.exists(dest) or os.path.getmtime(dest) < os.path.getmtime(src)
+
+
+# ---------------- Build ----------------
+def build_sentences() -> int:
+    registry = load_registry()
+    written = 0
+    for sp in tqdm(sorted(glob.glob(os.path.join(TEXTS_DIR, "*", "*", "splits.json"))), desc="sentences"):
+        company_dir, year = sp.split(os.sep)[-3:-1]
+        dest = os.path.join(partition_dir("sentences", company_dir, year), "part-0.parquet")
+        if not _stale(sp, dest):
+            continue
+        splits = load_json(sp)
+        ids = sorted(int(k) for k in splits)
+        pid = registry.pid(company_dir, year)
+        offset = int(registry.offsets[pid]) if pid is not None else None
+        _write(pa.table({
+            "company_dir": pa.array([company_dir] * len(ids), pa.string()),
+            "year": pa.array([year] * len(ids), pa.string()),
+            "sentence_id": pa.array(ids, pa.int64()),
+            "gid": pa.array([offset + i if offset is not None else None for i in ids], pa.int64()),
+            "text": pa.array([splits[str(i)] for i in ids], pa.string()),
+        }), dest)
+        written += 1
+    return written
+
+
+def build_scores() -> int:
+    written = 0
+    for cp in tqdm(sorted(glob.glob(os.path.join(SCORES_DIR, "*", "*", "similarity_scores.csv"))), desc="scores"):
+        company_dir, year = cp.split(os.sep)[-3:-1]
+        dest = os.path.join(partition_dir("scores", company_dir, year), "part-0.parquet")
+        if not _stale(cp, dest) or os.path.getsize(cp) == 0:
+            continue
+        table = pa_csv.read_csv(cp)
+        n = table.num_rows
+        table = table.add_column(0, "year", pa.array([year] * n, pa.string()))
+        table = table.add_column(0, "company_dir", pa.array([company_dir] * n, pa.string()))
+        _write(table, dest)
+        written += 1
+    return written
+
+
+def _classification_record(row):
+    key, columns = row_labels(row)
+    company_dir, year, sentence_id = load_registry().resolve(row.get("custom_id"))
+    labelled = columns is not None
+    return {
+        "custom_id": row.get("custom_id"),
+        "company_dir": company_dir or "__unknown__",
+        "year": str(year) if year else (key[1] if labelled else "0000"),
+        "sentence_id": sentence_id,
+        "company": key[0] if labelled else None,
+        "sentiment": key[2] if labelled else None,
+        "labels": columns,
+        "assistant_content": row.get("assistant_content"),
+        "prompt_tokens": row.get("prompt_tokens"),
+        "completion_tokens": row.get("completion_tokens"),
+    }
+
+
+def _flush(parts, tag: str) -> None:
+    for (company_dir, year), records in parts.items():
+        table = pa.Table.from_pylist(records, schema=CLASSIFICATION_SCHEMA)
+        _write(table, os.path.join(partition_dir("classifications", company_dir, year), f"part-{tag}.parquet"))
+    parts.clear()
+
+
+def build_classifications(rebuild: bool = False) -> int:
+    """Append rows of ``merged_classifications.jsonl`` past the watermark as new part files."""
+    out_dir = os.path.join(WAREHOUSE_DIR, "classifications")
+    added = 0
+    with Watermarks() as wm:
+        if rebuild or not wm.has(CONSUMER, RESULTS_JSONL):
+            shutil.rmtree(out_dir, ignore_errors=True)
+            wm.reset(consumer=CONSUMER)
+        if not os.path.exists(RESULTS_JSONL):
+            return 0
+
+        parts = defaultdict(list)
+        pending = 0
+        end = None
+        for row, end in tqdm(wm.iter_new(CONSUMER, RESULTS_JSONL), desc="classifications"):
+            if row is None:
+                continue
+            rec = _classification_record(row)
+            parts[(rec["company_dir"], rec["year"])].append(rec)
+            pending += 1
+            if pending >= CHUNK_ROWS:
+                # file names carry the end offset, so a rerun after a crash overwrites them
+                _flush(parts, str(end))
+                wm.set(CONSUMER, RESULTS_JSONL, end)
+                added += pending
+                pending = 0
+        if pending:
+            _flush(parts, str(end))
+            added += pending
+        if end is not None:
+            wm.set(CONSUMER, RESULTS_JSONL, end)
+    return added
+
+
+def build(rebuild: bool = False) -> None:
+    print(f"sentences: {build_sentences()} partitions written")
+    print(f"scores: {build_scores()} partitions written")
+    print(f"classifications: {build_classifications(rebuild)} rows appended")
+
+
+# ---------------- Query layer ----------------
+def _table_glob(table: str) -> str:
+    return os.path.join(WAREHOUSE_DIR, table, "*", "*", "*.parquet")
+
+
+def _sum_cols(cols, expr):
+    return ", ".join(f'CAST(SUM({expr.format(c=c)}) AS BIGINT) AS "{c}"' for c in cols)
+
+
+def connect() -> duckdb.DuckDBPyConnection:
+    """In-memory DuckDB connection with views over the warehouse tables and CSV outputs."""
+    con = duckdb.connect()
+    for table in TABLES:
+        if glob.glob(_table_glob(table)):
+            con.execute(
+                f"CREATE VIEW {table} AS SELECT * FROM read_parquet('{_table_glob(table)}',"
+                f" union_by_name = true, hive_partitioning = false)"
+            )
+    if not glob.glob(_table_glob("classifications")):
+        return con
+
+    # Part files are named after the merged-results offset they end at, so
+    # (part, row) orders rows as in merged_classifications.jsonl
+    con.execute(f"""
+        CREATE VIEW labels AS
+        SELECT * EXCLUDE (filename, file_row_number, _part) FROM (
+            SELECT *, CAST(regexp_extract(filename, 'part-(\\d+)\\.parquet$', 1) AS BIGINT) AS _part
+            FROM read_parquet('{_table_glob("classifications")}', union_by_name = true,
+                              hive_partitioning = false, filename = true, file_row_number = true)
+            WHERE labels IS NOT NULL
+        )
+        QUALIFY row_number() OVER (PARTITION BY custom_id ORDER BY _part DESC, file_row_number DESC) = 1
+    """)
+    diff_cols = [c for c in COLUMNS if c != "0"]
+    signed = "CASE WHEN sentiment = 'Positive' THEN \"{c}\" ELSE -\"{c}\" END"
+    con.execute(f"""
+        CREATE VIEW sentiment_counts AS
+        SELECT company, year, sentiment, {_sum_cols(COLUMNS, "CAST(list_contains(labels, '{c}') AS INTEGER)")}
+        FROM labels
+        GROUP BY company, year, sentiment
+        ORDER BY company, year, sentiment <> 'Positive'
+    """)
+    con.execute(f"""
+        CREATE VIEW pos_minus_neg AS
+        SELECT company, year, {_sum_cols(diff_cols, signed)}
+        FROM sentiment_counts
+        GROUP BY company, year
+        ORDER BY company, year
+    """)
+    all_zero = " AND ".join(f'"{c}" = 0' for c in COLUMNS if c not in ("0", "AI"))
+    con.execute(f"CREATE VIEW all_zero AS SELECT * FROM pos_minus_neg WHERE {all_zero} ORDER BY company, year")
+    return con
+
+
+def query(sql: str, con=None):
+    """Run ``sql`` against the warehouse views and return a DataFrame."""
+    return (con or connect()).execute(sql).fetchdf()
+
+
+def embedding_scores(con, threshold: float = 0.5):
+    """Per company/year: sentences above ``threshold`` per SDG column, and AI-term hits.
+
+    ``AI_Hits`` counts the ``AI_TERMS`` score columns above ``threshold``,
+    summed over the sentences, so German reports, which are also scored
+    against German terms, count the same columns as the rest. It is not the
+    ``AI_Score`` of the old ``sentence_scores.csv`` query, which summed the raw
+    fuzzy AI scores.
+    """
+    cols = [r[0] for r in con.execute("DESCRIBE scores").fetchall()]
+    sdg_cols = [c for c in cols if c.startswith("sdg_")]
+    ai_cols = [c for c in AI_TERMS if c in cols]
+    ai_expr = " + ".join(f'CAST(COALESCE("{c}", 0) > {threshold} AS INTEGER)' for c in ai_cols) or "0"
+    sdg_exprs = ", ".join(
+        f'CAST(SUM(CAST("{c}" > {threshold} AS INTEGER)) AS BIGINT) AS sdg_{i + 1}' for i, c in enumerate(sdg_cols))
+    return con.execute(f"""
+        SELECT company_dir AS Company, year AS Year,
+               CAST(SUM({ai_expr}) AS BIGINT) AS AI_Hits, {sdg_exprs}
+        FROM scores
+        GROUP BY company_dir, year
+        ORDER BY company_dir, year
+    """).fetchdf()
+
+
+def export(out_dir: str = EXPORT_DIR, con=None) -> None:
+    """Write the CSV-reproducing views in the formats of ``AggregateStore.export``."""
+    con = con or connect()
+    os.makedirs(out_dir, exist_ok=True)
+
+    counts = con.execute("SELECT * FROM sentiment_counts").fetchall()
+    path = os.path.join(out_dir, "company_year_sentiment_counts.csv")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["company", "year", "sentiment"] + COLUMNS)
+        writer.writerows(counts)
+    print(f"Wrote {path}")
+
+    for view, name in [("pos_minus_neg", "company_year_pos_minus_neg.csv"),
+                       ("all_zero", "entries_all_zero_1_17.csv")]:
+        path = os.path.join(out_dir, name)
+        con.execute(f"SELECT * FROM {view}").fetchdf().to_csv(path, index=False)
+        print(f"Wrote {path}")
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "build"
+    if cmd == "build":
+        build(rebuild="--rebuild" in sys.argv[2:])
+    elif cmd == "export":
+        export(sys.argv[2] if len(sys.argv) > 2 else EXPORT_DIR)
+    elif cmd == "sql":
+        print(query(sys.argv[2]).to_string(index=False))
+    else:
+        print(__doc__)
@@ -1,5 +1,4 @@
 import os
-import json
 from typing import List, Dict, Any
 import logging
 
@@ -7,9 +6,14 @@ import pandas as pd
 from openai import OpenAI
 from tqdm import tqdm
 
-from src.classification.prompts import get_classifications, create_batch_object
+from src.classification.prompts import get_classifications, create_batch_object, create_compact_batch_object
+from src.classification.sharding import ShardWriter, load_manifest
+from src.classification.cache import CacheHitWriter, ClassificationCache, request_key
+from src.classification.job_ledger import JobLedger
 from src.utils.file_utils import load_json
-from src.filtering.fuzzy_search import is_ai_related
+from src.utils.registry import Registry
+from src.filtering.fuzzy_search import is_ai_related_batch
+from src.filtering.selection import select_candidates
 
 logging.basicConfig(
     filename=os.path.join("src", "classification", "submit_requests.log"),  # log file path
@@ -25,6 +29,10 @@ MODEL = "gpt-4.1-mini"
 BASE_DIR = os.path.join("data", "texts")
 
 T = 0.5
+COMPACT_OUTPUT = False  # ask for the compact c1 answer grammar (see output_format.py)
+USE_CACHE = True        # skip sentences already classified under the same model/prompt/params
+USE_CASCADE = False     # answer confident [0, False, ...] sentences locally (train with cascade.py)
+COMPACT_IDS = False     # custom_ids as s<gid> from the corpus registry (src/utils/registry.py)
 BATCH_DIR = os.path.join("data", "batches_41_mini_pse")
 # PATCH_DIR = os.path.join(BATCH_DIR, "patched_max_tokens_50")
 PATCH_DIR = BATCH_DIR # hotfix Porsche SE
@@ -32,64 +40,74 @@ PATCH_DIR = BATCH_DIR # hotfix Porsche SE
 if not os.path.exists(BATCH_DIR):
     os.makedirs(BATCH_DIR)
 
-def save_batch(batches: List, batch_num: int):
-    jsonl_path = os.path.join(BATCH_DIR, f"batch_{batch_num}.jsonl")
-
-    with open(jsonl_path, 'w') as file:
-        for obj in batches:
-            file.write(json.dumps(obj) + '\n')
-
-
 def _create_batches(split_paths: List):
 
-    batches = []
-    batch_num = 0
+    make_request = create_compact_batch_object if COMPACT_OUTPUT else create_batch_object
 
     embedding_sentences = 0
     fuzzy_sentences = 0
 
-    for sp in tqdm(split_paths):
-        csv_path = sp.replace("splits.json", "similarity_scores.csv").replace("texts", "scores_csv")
-        assert os.path.exists(csv_path), f"{csv_path} does not exist"
-
-        json_data = load_json(sp)
-        csv_df = pd.read_csv(csv_path)
-
-        columns = list(csv_df.columns)
-
-        for i in range(len(csv_df)):
-            sentence_id = str(int(csv_df.iloc[i][columns[0]]))
-            sentence = json_data[sentence_id]
-            for j in range(1, len(columns)):
-                score = csv_df.iloc[i][columns[j]]
-                if score >= T:
-                    batch_obj = create_batch_object(sentence, sentence_id, csv_path, model=MODEL)
-                    batches.append(batch_obj)
-                    embedding_sentences += 1
-
-                    if len(batches) >= 20000:
-                        save_batch(batches, batch_num)
-                        batch_num += 1
-                        batches = []
-                    break
-
-                if j == len(columns) - 1: # Last value, sentence did not clear threshold
-                    if is_ai_related(sentence): # Handle lost context cases
-                        batch_obj = create_batch_object(sentence, sentence_id, csv_path, model=MODEL)
-                        batches.append(batch_obj)
-                        fuzzy_sentences += 1
-
-                        if len(batches) >= 20000:
-                            save_batch(batches, batch_num)
-                            batch_num += 1
-                            batches = []
-
-
-    save_batch(batches, batch_num)
-
-    print(f"Created {batch_num} batches")
+    cascade = None
+    if USE_CASCADE:
+        from src.classification.cascade import Cascade  # loads sklearn and the encoder
+        cascade = Cascade()
+    registry = None
+    if COMPACT_IDS:
+        registry = Registry.load()
+        registry.update()
+        registry.save()
+
+    with ShardWriter(BATCH_DIR, model=MODEL) as writer, \
+            ClassificationCache() as cache, CacheHitWriter() as cache_hits, \
+            CacheHitWriter(prefix="cascade") as cascade_hits:
+
+        for sp in tqdm(split_paths):
+            csv_path = sp.replace("splits.json", "similarity_scores.csv").replace("texts", "scores_csv")
+            assert os.path.exists(csv_path), f"{csv_path} does not exist"
+
+            json_data = load_json(sp)
+            csv_df = pd.read_csv(csv_path)
+
+            passing_ids, fallback_ids = select_candidates(csv_df, T)
+            candidates = [(str(sid), json_data[str(sid)]) for sid in passing_ids]
+            embedding_sentences += len(candidates)
+
+            fallback = [(str(sid), json_data[str(sid)]) for sid in fallback_ids]
+
+            # Handle lost context cases in one vectorized pass over the partition
+            fuzzy_hits = is_ai_related_batch([sentence for _, sentence in fallback])
+            for item, hit in zip(fallback, fuzzy_hits):
+                if hit:
+                    candidates.append(item)
+                    fuzzy_sentences += 1
+
+            # Cached LLM answers come first; the cascade only guesses for cache misses
+            misses = []
+            for sentence_id, sentence in candidates:
+                batch_obj = make_request(sentence, sentence_id, csv_path, model=MODEL)
+                if registry is not None:
+                    company, year = csv_path.split("/")[-3:-1]
+                    batch_obj["custom_id"] = registry.custom_id(company, year, sentence_id)
+                hit = cache.get(request_key(batch_obj["body"])) if USE_CACHE else None
+                if hit is None:
+                    misses.append((batch_obj, sentence))
+                else:
+                    cache_hits.write(batch_obj["custom_id"], hit, sentence)
+
+            local = cascade.answers([s for _, s in misses]) if cascade else [None] * len(misses)
+            for (batch_obj, sentence), answer in zip(misses, local):
+                if answer is None:
+                    writer.write(batch_obj)
+                else:
+                    cascade_hits.write(batch_obj["custom_id"], (answer, None, None), sentence)
+
+    print(f"Created {len(writer.shards)} batches")
+    print(f"Input tokens (est.): {sum(s['input_tokens'] for s in writer.shards)}")
     print(f"Embedding sentences: {embedding_sentences}")
     print(f"Fuzzy sentences: {fuzzy_sentences}")
+    print(f"Cache hits (not sent): {cache_hits.count}, {cache_hits.new} new -> {cache_hits.path}")
+    if cascade:
+        print(f"Cascade local answers (not sent): {cascade_hits.count}, {cascade_hits.new} new -> {cascade_hits.path}")
 
 
 def create_batches():
@@ -107,32 +125,35 @@ def create_batches():
 
 def submit_requests():
     BATCH_DIR = PATCH_DIR
+    # only the shards of the last run; directories without a manifest predate it
     batch_files = [
         os.path.join(BATCH_DIR, f)
-        for f in os.listdir(BATCH_DIR)
+        for f in list(load_manifest(BATCH_DIR)) or sorted(os.listdir(BATCH_DIR))
         if f.endswith(".jsonl")
     ]
 
-    for path in tqdm(batch_files):
-        batch_file = client.files.create(
-            file=open(path, "rb"),
-            purpose="batch"
-        )
-        logger.info("/" * 50)
-        logger.info(f"BATCH - {batch_file}")
-        logger.info(f"For path - {path}")
-        logger.info("/" * 50)
-
-        logger.info(f"batch_file: {batch_file}")
-        logger.info(f"batch_file.id: {batch_file.id}")
-
-        batch_job = client.batches.create(
-            input_file_id=batch_file.id,
-            endpoint="/v1/chat/completions",
-            completion_window="24h"
-        )
-        logger.info(f"batch_job.id: {batch_job.id}")
-        logger.info(f"batch_job.output_file_id: {batch_job.output_file_id}")
+    with JobLedger() as ledger:
+        for path in tqdm(batch_files):
+            batch_file = client.files.create(
+                file=open(path, "rb"),
+                purpose="batch"
+            )
+            logger.info("/" * 50)
+            logger.info(f"BATCH - {batch_file}")
+            logger.info(f"For path - {path}")
+            logger.info("/" * 50)
+
+            logger.info(f"batch_file: {batch_file}")
+            logger.info(f"batch_file.id: {batch_file.id}")
+
+            batch_job = client.batches.create(
+                input_file_id=batch_file.id,
+                endpoint="/v1/chat/completions",
+                completion_window="24h"
+            )
+            ledger.record_submission(path, batch_file.id, batch_job)
+            logger.info(f"batch_job.id: {batch_job.id}")
+            logger.info(f"batch_job.output_file_id: {batch_job.output_file_id}")
 
 
 if __name__ == "__main__":
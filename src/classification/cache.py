@@ -0,0 +1,228 @@
+"""Persistent cache of LLM classifications keyed by model, prompt, params and sentence.
+
+A request's key is a 16-byte digest of the model name, the SHA-256 of its
+system prompt, the remaining request parameters (``max_tokens`` etc.) and the
+SHA-256 of the whitespace/Unicode-normalized sentence. Rows live in a SQLite
+``WITHOUT ROWID`` table with the digest as primary key, which keeps millions of
+entries compact and lookups to one B-tree probe.
+
+The cache is filled from downloaded batch results (``populate``) and consulted
+in ``batch_requests._create_batches`` so only misses are sent again; hits are
+written as batch output lines so downstream extraction sees them as results.
+They are in no request shard, so each line also carries the request's
+``user_content``.
+"""
+
+import glob
+import hashlib
+import json
+import os
+import sqlite3
+import sys
+import unicodedata
+import uuid
+from typing import Dict, Iterable, Optional, Tuple
+
+from tqdm import tqdm
+
+from src.utils.file_utils import iter_jsonl
+
+CACHE_PATH = os.path.join("data", "cache", "classifications.sqlite")
+REQUEST_DIRS = [os.path.join("data", "batches_41_mini", "patched_max_tokens_50")]
+RESULTS_DIR = os.path.join("data", "batch_results")
+# Results that must not be cached under the single-sentence request of their custom_id:
+# local answers (cache hits, cascade) and answers to packed prompts (packing.py).
+UNCACHEABLE_RESULT_PREFIXES = ("cache_hits", "cascade", "unpacked_")
+
+
+def normalize_sentence(sentence: str) -> str:
+    return " ".join(unicodedata.normalize("NFKC", sentence or "").split())
+
+
+def request_key(body: Dict) -> bytes:
+    """Cache key of a chat completions request body."""
+    messages = body.get("messages") or []
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+    params = {k: v for k, v in body.items() if k not in ("messages", "model")}
+    if "max_output_tokens" in params:  # unpatched shards; submitted as max_tokens
+        params["max_tokens"] = params.pop("max_output_tokens")
+    material = json.dumps([
+        body.get("model"),
+        hashlib.sha256(system.encode("utf-8")).hexdigest(),
+        params,
+        hashlib.sha256(normalize_sentence(user).encode("utf-8")).hexdigest(),
+    ], sort_keys=True)
+    return hashlib.sha256(material.encode("utf-8")).digest()[:16]
+
+
+class ClassificationCache:
+    """SQLite-backed map from request key to assistant content and token usage.
+
+    Args:
+        path: Database file, created if missing.
+    """
+
+    def __init__(self, path: str = CACHE_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            " key BLOB PRIMARY KEY,"
+            " content TEXT NOT NULL,"
+            " prompt_tokens INTEGER,"
+            " completion_tokens INTEGER"
+            ") WITHOUT ROWID"
+        )
+        self.hits = 0
+        self.misses = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM cache").fetchone()[0]
+
+    def get(self, key: bytes) -> Optional[Tuple[str, Optional[int], Optional[int]]]:
+        row = self.conn.execute(
+            "SELECT content, prompt_tokens, completion_tokens FROM cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return row
+
+    def put_many(self, rows: Iterable[Tuple[bytes, str, Optional[int], Optional[int]]]) -> None:
+        self.conn.executemany("INSERT OR REPLACE INTO cache VALUES (?, ?, ?, ?)", rows)
+        self.conn.commit()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+
+def populate(cache: ClassificationCache, request_dirs=REQUEST_DIRS, results_dir: str = RESULTS_DIR,
+             chunk_size: int = 50000) -> int:
+    """Add every successful result whose request shard is available to the cache.
+
+    Request keys are staged per ``(request dir, custom_id)`` in a temporary
+    on-disk table so memory stays flat however many shards are indexed. A
+    custom_id whose request differs between dirs cannot be attributed to
+    one of them, so its results are not cached.
+
+    Returns:
+        int: Number of results added.
+    """
+    conn = cache.conn
+    conn.execute("CREATE TEMP TABLE IF NOT EXISTS pending ("
+                 " custom_id TEXT, dir TEXT, key BLOB, PRIMARY KEY (custom_id, dir))")
+    for d in request_dirs:
+        for path in tqdm(sorted(glob.glob(os.path.join(d, "batch_*.jsonl"))), desc="Indexing requests"):
+            conn.executemany(
+                "INSERT OR REPLACE INTO pending VALUES (?, ?, ?)",
+                ((o["custom_id"], d, request_key(o.get("body") or {})) for o in iter_jsonl(path)
+                 if o.get("custom_id")),
+            )
+    conn.commit()
+
+    added = 0
+    batch = []
+    for path in tqdm(sorted(glob.glob(os.path.join(results_dir, "*.jsonl"))), desc="Caching results"):
+        if os.path.basename(path).startswith(UNCACHEABLE_RESULT_PREFIXES):
+            continue
+        for obj in iter_jsonl(path):
+            resp = obj.get("response") or {}
+            if resp.get("status_code") != 200:
+                continue
+            keys = conn.execute("SELECT DISTINCT key FROM pending WHERE custom_id = ?",
+                                (obj.get("custom_id"),)).fetchall()
+            if len(keys) != 1:
+                continue  # unknown, or sent with different requests
+            body = resp.get("body") or {}
+            choices = body.get("choices") or []
+            content = ((choices[0].get("message") or {}).get("content")) if choices else None
+            if content is None:
+                continue
+            usage = body.get("usage") or {}
+            batch.append((keys[0][0], content, usage.get("prompt_tokens"), usage.get("completion_tokens")))
+            if len(batch) >= chunk_size:
+                cache.put_many(batch)
+                added += len(batch)
+                batch = []
+    cache.put_many(batch)
+    added += len(batch)
+    conn.execute("DROP TABLE pending")
+    return added
+
+
+class CacheHitWriter:
+    """Append local answers as batch output lines to ``<prefix>.jsonl``.
+
+    Every custom_id is written once: ids already in the file are skipped, so
+    re-running batch creation does not emit the same answers again. Lines
+    carry the request's ``user_content`` and their ``source`` (the prefix).
+    The file is only created once the first hit is written.
+    """
+
+    def __init__(self, results_dir: str = RESULTS_DIR, prefix: str = "cache_hits"):
+        self.path = os.path.join(results_dir, f"{prefix}.jsonl")
+        self.source = prefix
+        self._file = None
+        self._written = {o.get("custom_id") for o in iter_jsonl(self.path)} if os.path.exists(self.path) else set()
+        self.count = 0  # hits passed to write, including ones already in the file
+        self.new = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self._file is not None:
+            self._file.close()
+
+    def write(self, custom_id: str, hit: Tuple[str, Optional[int], Optional[int]],
+              user_content: Optional[str] = None) -> None:
+        self.count += 1
+        if custom_id in self._written:
+            return
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            torn = os.path.exists(self.path) and os.path.getsize(self.path) > 0 and not _ends_with_newline(self.path)
+            self._file = open(self.path, "a", encoding="utf-8")
+            if torn:  # last line of an interrupted run; end it so it is skipped as malformed
+                self._file.write("\n")
+        content, prompt_tokens, completion_tokens = hit
+        self._file.write(json.dumps({
+            "id": f"local_{uuid.uuid4().hex[:24]}",
+            "custom_id": custom_id,
+            "user_content": user_content,
+            "source": self.source,
+            "response": {
+                "status_code": 200,
+                "request_id": None,
+                "body": {
+                    "choices": [{"message": {"role": "assistant", "content": content}}],
+                    "usage": {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens},
+                },
+            },
+            "error": None,
+        }, ensure_ascii=False) + "\n")
+        self._written.add(custom_id)
+        self.new += 1
+
+
+def _ends_with_newline(path: str) -> bool:
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) == b"\n"
+
+
+if __name__ == "__main__":
+    with ClassificationCache() as c:
+        n = populate(c, request_dirs=sys.argv[1:] or REQUEST_DIRS)
+        print(f"Added {n} results, cache now holds {len(c)} entries")
@@ -0,0 +1,227 @@
+"""Embedding-based cascade that answers confident negatives locally.
+
+Most candidate sentences come back from the LLM as ``[0, False, <sentiment>]``.
+The cascade trains three calibrated logistic regressions on sentence
+embeddings (same multilingual MiniLM model as ``embedding_filter.py``),
+using labels from ``merged_classifications.jsonl``:
+
+- ``sdg``: the answer lists at least one SDG,
+- ``ai``: the answer flags AI,
+- ``positive``: the sentiment is Positive.
+
+A sentence is answered locally as ``[0, False, <sentiment>]`` only when all
+three heads are at least ``CONFIDENCE`` sure (no SDG, no AI, sentiment in
+either direction). Everything else still goes to the LLM. Training and
+inference run on CPU; embeddings of labelled sentences are cached as
+``.npy`` so retraining does not re-encode them.
+
+Usage:
+    python src/classification/cascade.py train    # fit, calibrate, print savings vs agreement
+    python src/classification/cascade.py report   # re-print the savings table of the saved model
+"""
+
+import json
+import os
+import sys
+from typing import Dict, List, Optional, Tuple
+
+import joblib
+import numpy as np
+from sklearn.calibration import CalibratedClassifierCV
+from sklearn.linear_model import LogisticRegression
+from sklearn.model_selection import train_test_split
+from tqdm import tqdm
+
+from src.analysis.parsing import parse_content
+from src.utils.file_utils import iter_jsonl
+
+RESULTS_JSONL = os.path.join("src", "classification", "results", "merged_classifications.jsonl")
+EMB_DIR = os.path.join("data", "embeddings", "cascade")
+MODEL_PATH = os.path.join("data", "cascade", "cascade.joblib")
+
+ENCODER_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+ENCODE_BATCH_SIZE = 256
+CONFIDENCE = 0.95
+SWEEP = [0.8, 0.85, 0.9, 0.95, 0.97, 0.99]
+TEST_SIZE = 0.2
+HEADS = ["sdg", "ai", "positive"]
+
+
+# ---------------- Labels ----------------
+def parse_labels(content: Optional[str]) -> Optional[Tuple[int, int, int]]:
+    """Return ``(has_sdg, is_ai, is_positive)`` of an assistant answer, or None if unusable."""
+    parsed = parse_content(content)
+    if not isinstance(parsed, (list, tuple)) or len(parsed) < 2:
+        return None
+    sentiment = str(parsed[-1]).lower()
+    if "pos" not in sentiment and "neg" not in sentiment:
+        return None
+    ai = parsed[-2] is True or str(parsed[-2]).lower() == "true"
+    core = [v for v in parsed[:-2] if str(v).strip() not in ("0", "")]
+    return int(bool(core)), int(ai), int("pos" in sentiment)
+
+
+def load_labelled(results_jsonl: str = RESULTS_JSONL) -> Tuple[List[str], List[str], np.ndarray, np.ndarray]:
+    """Return custom_ids, sentences, labels (n x 3) and prompt+completion tokens per row."""
+    cids, texts, labels, tokens = [], [], [], []
+    for row in iter_jsonl(results_jsonl):
+        lab = parse_labels(row.get("assistant_content"))
+        if lab is None or not row.get("user_content") or not row.get("custom_id"):
+            continue
+        if row.get("source") == "cascade":
+            continue  # its own local answers
+        cids.append(row["custom_id"])
+        texts.append(row["user_content"])
+        labels.append(lab)
+        tokens.append((row.get("prompt_tokens") or 0) + (row.get("completion_tokens") or 0))
+    return cids, texts, np.asarray(labels, dtype=np.int8), np.asarray(tokens, dtype=np.int64)
+
+
+# ---------------- Embeddings ----------------
+def load_encoder():
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(ENCODER_NAME, device="cpu")
+
+
+def encode(encoder, texts: List[str]) -> np.ndarray:
+    return encoder.encode(texts, batch_size=ENCODE_BATCH_SIZE, convert_to_numpy=True,
+                          normalize_embeddings=True, show_progress_bar=False).astype(np.float32)
+
+
+def cached_embeddings(cids: List[str], texts: List[str], encoder=None, emb_dir: str = EMB_DIR) -> np.ndarray:
+    """Embeddings for ``texts`` in order, encoding only custom_ids not cached in ``emb_dir`` yet."""
+    emb_path = os.path.join(emb_dir, "embeddings.npy")
+    ids_path = os.path.join(emb_dir, "custom_ids.json")
+    if os.path.exists(emb_path):
+        emb = np.load(emb_path)
+        with open(ids_path, "r", encoding="utf-8") as f:
+            known = json.load(f)
+    else:
+        emb, known = None, []
+    index = {cid: i for i, cid in enumerate(known)}
+
+    missing = [i for i, cid in enumerate(cids) if cid not in index]
+    if missing:
+        encoder = encoder or load_encoder()
+        new = []
+        for start in tqdm(range(0, len(missing), ENCODE_BATCH_SIZE * 8), desc="Encoding"):
+            chunk = missing[start:start + ENCODE_BATCH_SIZE * 8]
+            new.append(encode(encoder, [texts[i] for i in chunk]))
+        new = np.concatenate(new)
+        emb = new if emb is None else np.concatenate([emb, new])
+        for i in missing:
+            index[cids[i]] = len(known)
+            known.append(cids[i])
+        os.makedirs(emb_dir, exist_ok=True)
+        np.save(emb_path, emb)
+        with open(ids_path, "w", encoding="utf-8") as f:
+            json.dump(known, f)
+    return emb[[index[cid] for cid in cids]]
+
+
+# ---------------- Model ----------------
+def fit_heads(X: np.ndarray, y: np.ndarray) -> Dict[str, CalibratedClassifierCV]:
+    heads = {}
+    for j, name in enumerate(HEADS):
+        clf = CalibratedClassifierCV(LogisticRegression(max_iter=1000, C=1.0), method="sigmoid", cv=3)
+        heads[name] = clf.fit(X, y[:, j])
+    return heads
+
+
+def head_probs(heads: Dict, X: np.ndarray) -> np.ndarray:
+    """Positive-class probabilities, one column per head."""
+    return np.stack([heads[name].predict_proba(X)[:, 1] for name in HEADS], axis=1)
+
+
+def route(probs: np.ndarray, confidence: float = CONFIDENCE) -> Tuple[np.ndarray, np.ndarray]:
+    """Return a mask of locally answered rows and their predicted positive-sentiment flag."""
+    local = (probs[:, 0] <= 1 - confidence) & (probs[:, 1] <= 1 - confidence) & \
+        (np.maximum(probs[:, 2], 1 - probs[:, 2]) >= confidence)
+    return local, probs[:, 2] >= 0.5
+
+
+def savings_table(probs: np.ndarray, y: np.ndarray, tokens: np.ndarray, sweep=SWEEP) -> List[Dict]:
+    """Share of requests/tokens answered locally and their agreement with the LLM per threshold."""
+    table = []
+    for c in sweep:
+        local, positive = route(probs, c)
+        n = int(local.sum())
+        agree = (y[local, 0] == 0) & (y[local, 1] == 0) & (y[local, 2] == positive[local])
+        table.append({
+            "confidence": c,
+            "local": n,
+            "request_savings": n / len(y) if len(y) else 0.0,
+            "token_savings": float(tokens[local].sum() / tokens.sum()) if tokens.sum() else 0.0,
+            "agreement": float(agree.mean()) if n else None,
+            "overall_agreement": 1 - float((~agree).sum()) / len(y) if len(y) else None,
+        })
+    return table
+
+
+def print_table(table: List[Dict]) -> None:
+    print(f"{'conf':>6} {'local':>8} {'req saved':>10} {'tok saved':>10} {'agree':>7} {'overall':>8}")
+    for r in table:
+        agree = f"{r['agreement']:.3f}" if r["agreement"] is not None else "-"
+        print(f"{r['confidence']:>6.2f} {r['local']:>8} {r['request_savings']:>10.1%} "
+              f"{r['token_savings']:>10.1%} {agree:>7} {r['overall_agreement']:>8.3f}")
+
+
+def train(results_jsonl: str = RESULTS_JSONL, model_path: str = MODEL_PATH, seed: int = 0) -> Dict:
+    """Fit on a train split, report savings on the held-out split, then refit on all rows and save."""
+    cids, texts, y, tokens = load_labelled(results_jsonl)
+    X = cached_embeddings(cids, texts)
+    print(f"Labelled sentences: {len(y)} | SDG: {y[:, 0].mean():.1%} | AI: {y[:, 1].mean():.1%} "
+          f"| Positive: {y[:, 2].mean():.1%}")
+
+    idx_train, idx_test = train_test_split(np.arange(len(y)), test_size=TEST_SIZE, random_state=seed)
+    heads = fit_heads(X[idx_train], y[idx_train])
+    probs = head_probs(heads, X[idx_test])
+    for j, name in enumerate(HEADS):
+        acc = ((probs[:, j] >= 0.5) == y[idx_test, j]).mean()
+        print(f"Held-out accuracy {name}: {acc:.3f}")
+    table = savings_table(probs, y[idx_test], tokens[idx_test])
+    print_table(table)
+
+    bundle = {"heads": fit_heads(X, y), "encoder": ENCODER_NAME, "confidence": CONFIDENCE,
+              "holdout": table, "trained_on": len(y)}
+    os.makedirs(os.path.dirname(model_path), exist_ok=True)
+    joblib.dump(bundle, model_path)
+    print(f"Saved cascade to {model_path}")
+    return bundle
+
+
+class Cascade:
+    """Route sentences between a local answer and the LLM using a saved model.
+
+    Args:
+        model_path: Bundle written by ``train``.
+        confidence: Override the saved confidence threshold.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, confidence: Optional[float] = None):
+        bundle = joblib.load(model_path)
+        self.heads = bundle["heads"]
+        self.confidence = confidence or bundle["confidence"]
+        self.encoder = load_encoder()
+        self.local = 0
+        self.sent = 0
+
+    def answers(self, texts: List[str]) -> List[Optional[str]]:
+        """Local answer per sentence, or None where the LLM should classify it."""
+        if not texts:
+            return []
+        local, positive = route(head_probs(self.heads, encode(self.encoder, texts)), self.confidence)
+        self.local += int(local.sum())
+        self.sent += int((~local).sum())
+        return [f"[0, False, {'Positive' if p else 'Negative'}]" if l else None
+                for l, p in zip(local, positive)]
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "train"
+    if cmd == "train":
+        train()
+    elif cmd == "report":
+        print_table(joblib.load(MODEL_PATH)["holdout"])
+    else:
+        print(__doc__)
@@ -1,9 +1,11 @@
 from openai import OpenAI
 
-client = OpenAI()
+from src.classification.job_ledger import JobLedger, print_jobs
 
-# List all batches (default limit=20, can increase to 100)
-batches = client.batches.list(limit=100)
+client = OpenAI()
 
-for b in batches.data:
-    print(f"ID: {b.id} | Status: {b.status} | Created: {b.created_at} | Endpoint: {b.endpoint}")
+# Walk every page of batches into the local ledger, then print what it knows
+with JobLedger() as ledger:
+    ledger.import_submit_log()
+    print(ledger.sync(client, full=True))
+    print_jobs(ledger)
@@ -0,0 +1,111 @@
+"""Concurrent, streaming download of batch output and error files.
+
+Each file is streamed in chunks to ``<dest>.part`` and atomically renamed
+into place, so memory stays flat regardless of file size and a crash never
+leaves a truncated result that looks complete. Downloads run on a bounded
+thread pool, and every job's output + error line count is checked against
+the line count of the request shard it was submitted from.
+"""
+
+import os
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
+from tqdm import tqdm
+
+from src.classification.job_ledger import JobLedger, with_backoff
+
+RESULTS_DIR = os.path.join("data", "batch_results")
+ERRORS_DIR = os.path.join("data", "batch_errors")
+MAX_WORKERS = 4
+CHUNK_SIZE = 1 << 20
+
+
+def _stream_once(client, file_id: str, tmp_path: str) -> None:
+    # a connection dropped mid-stream raises httpx.TransportError, retried by with_backoff
+    with client.files.with_streaming_response.content(file_id) as resp, open(tmp_path, "wb") as f:
+        for chunk in resp.iter_bytes(CHUNK_SIZE):
+            f.write(chunk)
+
+
+def download_file(client, file_id: str, dest: str) -> int:
+    """Stream ``file_id`` to ``dest`` atomically and return its line count.
+
+    An existing ``dest`` is not downloaded again. Either way the lines are
+    counted by ``count_lines``, so a rerun reports the same count.
+    """
+    if not os.path.exists(dest):
+        os.makedirs(os.path.dirname(dest), exist_ok=True)
+        tmp_path = dest + ".part"
+        try:
+            with_backoff(_stream_once, client, file_id, tmp_path)
+            os.replace(tmp_path, dest)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    return count_lines(dest)
+
+
+def count_lines(path: str) -> int:
+    """Number of non-blank lines, the rule used for shards, outputs and error files alike."""
+    n = 0
+    with open(path, "rb") as f:
+        for line in f:
+            if line.strip():
+                n += 1
+    return n
+
+
+def _download_job(client, job, results_dir: str, errors_dir: str) -> Dict:
+    batch_id = job["batch_id"]
+    report = {"batch_id": batch_id, "output_lines": 0, "error_lines": 0, "expected": None}
+    if job["output_file_id"]:
+        report["output_lines"] = download_file(
+            client, job["output_file_id"], os.path.join(results_dir, f"{batch_id}.jsonl"))
+    if job["error_file_id"]:
+        report["error_lines"] = download_file(
+            client, job["error_file_id"], os.path.join(errors_dir, f"{batch_id}.jsonl"))
+
+    shard_path = job["shard_path"]
+    if shard_path and os.path.exists(shard_path):
+        report["expected"] = count_lines(shard_path)
+    elif job["request_total"]:
+        report["expected"] = job["request_total"]
+    got = report["output_lines"] + report["error_lines"]
+    report["ok"] = report["expected"] is None or got == report["expected"]
+    return report
+
+
+def download_completed(client, ledger: JobLedger, results_dir: str = RESULTS_DIR,
+                       errors_dir: str = ERRORS_DIR, max_workers: int = MAX_WORKERS,
+                       statuses: Optional[List[str]] = None) -> List[Dict]:
+    """Download outputs and error files of all finished jobs in the ledger.
+
+    Args:
+        client: OpenAI client.
+        ledger: Synced job ledger.
+        results_dir: Destination of output files.
+        errors_dir: Destination of error files.
+        max_workers: Concurrent downloads.
+        statuses: Job statuses to download (default: completed, expired, cancelled,
+            which can all carry partial outputs).
+
+    Returns:
+        List[Dict]: Per-job line counts and whether they match the request shard.
+    """
+    jobs = [j for j in ledger.jobs(statuses or ["completed", "expired", "cancelled"])
+            if j["output_file_id"] or j["error_file_id"]]
+    reports = []
+    with ThreadPoolExecutor(max_workers=max_workers) as pool:
+        futures = {pool.submit(_download_job, client, j, results_dir, errors_dir): j for j in jobs}
+        for fut in tqdm(as_completed(futures), total=len(futures), desc="Downloading"):
+            job = futures[fut]
+            try:
+                reports.append(fut.result())
+            except Exception as e:
+                reports.append({"batch_id": job["batch_id"], "ok": False, "error": str(e)})
+
+    for r in reports:
+        if not r["ok"]:
+            print(f"Mismatch or failure for {r['batch_id']}: {r}")
+    return reports
@@ -1,76 +1,166 @@
+"""Join batch results with their request sentences into merged_classifications.jsonl.
+
+Request shards are indexed by custom_id in an on-disk SQLite table, so the
+sentences never have to fit in memory. Result files are then streamed through
+that index and every OK line is written as one JSON object per line to
+``merged_classifications.jsonl``. Read it back with
+``src.utils.file_utils.iter_jsonl``.
+
+Ingestion is incremental: per result file, the byte offset already consumed
+is kept in ``src.utils.watermarks``, and only new lines are appended to the
+output. The output's own committed size is stored as a watermark too, so rows
+written by a run that crashed before committing its offsets are truncated
+away instead of duplicated. Pass ``--rebuild`` to start from scratch.
+"""
+
 import os
+import sys
 import glob
 import json
+import sqlite3
 
-import pandas as pd
 from tqdm import tqdm
 
-BATCH_OBJS_DIR = "data/batches_41_mini/patched_max_tokens_50"  # original requests
-RESULTS_DIR    = "data/batch_results"                          # completed results
-OUT_JSON       = os.path.join("src", "classification", "results", "merged_classifications.json")
+from src.utils.file_utils import iter_jsonl
+from src.utils.watermarks import Watermarks
+
+BATCH_OBJS_DIRS = ["data/batches_41_mini/patched_max_tokens_50"]  # original requests
+RESULTS_DIR     = "data/batch_results"                            # completed results
+INDEX_PATH      = os.path.join("data", "compiled", "request_index.sqlite")
+OUT_JSONL       = os.path.join("src", "classification", "results", "merged_classifications.jsonl")
+CONSUMER        = "extract_results"
+
+
+def open_index(path: str = INDEX_PATH) -> sqlite3.Connection:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    conn = sqlite3.connect(path)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS requests (
+            custom_id TEXT PRIMARY KEY,
+            user_content TEXT
+        ) WITHOUT ROWID;
+        CREATE TABLE IF NOT EXISTS indexed_shards (
+            path TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL
+        );
+        """
+    )
+    return conn
 
-def iter_jsonl(path):
-    with open(path, "r", encoding="utf-8") as f:
-        for line in f:
-            line = line.strip()
-            if not line:
+
+def _user_content(obj):
+    # take the last user message content
+    for m in reversed((obj.get("body") or {}).get("messages") or []):
+        if m.get("role") == "user":
+            return m.get("content")
+    return None
+
+
+def index_requests(conn: sqlite3.Connection, request_dirs=BATCH_OBJS_DIRS) -> int:
+    """Index custom_id -> user content of request shards not indexed in their current version."""
+    indexed = 0
+    for d in request_dirs:
+        for req_path in sorted(glob.glob(os.path.join(d, "batch_*.jsonl"))):
+            st = os.stat(req_path)
+            row = conn.execute("SELECT size, mtime FROM indexed_shards WHERE path = ?", (req_path,)).fetchone()
+            if row is not None and tuple(row) == (st.st_size, st.st_mtime):
                 continue
-            try:
-                yield json.loads(line)
-            except json.JSONDecodeError:
-                # skip malformed lines
+            conn.executemany(
+                "INSERT OR REPLACE INTO requests VALUES (?, ?)",
+                ((obj["custom_id"], _user_content(obj)) for obj in iter_jsonl(req_path) if obj.get("custom_id")),
+            )
+            conn.execute("INSERT OR REPLACE INTO indexed_shards VALUES (?, ?, ?)",
+                         (req_path, st.st_size, st.st_mtime))
+            conn.commit()
+            indexed += 1
+    return indexed
+
+
+def result_row(obj, conn: sqlite3.Connection):
+    """Merged row of one result line, or None for non-OK lines."""
+    resp = obj.get("response") or {}
+    if resp.get("status_code") != 200:
+        return None
+
+    body = (resp.get("body") or {})
+    choices = body.get("choices") or []
+    msg = choices[0].get("message") if choices else {}
+    usage = body.get("usage") or {}
+
+    cid = obj.get("custom_id")
+    found = conn.execute("SELECT user_content FROM requests WHERE custom_id = ?", (cid,)).fetchone()
+    row = {
+        "custom_id": cid,
+        # local answers (cache.CacheHitWriter) are in no request shard and carry their sentence
+        "user_content": found[0] if found else obj.get("user_content"),
+        "assistant_content": (msg or {}).get("content"),
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "completion_tokens": usage.get("completion_tokens"),
+    }
+    if obj.get("source"):
+        row["source"] = obj["source"]
+    return row
+
+
+def stream_join(conn: sqlite3.Connection, wm: Watermarks, results_dir: str = RESULTS_DIR,
+                out_path: str = OUT_JSONL, rebuild: bool = False):
+    """Append rows of result lines not consumed yet to ``out_path``.
+
+    Returns:
+        tuple: Rows appended and non-OK lines skipped.
+    """
+    os.makedirs(os.path.dirname(out_path), exist_ok=True)
+    if rebuild or not os.path.exists(out_path):
+        # Downstream consumers of the output have to start over as well
+        wm.reset(consumer=CONSUMER)
+        wm.reset(path=out_path)
+        open(out_path, "w").close()
+
+    committed = wm.offset(CONSUMER, out_path)
+    if os.path.getsize(out_path) > committed:
+        with open(out_path, "r+b") as f:
+            f.truncate(committed)
+        # Consumers that already read the uncommitted tail have to start over
+        wm.conn.execute("DELETE FROM watermarks WHERE path = ? AND consumer != ? AND offset > ?",
+                        (out_path, CONSUMER, committed))
+        wm.conn.commit()
+
+    written = skipped_non_ok = 0
+    with open(out_path, "a", encoding="utf-8") as out:
+        for res_path in sorted(glob.glob(os.path.join(results_dir, "*.jsonl"))):
+            end = None
+            for obj, end in tqdm(wm.iter_new(CONSUMER, res_path), desc=res_path):
+                row = result_row(obj, conn) if obj else None
+                if row is None:
+                    # skip non-OK lines; src/classification/reconcile.py collects them for resubmission
+                    skipped_non_ok += obj is not None
+                    continue
+                out.write(json.dumps(row, ensure_ascii=False) + "\n")
+                written += 1
+            if end is None:
                 continue
+            out.flush()
+            os.fsync(out.fileno())
+            wm.set(CONSUMER, res_path, end, commit=False)
+            wm.set(CONSUMER, out_path, os.fstat(out.fileno()).st_size, commit=False)
+            wm.conn.commit()
+    return written, skipped_non_ok
+
+
+def main(rebuild: bool = False):
+    conn = open_index()
+    print(f"Indexed {index_requests(conn)} request shards")
+    with Watermarks() as wm:
+        written, skipped_non_ok = stream_join(conn, wm, rebuild=rebuild)
+    conn.close()
+
+    print(f"Appended {written} rows to {OUT_JSONL}")
+    print(f"Skipped {skipped_non_ok} non-OK results (run reconcile.py to resubmit failed/missing requests)")
+
 
-# 1) Build a map: custom_id -> user content from original batch objects
-custom_to_user = {}
-
-req_files = sorted(glob.glob(os.path.join(BATCH_OBJS_DIR, "batch_*.jsonl")))
-for req_path in req_files:
-    for obj in iter_jsonl(req_path):
-        cid = obj.get("custom_id")
-        body = obj.get("body", {})
-        msgs = body.get("messages", [])
-        # take the last user message content
-        user_content = None
-        for m in reversed(msgs):
-            if m.get("role") == "user":
-                user_content = m.get("content")
-                break
-        if cid:
-            custom_to_user[cid] = user_content
-
-# 2) Walk result jsonls and collect rows
-rows = []
-res_files = sorted(glob.glob(os.path.join(RESULTS_DIR, "*.jsonl")))
-for res_path in res_files:
-    for obj in tqdm(iter_jsonl(res_path), desc=res_path):
-        cid = obj.get("custom_id")
-        resp = obj.get("response") or {}
-        status_code = resp.get("status_code")
-        if status_code != 200:
-            # skip non-OK lines (or collect if you want to audit)
-            continue
-
-        body = (resp.get("body") or {})
-        choices = body.get("choices") or []
-        msg = choices[0].get("message") if choices else {}
-        assistant_content = (msg or {}).get("content")
-
-        usage = body.get("usage") or {}
-        prompt_tokens = usage.get("prompt_tokens")
-        completion_tokens = usage.get("completion_tokens")
-
-        rows.append({
-            "custom_id": cid,
-            "user_content": custom_to_user.get(cid),
-            "assistant_content": assistant_content,
-            "prompt_tokens": prompt_tokens,
-            "completion_tokens": completion_tokens,
-        })
-
-# 3) Save JSON
-os.makedirs(os.path.dirname(OUT_JSON), exist_ok=True)
-with open(OUT_JSON, "w", encoding="utf-8") as f:
-    json.dump(rows, f, ensure_ascii=False, indent=2)
-
-print(f"Wrote {len(rows)} rows to {OUT_JSON}")
+if __name__ == "__main__":
+    main(rebuild="--rebuild" in sys.argv[1:])
@@ -0,0 +1,267 @@
+"""SQLite ledger of submitted batch jobs and their status transitions.
+
+Replaces grepping ``submit_requests.log``: every submission records its shard
+file, input file id and batch id, and ``sync`` walks *all* pages of
+``client.batches.list`` (with backoff) to record status changes, timestamps,
+request counts and output/error file ids. Sync is incremental: paging stops
+once a whole page holds only jobs already known to be in a terminal state and
+no older job is still in flight. Jobs that never got a status (seeded by
+``import_submit_log`` and not met while paging) are fetched one by one.
+"""
+
+import json
+import os
+import random
+import re
+import sqlite3
+import time
+from typing import Callable, Dict, List, Optional
+
+import httpx
+import openai
+
+LEDGER_PATH = os.path.join("data", "batch_jobs.sqlite")
+SUBMIT_LOG = os.path.join("src", "classification", "submit_requests.log")
+
+TERMINAL = {"completed", "failed", "expired", "cancelled"}
+PAGE_SIZE = 100
+MAX_ATTEMPTS = 5
+BACKOFF_BASE = 2.0  # seconds, doubled per attempt
+
+_RETRYABLE = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+    httpx.TransportError,  # raised unwrapped while streaming a response body
+)
+
+
+def with_backoff(fn: Callable, *args, **kwargs):
+    """Call ``fn`` and retry 429/5xx/connection errors with exponential backoff."""
+    for attempt in range(MAX_ATTEMPTS):
+        try:
+            return fn(*args, **kwargs)
+        except _RETRYABLE:
+            if attempt == MAX_ATTEMPTS - 1:
+                raise
+            time.sleep(BACKOFF_BASE * 2 ** attempt * (1 + random.random() * 0.25))
+
+
+class JobLedger:
+    """Local record of batch jobs.
+
+    Args:
+        path: Database file, created if missing.
+    """
+
+    def __init__(self, path: str = LEDGER_PATH):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.executescript(
+            """
+            CREATE TABLE IF NOT EXISTS jobs (
+                batch_id TEXT PRIMARY KEY,
+                shard_path TEXT,
+                input_file_id TEXT,
+                status TEXT,
+                created_at INTEGER,
+                submitted_at REAL,
+                updated_at REAL,
+                output_file_id TEXT,
+                error_file_id TEXT,
+                request_total INTEGER,
+                request_completed INTEGER,
+                request_failed INTEGER,
+                errors TEXT
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status);
+            CREATE INDEX IF NOT EXISTS jobs_shard ON jobs (shard_path);
+            CREATE TABLE IF NOT EXISTS transitions (
+                batch_id TEXT,
+                status TEXT,
+                observed_at REAL,
+                api_timestamp INTEGER,
+                PRIMARY KEY (batch_id, status)
+            );
+            """
+        )
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+    # ---------------- Writes ----------------
+    def record_submission(self, shard_path: str, input_file_id: str, batch) -> None:
+        """Record a freshly created batch for ``shard_path``."""
+        self.conn.execute(
+            "INSERT OR IGNORE INTO jobs (batch_id, shard_path, input_file_id, submitted_at)"
+            " VALUES (?, ?, ?, ?)",
+            (batch.id, shard_path, input_file_id, time.time()),
+        )
+        self.conn.execute(
+            "UPDATE jobs SET shard_path = ?, input_file_id = ? WHERE batch_id = ?",
+            (shard_path, input_file_id, batch.id),
+        )
+        self.record_batch(batch)
+
+    def record_batch(self, batch) -> bool:
+        """Upsert a batch object from the API; return True if its status changed."""
+        row = self.conn.execute("SELECT status FROM jobs WHERE batch_id = ?", (batch.id,)).fetchone()
+        counts = batch.request_counts
+        errors = batch.errors.model_dump_json() if getattr(batch, "errors", None) else None
+        values = (
+            batch.status, batch.created_at, time.time(), batch.output_file_id, batch.error_file_id,
+            counts.total if counts else None, counts.completed if counts else None,
+            counts.failed if counts else None, errors, batch.input_file_id,
+        )
+        if row is None:
+            self.conn.execute(
+                "INSERT INTO jobs (status, created_at, updated_at, output_file_id, error_file_id,"
+                " request_total, request_completed, request_failed, errors, input_file_id, batch_id)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                values + (batch.id,),
+            )
+        else:
+            self.conn.execute(
+                "UPDATE jobs SET status = ?, created_at = ?, updated_at = ?, output_file_id = ?,"
+                " error_file_id = ?, request_total = ?, request_completed = ?, request_failed = ?,"
+                " errors = ?, input_file_id = COALESCE(input_file_id, ?) WHERE batch_id = ?",
+                values + (batch.id,),
+            )
+
+        changed = row is None or row["status"] != batch.status
+        if changed:
+            api_ts = getattr(batch, f"{batch.status}_at", None) if batch.status != "validating" \
+                else batch.created_at
+            self.conn.execute(
+                "INSERT OR IGNORE INTO transitions VALUES (?, ?, ?, ?)",
+                (batch.id, batch.status, time.time(), api_ts),
+            )
+        self.conn.commit()
+        return changed
+
+    # ---------------- Sync ----------------
+    def sync(self, client, full: bool = False) -> Dict[str, int]:
+        """Walk ``client.batches.list`` pages and record every batch.
+
+        Args:
+            client: OpenAI client.
+            full: Walk all pages instead of stopping at a page of known terminal jobs.
+
+        Returns:
+            Dict[str, int]: Number of batches seen, of status changes and of
+            status-less jobs the API does not know.
+        """
+        seen = changed = 0
+        after = None
+        while True:
+            kwargs = {"limit": PAGE_SIZE}
+            if after:
+                kwargs["after"] = after
+            page = with_backoff(client.batches.list, **kwargs)
+            data = list(page.data)
+
+            page_all_known_terminal = True
+            for b in data:
+                row = self.conn.execute("SELECT status FROM jobs WHERE batch_id = ?", (b.id,)).fetchone()
+                if row is None or row["status"] not in TERMINAL:
+                    page_all_known_terminal = False
+                changed += self.record_batch(b)
+                seen += 1
+
+            has_more = getattr(page, "has_more", None)
+            if has_more is None:
+                has_more = len(data) == PAGE_SIZE
+            if not data or not has_more:
+                break
+            if page_all_known_terminal and not full:
+                # Pages are newest first: keep going only while older in-flight jobs remain
+                oldest_on_page = min(b.created_at for b in data)
+                older_in_flight = self.conn.execute(
+                    "SELECT 1 FROM jobs WHERE (status IS NULL OR status NOT IN"
+                    " ('completed', 'failed', 'expired', 'cancelled')) AND created_at < ? LIMIT 1",
+                    (oldest_on_page,),
+                ).fetchone()
+                if older_in_flight is None:
+                    break
+            after = data[-1].id
+
+        # Status-less jobs have no created_at, so the early stop above cannot wait for them
+        unknown = 0
+        for row in self.conn.execute("SELECT batch_id FROM jobs WHERE status IS NULL").fetchall():
+            try:
+                b = with_backoff(client.batches.retrieve, row["batch_id"])
+            except openai.NotFoundError:
+                unknown += 1
+                continue
+            changed += self.record_batch(b)
+            seen += 1
+        return {"seen": seen, "changed": changed, "unknown": unknown}
+
+    # ---------------- Reads ----------------
+    def jobs(self, statuses: Optional[List[str]] = None) -> List[sqlite3.Row]:
+        if statuses:
+            marks = ",".join("?" * len(statuses))
+            return self.conn.execute(
+                f"SELECT * FROM jobs WHERE status IN ({marks}) ORDER BY created_at", statuses
+            ).fetchall()
+        return self.conn.execute("SELECT * FROM jobs ORDER BY created_at").fetchall()
+
+    def in_flight(self) -> List[sqlite3.Row]:
+        marks = ",".join("?" * len(TERMINAL))
+        return self.conn.execute(
+            f"SELECT * FROM jobs WHERE status IS NULL OR status NOT IN ({marks}) ORDER BY created_at",
+            sorted(TERMINAL),
+        ).fetchall()
+
+    def status_counts(self) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        return {r["status"]: r["n"] for r in rows}
+
+    def history(self, batch_id: str) -> List[sqlite3.Row]:
+        return self.conn.execute(
+            "SELECT * FROM transitions WHERE batch_id = ? ORDER BY observed_at", (batch_id,)
+        ).fetchall()
+
+    # ---------------- Migration ----------------
+    def import_submit_log(self, log_path: str = SUBMIT_LOG) -> int:
+        """Seed shard paths and file ids from an old ``submit_requests.log``."""
+        if not os.path.exists(log_path):
+            return 0
+        imported = 0
+        shard_path = file_id = None
+        with open(log_path, "r", encoding="utf-8") as f:
+            for line in f:
+                m = re.search(r"For path - (.+)$", line)
+                if m:
+                    shard_path = m.group(1).strip()
+                    continue
+                m = re.search(r"batch_file\.id: (\S+)", line)
+                if m:
+                    file_id = m.group(1)
+                    continue
+                m = re.search(r"batch_job\.id: (\S+)", line)
+                if m:
+                    self.conn.execute(
+                        "INSERT OR IGNORE INTO jobs (batch_id, shard_path, input_file_id) VALUES (?, ?, ?)",
+                        (m.group(1), shard_path, file_id),
+                    )
+                    imported += 1
+        self.conn.commit()
+        return imported
+
+
+def print_jobs(ledger: JobLedger) -> None:
+    for r in ledger.jobs():
+        print(f"ID: {r['batch_id']} | Status: {r['status']} | Created: {r['created_at']} | "
+              f"Requests: {r['request_completed']}/{r['request_total']} failed {r['request_failed']} | "
+              f"Shard: {r['shard_path']}")
+    print(json.dumps(ledger.status_counts()))
@@ -0,0 +1,446 @@
+"""Local OpenAI-compatible stand-in for the Files, Batches and Chat Completions APIs.
+
+Lets the classification scripts run and be load-tested offline. Point the
+OpenAI client at it through the standard base-URL setting::
+
+    python src/classification/mock_server.py --port 8089 --latency 0.05 --error-rate 0.01
+    export OPENAI_BASE_URL=http://127.0.0.1:8089/v1 OPENAI_API_KEY=mock
+
+Classifications are deterministic fakes derived from a hash of the sentence,
+answered in the list, packed or compact (c1) format depending on the system
+prompt. Batches move through validating -> in_progress -> finalizing ->
+completed on a configurable clock, and their outputs are built when they
+complete. ``GET /mock/stats`` returns per-endpoint request and error counts.
+Only the standard library is used.
+"""
+
+import argparse
+import email.parser
+import email.policy
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional, Tuple
+from urllib.parse import parse_qs, urlparse
+
+
+class MockConfig:
+    """Behaviour knobs of the mock server.
+
+    Args:
+        latency: Mean added latency per request in seconds (exponentially distributed).
+        error_rate: Share of requests answered with a 500.
+        rate_limit: Requests per minute before answering 429 (0 disables).
+        batch_phase_seconds: Seconds spent in each of validating, in_progress and finalizing.
+        batch_line_error_rate: Share of batch lines that land in the error file.
+        seed: Seed for latency and error sampling.
+    """
+
+    def __init__(self, latency: float = 0.0, error_rate: float = 0.0, rate_limit: int = 0,
+                 batch_phase_seconds: float = 1.0, batch_line_error_rate: float = 0.0, seed: int = 0):
+        self.latency = latency
+        self.error_rate = error_rate
+        self.rate_limit = rate_limit
+        self.batch_phase_seconds = batch_phase_seconds
+        self.batch_line_error_rate = batch_line_error_rate
+        self.rng = random.Random(seed)
+
+
+# ---------------- Fake classifications ----------------
+def fake_answer(sentence: str) -> Tuple[List[int], bool, str]:
+    """Deterministic (sdgs, ai, sentiment) for a sentence."""
+    h = hashlib.sha1((sentence or "").encode("utf-8")).digest()
+    n_sdgs = h[0] % 3
+    sdgs = sorted({1 + h[1 + i] % 17 for i in range(n_sdgs)}) or [0]
+    ai = h[4] % 4 == 0 or "intelligen" in (sentence or "").lower()
+    sentiment = "Positive" if h[5] % 3 else "Negative"
+    return sdgs, ai, sentiment
+
+
+def _format_list(sdgs, ai, sentiment) -> str:
+    return "[" + ", ".join([str(v) for v in sdgs] + [str(ai), sentiment]) + "]"
+
+
+def _format_c1(sdgs, ai, sentiment) -> str:
+    return "".join(f"{v:02d}" for v in sdgs) + ("T" if ai else "F") + sentiment[0]
+
+
+def fake_completion(body: Dict) -> Dict:
+    """Build a chat.completion object answering ``body`` like the real prompts expect."""
+    messages = body.get("messages") or []
+    system = next((m.get("content") or "" for m in messages if m.get("role") == "system"), "")
+    user = next((m.get("content") or "" for m in reversed(messages) if m.get("role") == "user"), "")
+
+    if "numbered SENTENCES" in system:
+        lines = []
+        for line in user.splitlines():
+            m = re.match(r"^(\d+)\.\s*(.*)$", line)
+            if m:
+                lines.append(f"{m.group(1)}. {_format_list(*fake_answer(m.group(2)))}")
+        content = "\n".join(lines)
+    elif "<two-digit goals>" in system:
+        content = _format_c1(*fake_answer(user))
+    else:
+        content = _format_list(*fake_answer(user))
+
+    prompt_tokens = sum(len((m.get("content") or "").split()) for m in messages)
+    completion_tokens = max(1, len(content) // 3)
+    return {
+        "id": f"chatcmpl-mock-{uuid.uuid4().hex[:24]}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "mock"),
+        "choices": [{
+            "index": 0,
+            "message": {"role": "assistant", "content": content, "refusal": None},
+            "logprobs": None,
+            "finish_reason": "stop",
+        }],
+        "usage": {
+            "prompt_tokens": prompt_tokens,
+            "completion_tokens": completion_tokens,
+            "total_tokens": prompt_tokens + completion_tokens,
+        },
+    }
+
+
+# ---------------- State ----------------
+class MockState:
+    """In-memory files and batches, guarded by one lock."""
+
+    PHASES = ["validating", "in_progress", "finalizing", "completed"]
+    TERMINAL = {"completed", "failed", "expired", "cancelled"}
+
+    def __init__(self, config: MockConfig):
+        self.config = config
+        self.lock = threading.Lock()
+        self.files: Dict[str, Dict] = {}
+        self.contents: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict] = {}
+        self.stats: Counter = Counter()
+        self.recent = deque()
+
+    def add_file(self, filename: str, purpose: str, data: bytes) -> Dict:
+        file_id = f"file-{uuid.uuid4().hex[:24]}"
+        obj = {
+            "id": file_id,
+            "object": "file",
+            "bytes": len(data),
+            "created_at": int(time.time()),
+            "filename": filename,
+            "purpose": purpose,
+            "status": "processed",
+        }
+        self.files[file_id] = obj
+        self.contents[file_id] = data
+        return obj
+
+    def create_batch(self, input_file_id: str, endpoint: str, completion_window: str,
+                     metadata: Optional[Dict]) -> Dict:
+        now = time.time()
+        batch_id = f"batch_{uuid.uuid4().hex[:24]}"
+        n = sum(1 for line in self.contents[input_file_id].splitlines() if line.strip())
+        obj = {
+            "id": batch_id,
+            "object": "batch",
+            "endpoint": endpoint,
+            "errors": None,
+            "input_file_id": input_file_id,
+            "completion_window": completion_window,
+            "status": "validating",
+            "output_file_id": None,
+            "error_file_id": None,
+            "created_at": int(now),
+            "in_progress_at": None,
+            "expires_at": int(now) + 24 * 3600,
+            "finalizing_at": None,
+            "completed_at": None,
+            "failed_at": None,
+            "expired_at": None,
+            "cancelling_at": None,
+            "cancelled_at": None,
+            "request_counts": {"total": n, "completed": 0, "failed": 0},
+            "metadata": metadata,
+            "_created": now,
+        }
+        self.batches[batch_id] = obj
+        return obj
+
+    def refresh(self, batch: Dict) -> Dict:
+        """Advance a batch along the phase clock, building outputs on completion."""
+        if batch["status"] in self.TERMINAL:
+            return batch
+        elapsed = time.time() - batch["_created"]
+        phase = min(int(elapsed / max(self.config.batch_phase_seconds, 1e-9)), 3)
+        status = self.PHASES[phase]
+        stamps = {"in_progress": "in_progress_at", "finalizing": "finalizing_at",
+                  "completed": "completed_at"}
+        for p in self.PHASES[1:phase + 1]:
+            if batch[stamps[p]] is None:
+                batch[stamps[p]] = int(time.time())
+        if status == "completed":
+            self._complete(batch)
+        batch["status"] = status
+        return batch
+
+    def _complete(self, batch: Dict) -> None:
+        out_lines, err_lines = [], []
+        rng = random.Random(batch["id"])
+        for line in self.contents[batch["input_file_id"]].splitlines():
+            if not line.strip():
+                continue
+            req = json.loads(line)
+            line_id = f"batch_req_{uuid.uuid4().hex[:24]}"
+            if rng.random() < self.config.batch_line_error_rate:
+                err_lines.append({
+                    "id": line_id,
+                    "custom_id": req.get("custom_id"),
+                    "response": {"status_code": 500, "request_id": uuid.uuid4().hex, "body": {
+                        "error": {"message": "mock server error", "type": "server_error"}}},
+                    "error": None,
+                })
+                continue
+            out_lines.append({
+                "id": line_id,
+                "custom_id": req.get("custom_id"),
+                "response": {"status_code": 200, "request_id": uuid.uuid4().hex,
+                             "body": fake_completion(req.get("body") or {})},
+                "error": None,
+            })
+
+        def dump(rows):
+            return "".join(json.dumps(r, ensure_ascii=False) + "\n" for r in rows).encode("utf-8")
+
+        if out_lines:
+            batch["output_file_id"] = self.add_file(f"{batch['id']}_output.jsonl", "batch_output",
+                                                    dump(out_lines))["id"]
+        if err_lines:
+            batch["error_file_id"] = self.add_file(f"{batch['id']}_error.jsonl", "batch_output",
+                                                   dump(err_lines))["id"]
+        batch["request_counts"]["completed"] = len(out_lines)
+        batch["request_counts"]["failed"] = len(err_lines)
+
+    def public(self, batch: Dict) -> Dict:
+        return {k: v for k, v in batch.items() if not k.startswith("_")}
+
+    def rate_limited(self) -> bool:
+        if not self.config.rate_limit:
+            return False
+        now = time.time()
+        while self.recent and now - self.recent[0] > 60:
+            self.recent.popleft()
+        if len(self.recent) >= self.config.rate_limit:
+            return True
+        self.recent.append(now)
+        return False
+
+
+# ---------------- HTTP layer ----------------
+class MockHandler(BaseHTTPRequestHandler):
+    state: MockState = None
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, fmt, *args):  # keep load tests quiet
+        pass
+
+    def _send_json(self, code: int, obj: Dict, headers: Optional[Dict] = None) -> None:
+        data = json.dumps(obj).encode("utf-8")
+        self._send_bytes(code, data, "application/json", headers)
+
+    def _send_bytes(self, code: int, data: bytes, ctype: str, headers: Optional[Dict] = None) -> None:
+        self.send_response(code)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(data)))
+        self.send_header("x-request-id", f"req_{uuid.uuid4().hex[:24]}")
+        for k, v in (headers or {}).items():
+            self.send_header(k, v)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _error(self, code: int, message: str, etype: str, headers: Optional[Dict] = None) -> None:
+        self._send_json(code, {"error": {"message": message, "type": etype, "param": None,
+                                         "code": None}}, headers)
+
+    def _body(self) -> bytes:
+        length = int(self.headers.get("Content-Length") or 0)
+        return self.rfile.read(length) if length else b""
+
+    def _gate(self, endpoint: str) -> bool:
+        """Apply latency, rate limit and injected errors; return False if already answered."""
+        cfg = self.state.config
+        with self.state.lock:
+            self.state.stats[endpoint] += 1
+            limited = self.state.rate_limited()
+            fail = cfg.rng.random() < cfg.error_rate
+            delay = cfg.rng.expovariate(1 / cfg.latency) if cfg.latency > 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        if limited:
+            with self.state.lock:
+                self.state.stats[f"{endpoint}:429"] += 1
+            self._error(429, "Rate limit reached (mock)", "requests", {"retry-after": "1"})
+            return False
+        if fail:
+            with self.state.lock:
+                self.state.stats[f"{endpoint}:500"] += 1
+            self._error(500, "Injected server error (mock)", "server_error")
+            return False
+        return True
+
+    def do_GET(self):
+        url = urlparse(self.path)
+        path = url.path.rstrip("/")
+        st = self.state
+
+        if path == "/mock/stats":
+            with st.lock:
+                return self._send_json(200, dict(st.stats))
+
+        if path == "/v1/batches":
+            if not self._gate("batches.list"):
+                return
+            q = parse_qs(url.query)
+            limit = int(q.get("limit", ["20"])[0])
+            after = q.get("after", [None])[0]
+            with st.lock:
+                ordered = sorted(st.batches.values(), key=lambda b: b["_created"], reverse=True)
+                if after:
+                    ids = [b["id"] for b in ordered]
+                    ordered = ordered[ids.index(after) + 1:] if after in ids else []
+                page = [st.public(st.refresh(b)) for b in ordered[:limit]]
+                has_more = len(ordered) > limit
+            return self._send_json(200, {
+                "object": "list",
+                "data": page,
+                "first_id": page[0]["id"] if page else None,
+                "last_id": page[-1]["id"] if page else None,
+                "has_more": has_more,
+            })
+
+        m = re.fullmatch(r"/v1/batches/([^/]+)", path)
+        if m:
+            if not self._gate("batches.retrieve"):
+                return
+            with st.lock:
+                batch = st.batches.get(m.group(1))
+                obj = st.public(st.refresh(batch)) if batch else None
+            if obj is None:
+                return self._error(404, "No such batch", "invalid_request_error")
+            return self._send_json(200, obj)
+
+        m = re.fullmatch(r"/v1/files/([^/]+)/content", path)
+        if m:
+            if not self._gate("files.content"):
+                return
+            with st.lock:
+                data = st.contents.get(m.group(1))
+            if data is None:
+                return self._error(404, "No such file", "invalid_request_error")
+            return self._send_bytes(200, data, "application/octet-stream")
+
+        m = re.fullmatch(r"/v1/files/([^/]+)", path)
+        if m:
+            if not self._gate("files.retrieve"):
+                return
+            with st.lock:
+                obj = st.files.get(m.group(1))
+            if obj is None:
+                return self._error(404, "No such file", "invalid_request_error")
+            return self._send_json(200, obj)
+
+        self._error(404, f"Unknown path {path}", "invalid_request_error")
+
+    def do_POST(self):
+        path = urlparse(self.path).path.rstrip("/")
+        st = self.state
+        raw = self._body()
+
+        if path == "/v1/chat/completions":
+            if not self._gate("chat.completions"):
+                return
+            return self._send_json(200, fake_completion(json.loads(raw or b"{}")))
+
+        if path == "/v1/files":
+            if not self._gate("files.create"):
+                return
+            ctype = self.headers.get("Content-Type", "")
+            msg = email.parser.BytesParser(policy=email.policy.HTTP).parsebytes(
+                b"Content-Type: " + ctype.encode("latin-1") + b"\r\n\r\n" + raw
+            )
+            purpose, filename, data = "batch", "upload.jsonl", b""
+            for part in msg.iter_parts():
+                name = part.get_param("name", header="content-disposition")
+                if name == "purpose":
+                    purpose = part.get_payload(decode=True).decode("utf-8")
+                elif name == "file":
+                    filename = part.get_filename() or filename
+                    data = part.get_payload(decode=True)
+            with st.lock:
+                obj = st.add_file(filename, purpose, data)
+            return self._send_json(200, obj)
+
+        if path == "/v1/batches":
+            if not self._gate("batches.create"):
+                return
+            req = json.loads(raw or b"{}")
+            with st.lock:
+                if req.get("input_file_id") not in st.contents:
+                    obj = None
+                else:
+                    obj = st.public(st.create_batch(req["input_file_id"], req.get("endpoint"),
+                                                    req.get("completion_window"), req.get("metadata")))
+            if obj is None:
+                return self._error(400, "Unknown input_file_id", "invalid_request_error")
+            return self._send_json(200, obj)
+
+        m = re.fullmatch(r"/v1/batches/([^/]+)/cancel", path)
+        if m:
+            if not self._gate("batches.cancel"):
+                return
+            with st.lock:
+                batch = st.batches.get(m.group(1))
+                if batch and batch["status"] not in st.TERMINAL:
+                    batch["status"] = "cancelled"
+                    batch["cancelled_at"] = int(time.time())
+                obj = st.public(batch) if batch else None
+            if obj is None:
+                return self._error(404, "No such batch", "invalid_request_error")
+            return self._send_json(200, obj)
+
+        self._error(404, f"Unknown path {path}", "invalid_request_error")
+
+
+def make_server(host: str = "127.0.0.1", port: int = 8089, config: Optional[MockConfig] = None):
+    """Create (but do not start) a threaded mock server."""
+    handler = type("BoundMockHandler", (MockHandler,), {"state": MockState(config or MockConfig())})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.split("\n")[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    parser.add_argument("--rate-limit", type=int, default=0, help="requests per minute, 0 = off")
+    parser.add_argument("--batch-phase-seconds", type=float, default=1.0)
+    parser.add_argument("--batch-line-error-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    server = make_server(args.host, args.port, MockConfig(
+        latency=args.latency,
+        error_rate=args.error_rate,
+        rate_limit=args.rate_limit,
+        batch_phase_seconds=args.batch_phase_seconds,
+        batch_line_error_rate=args.batch_line_error_rate,
+        seed=args.seed,
+    ))
+    print(f"Mock OpenAI API on http://{args.host}:{args.port}/v1")
+    server.serve_forever()
@@ -0,0 +1,53 @@
+"""Compact, versioned answer encoding for the classification prompt.
+
+Version ``c1`` encodes an answer as fixed-width two-digit SDG codes followed by
+one AI flag character and one sentiment character::
+
+    [1, 5, True, Negative]   ->  0105TN
+    [11, 12, False, Negative] -> 1112FN
+    [0, False, Positive]     ->  00FP
+
+The parser is a single anchored regex with no fallbacks: anything that does
+not match is rejected (``None``) and handled by the caller.
+"""
+
+import re
+from typing import List, Optional, Union
+
+COMPACT_VERSION = "c1"
+COMPACT_MAX_TOKENS = 16  # 17 codes (34 digits) + 2 flags tokenize to ~13 tokens
+
+_C1_RE = re.compile(r"((?:\d\d)+)([TF])([PN])")
+_SENTIMENTS = {"P": "Positive", "N": "Negative"}
+
+
+def encode_c1(sdgs: List[int], ai: bool, sentiment: str) -> str:
+    """Encode an answer in the ``c1`` format (inverse of ``parse_c1``)."""
+    codes = "".join(f"{int(v):02d}" for v in (sdgs or [0]))
+    return f"{codes}{'T' if ai else 'F'}{sentiment[0].upper()}"
+
+
+def parse_c1(s: Optional[str]) -> Optional[List[Union[int, bool, str]]]:
+    """Decode a ``c1`` answer into the list shape of ``parse_assistant_content``.
+
+    Returns ``[sdg, ..., ai_flag, sentiment]`` (e.g. ``[1, 5, True, "Negative"]``)
+    or ``None`` if ``s`` is not a well-formed ``c1`` answer.
+    """
+    if not s:
+        return None
+    m = _C1_RE.fullmatch(s.strip())
+    if m is None:
+        return None
+    codes = m.group(1)
+    out: List[Union[int, bool, str]] = [int(codes[i:i + 2]) for i in range(0, len(codes), 2)]
+    out.append(m.group(2) == "T")
+    out.append(_SENTIMENTS[m.group(3)])
+    return out
+
+
+PARSERS = {"c1": parse_c1}
+
+
+def parse_compact(s: Optional[str], version: str = COMPACT_VERSION):
+    """Parse ``s`` with the parser registered for ``version``."""
+    return PARSERS[version](s)
@@ -0,0 +1,313 @@
+"""Packed multi-sentence requests to amortize the system prompt.
+
+Single-sentence request shards are repacked into requests of ``PACK_SIZE``
+numbered sentences sharing one ``PACKED_SYS_PROMPT``. ``packs.jsonl`` maps
+each pack custom_id to its member custom_ids and sentences. After the packed
+batch completes, ``unpack_results`` maps every answer line back to its
+member custom_id in the usual batch-output format, and re-queues members with
+a missing or malformed answer as single-sentence requests.
+"""
+
+import json
+import os
+import random
+import re
+import sys
+from typing import Dict, List, Optional, Tuple
+
+from openai import OpenAI
+from tqdm import tqdm
+
+from src.classification.prompts import SYS_PROMPT, create_batch_object, create_packed_batch_object
+from src.classification.sharding import ShardWriter
+from src.utils.file_utils import iter_jsonl
+
+MODEL = "gpt-4.1-mini"
+PACK_SIZE = 10
+SINGLE_DIR = os.path.join("data", "batches_41_mini", "patched_max_tokens_50")
+PACKED_DIR = os.path.join("data", "batches_41_mini_packed")
+PACKED_RESULTS_DIR = os.path.join("data", "batch_results_packed")  # raw packed outputs
+RESULTS_DIR = os.path.join("data", "batch_results")                # unpacked, per-sentence
+REQUEUE_DIR = os.path.join(PACKED_DIR, "requeue")
+PACKS_INDEX = os.path.join(PACKED_DIR, "packs.jsonl")
+
+_LINE_RE = re.compile(r"^\s*(\d+)\s*[.:)]\s*(\[[^\[\]]*\])\s*$")
+_ANSWER_RE = re.compile(r"^\[\s*(?:\d+\s*,\s*)+(?:True|False)\s*,\s*(?:Positive|Negative)\s*\]$")
+
+
+def _user_content(obj: Dict) -> Optional[str]:
+    for m in reversed(obj.get("body", {}).get("messages", [])):
+        if m.get("role") == "user":
+            return m.get("content")
+    return None
+
+
+def parse_packed_content(content: Optional[str], n: int) -> Dict[int, str]:
+    """Strictly parse a packed answer into ``{sentence_number: answer_list}``.
+
+    Every non-empty line must be ``<k>. [..., True/False, Positive/Negative]``
+    with ``1 <= k <= n``. Lines that do not match, and numbers answered more
+    than once, are left out so the caller re-queues those sentences.
+
+    Args:
+        content: Assistant message content of a packed request.
+        n: Number of sentences in the pack.
+
+    Returns:
+        Dict[int, str]: Answer list strings keyed by 1-based sentence number.
+    """
+
+    answers: Dict[int, str] = {}
+    duplicates = set()
+    for line in (content or "").splitlines():
+        m = _LINE_RE.match(line)
+        if not m:
+            continue
+        k, answer = int(m.group(1)), m.group(2)
+        if not 1 <= k <= n or not _ANSWER_RE.match(answer):
+            continue
+        if k in answers:
+            duplicates.add(k)
+        answers[k] = answer
+    for k in duplicates:
+        del answers[k]
+    return answers
+
+
+def pack_shards(single_dir: str = SINGLE_DIR, packed_dir: str = PACKED_DIR,
+                pack_size: int = PACK_SIZE, model: str = MODEL) -> None:
+    """Repack single-sentence request shards into packed request shards.
+
+    Args:
+        single_dir: Directory with single-sentence ``batch_*.jsonl`` shards.
+        packed_dir: Output directory for packed shards and ``packs.jsonl``.
+        pack_size: Sentences per packed request.
+        model: Model name for the packed requests.
+    """
+
+    os.makedirs(packed_dir, exist_ok=True)
+    shard_paths = sorted(
+        os.path.join(single_dir, f) for f in os.listdir(single_dir)
+        if f.startswith("batch_") and f.endswith(".jsonl")
+    )
+
+    n_packs = 0
+    pending: List[Tuple[str, str]] = []
+
+    with ShardWriter(packed_dir, model=model) as writer, \
+            open(os.path.join(packed_dir, "packs.jsonl"), "w", encoding="utf-8") as index:
+
+        def flush():
+            nonlocal n_packs, pending
+            pack_id = f"pack-{n_packs}"
+            writer.write(create_packed_batch_object([s for _, s in pending], pack_id, model=model))
+            index.write(json.dumps({
+                "custom_id": pack_id,
+                "members": [{"custom_id": cid, "sentence": s} for cid, s in pending],
+            }, ensure_ascii=False) + "\n")
+            n_packs += 1
+            pending = []
+
+        for path in tqdm(shard_paths, desc="Packing"):
+            for obj in iter_jsonl(path):
+                pending.append((obj["custom_id"], _user_content(obj) or ""))
+                if len(pending) >= pack_size:
+                    flush()
+        if pending:
+            flush()
+
+    print(f"Wrote {n_packs} packed requests in {len(writer.shards)} shards to {packed_dir}")
+
+
+def _single_request(custom_id: str, sentence: str, model: str) -> Dict:
+    """Single-sentence request patched like the shards in ``SINGLE_DIR``."""
+    obj = create_batch_object(sentence, None, None, model=model, custom_id=custom_id)
+    body = obj["body"]
+    body["max_tokens"] = body.pop("max_output_tokens")
+    return obj
+
+
+def _split_usage(total: Optional[int], n: int, k: int) -> int:
+    """Integer share of member ``k`` (1-based) of a pack total; the first member takes the remainder."""
+    total = int(total or 0)
+    return total // n + (total % n if k == 1 else 0)
+
+
+def _unpack_file(path: str, packs: Dict[str, List[Dict]], results_dir: str,
+                 requeue: ShardWriter, model: str, seen: set) -> Tuple[int, int]:
+    name = os.path.splitext(os.path.basename(path))[0]
+    out_path = os.path.join(results_dir, f"unpacked_{name}.jsonl")
+
+    answered = requeued = 0
+    with open(out_path, "w", encoding="utf-8") as out:
+        for obj in iter_jsonl(path):
+            members = packs.get(obj.get("custom_id"))
+            if members is None:
+                continue
+            seen.add(obj["custom_id"])
+
+            resp = obj.get("response") or {}
+            body = resp.get("body") or {}
+            answers: Dict[int, str] = {}
+            if resp.get("status_code") == 200:
+                choices = body.get("choices") or []
+                content = ((choices[0].get("message") or {}).get("content")) if choices else None
+                answers = parse_packed_content(content, len(members))
+
+            usage = body.get("usage") or {}
+            n = len(members)
+            for k, member in enumerate(members, start=1):
+                if k not in answers:
+                    requeue.write(_single_request(member["custom_id"], member["sentence"], model))
+                    requeued += 1
+                    continue
+                out.write(json.dumps({
+                    "id": obj.get("id"),
+                    "custom_id": member["custom_id"],
+                    "response": {
+                        "status_code": 200,
+                        "body": {
+                            "choices": [{"message": {"role": "assistant", "content": answers[k]}}],
+                            "usage": {
+                                "prompt_tokens": _split_usage(usage.get("prompt_tokens"), n, k),
+                                "completion_tokens": _split_usage(usage.get("completion_tokens"), n, k),
+                            },
+                        },
+                    },
+                    "error": None,
+                }, ensure_ascii=False) + "\n")
+                answered += 1
+    return answered, requeued
+
+
+def unpack_results(packed_results_paths: List[str], packs_index: str = PACKS_INDEX,
+                   results_dir: str = RESULTS_DIR, requeue_dir: str = REQUEUE_DIR,
+                   model: str = MODEL) -> Dict[str, int]:
+    """Map packed answers back to member custom_ids and re-queue the rest.
+
+    Answered members are written to ``results_dir/unpacked_<name>.jsonl`` in
+    the batch output format read by ``extract_results.py``; token usage is
+    split evenly across the members of a pack in whole tokens, the first
+    member taking the remainder. Members of failed packs, of packs absent
+    from all outputs, or with a missing/malformed answer line are written to
+    single-sentence request shards in ``requeue_dir``.
+
+    Args:
+        packed_results_paths: All downloaded batch outputs of one packed run.
+        packs_index: ``packs.jsonl`` written by ``pack_shards``.
+        results_dir: Directory for the unpacked per-sentence results.
+        requeue_dir: Directory for the re-queue request shards.
+        model: Model name for the re-queued requests.
+
+    Returns:
+        Dict[str, int]: Counts of answered and re-queued sentences.
+    """
+
+    packs: Dict[str, List[Dict]] = {}
+    with open(packs_index, "r", encoding="utf-8") as f:
+        for line in f:
+            entry = json.loads(line)
+            packs[entry["custom_id"]] = entry["members"]
+
+    os.makedirs(results_dir, exist_ok=True)
+    answered = requeued = 0
+    seen = set()
+    with ShardWriter(requeue_dir, model=model) as requeue:
+        for path in tqdm(packed_results_paths, desc="Unpacking"):
+            a, r = _unpack_file(path, packs, results_dir, requeue, model, seen)
+            answered += a
+            requeued += r
+
+        # Packs with no result line at all (e.g. expired batches)
+        for pack_id, members in packs.items():
+            if pack_id in seen:
+                continue
+            for member in members:
+                requeue.write(_single_request(member["custom_id"], member["sentence"], model))
+                requeued += 1
+
+    print(f"Answered: {answered}, re-queued: {requeued}")
+    return {"answered": answered, "requeued": requeued}
+
+
+def _normalize_answer(answer: Optional[str]):
+    """Reduce an answer list to ``(sdg_set, ai_flag, sentiment)`` for comparison."""
+    if not answer:
+        return None
+    parts = [p.strip() for p in answer.strip().strip("[]").split(",") if p.strip()]
+    if len(parts) < 2:
+        return None
+    sdgs = frozenset(p for p in parts[:-2])
+    return sdgs, parts[-2], parts[-1]
+
+
+def compare_modes(single_dir: str = SINGLE_DIR, sample_size: int = 200,
+                  pack_size: int = PACK_SIZE, model: str = MODEL, seed: int = 0) -> Dict:
+    """Classify a sample in single and packed mode and report agreement.
+
+    Args:
+        single_dir: Directory with single-sentence request shards to sample from.
+        sample_size: Number of sentences to compare.
+        pack_size: Sentences per packed request.
+        model: Model name for both modes.
+        seed: Sampling seed.
+
+    Returns:
+        Dict: Agreement rates on SDG sets, AI flag, sentiment and the full answer,
+        the packed parse-failure rate and prompt tokens used by each mode.
+    """
+
+    client = OpenAI()
+    sentences = []
+    for f in sorted(os.listdir(single_dir)):
+        if f.startswith("batch_") and f.endswith(".jsonl"):
+            sentences.extend(_user_content(o) for o in iter_jsonl(os.path.join(single_dir, f)))
+    sample = random.Random(seed).sample(sentences, min(sample_size, len(sentences)))
+
+    single, tokens_single = [], 0
+    for s in tqdm(sample, desc="Single"):
+        resp = client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": SYS_PROMPT}, {"role": "user", "content": s}],
+            max_tokens=50,
+        )
+        single.append(resp.choices[0].message.content)
+        tokens_single += resp.usage.prompt_tokens
+
+    packed, tokens_packed = [], 0
+    for i in tqdm(range(0, len(sample), pack_size), desc="Packed"):
+        chunk = sample[i:i + pack_size]
+        body = create_packed_batch_object(chunk, f"pack-{i}", model=model)["body"]
+        resp = client.chat.completions.create(**body)
+        answers = parse_packed_content(resp.choices[0].message.content, len(chunk))
+        packed.extend(answers.get(k) for k in range(1, len(chunk) + 1))
+        tokens_packed += resp.usage.prompt_tokens
+
+    pairs = [(_normalize_answer(a), _normalize_answer(b)) for a, b in zip(single, packed)]
+    valid = [(a, b) for a, b in pairs if a is not None and b is not None]
+    n = max(len(valid), 1)
+    report = {
+        "sample_size": len(sample),
+        "packed_parse_failures": sum(b is None for b in packed),
+        "sdg_agreement": sum(a[0] == b[0] for a, b in valid) / n,
+        "ai_agreement": sum(a[1] == b[1] for a, b in valid) / n,
+        "sentiment_agreement": sum(a[2] == b[2] for a, b in valid) / n,
+        "exact_agreement": sum(a == b for a, b in valid) / n,
+        "prompt_tokens_single": tokens_single,
+        "prompt_tokens_packed": tokens_packed,
+    }
+    print(json.dumps(report, indent=2))
+    return report
+
+
+if __name__ == "__main__":
+    cmd = sys.argv[1] if len(sys.argv) > 1 else "pack"
+    if cmd == "pack":
+        pack_shards()
+    elif cmd == "unpack":
+        unpack_results(sorted(
+            os.path.join(PACKED_RESULTS_DIR, f) for f in os.listdir(PACKED_RESULTS_DIR)
+            if f.endswith(".jsonl")
+        ))
+    elif cmd == "compare":
+        compare_modes()
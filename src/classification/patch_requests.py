@@ -2,11 +2,16 @@ import os, json, shutil
 
 from tqdm import tqdm
 
+from src.classification.sharding import MANIFEST_NAME, remove_shards
+
 BATCH_DIR = os.path.join("data", "batches_41_mini")
 PATCHED_DIR = os.path.join(BATCH_DIR, "patched_max_tokens_50")
 os.makedirs(PATCHED_DIR, exist_ok=True)
+remove_shards(PATCHED_DIR)  # patched copies of shards an earlier run had
 
 for fname in tqdm(os.listdir(BATCH_DIR)):
+    if fname == MANIFEST_NAME:
+        shutil.copyfile(os.path.join(BATCH_DIR, fname), os.path.join(PATCHED_DIR, fname))
     if not fname.endswith(".jsonl"):
         continue
     src = os.path.join(BATCH_DIR, fname)
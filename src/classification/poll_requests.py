@@ -1,25 +1,18 @@
 import os
 from openai import OpenAI
 
+from src.classification.download import ERRORS_DIR, RESULTS_DIR, download_completed
+from src.classification.job_ledger import JobLedger
+
 client = OpenAI()
 
-SAVE_DIR = os.path.join("data", "batch_results")
+SAVE_DIR = RESULTS_DIR
 os.makedirs(SAVE_DIR, exist_ok=True)
+os.makedirs(ERRORS_DIR, exist_ok=True)
 
-# List batches (adjust limit if you have more)
-batches = client.batches.list(limit=100)
-
-for b in batches.data:
-    if b.status == "finalizing" and b.output_file_id:
-        print(f"Downloading results for {b.id} ...")
-
-        # Retrieve the file content
-        content = client.files.content(b.output_file_id).read().decode("utf-8")
-
-        # Save locally
-        save_path = os.path.join(SAVE_DIR, f"{b.id}.jsonl")
-        if not os.path.exists(save_path):
-            with open(save_path, "w", encoding="utf-8") as f:
-                f.write(content)
+with JobLedger() as ledger:
+    print(ledger.sync(client))
 
-            print(f"Saved: {save_path}")
+    # Stream outputs and error files of finished jobs, several at a time
+    reports = download_completed(client, ledger, results_dir=SAVE_DIR)
+    print(f"Downloaded/verified {len(reports)} jobs, {sum(not r['ok'] for r in reports)} with problems")
@@ -1,5 +1,9 @@
+from typing import List
+
 from openai import OpenAI
 
+from src.classification.output_format import COMPACT_MAX_TOKENS
+
 SYS_PROMPT = """
 Your goal is to classify a given SENTENCE in the following order:
 1) Generate a classification for the SENTENCE into one or more Sustainable Development Goals as a list. 
@@ -16,6 +20,44 @@ example2 - [11, 12, False, Negative]
 example3 - [0, False, Positive]
 """
 
+PACKED_SYS_PROMPT = """
+You will receive several numbered SENTENCES. Classify each SENTENCE independently in the following order:
+1) Generate a classification for the SENTENCE into one or more Sustainable Development Goals as a list. 
+Think if the sentence relates to one or more SDGs. There can be many SDGs applicable to the sentence, but list only the most relevant ones.
+If SENTENCE doesn't seem into any SDGs, just return 0 instead of a goal
+2) Classify as True if the SENTENCE mentions Artificial Intelligence and related technologies, else False - append to the list.
+3) Classify the sentiment of the text as Positive or Negative and append to the list.
+
+Answer with exactly one line per SENTENCE, in input order, prefixed by its number, and nothing else:
+<number>. [SDGA, SDGB, ..., True/False, Positive/Negative]
+
+example -
+1. [1, 5, True, Negative]
+2. [11, 12, False, Negative]
+3. [0, False, Positive]
+"""
+MAX_TOKENS = 50  # output cap of a single-sentence request
+# Packed answers carry the same list per sentence plus a "<n>. " prefix, so each
+# sentence gets the single-sentence cap; unused tokens are not billed.
+PACKED_TOKENS_PER_SENTENCE = MAX_TOKENS
+
+# Output grammar version c1, see src/classification/output_format.py
+COMPACT_SYS_PROMPT = """
+Your goal is to classify a given SENTENCE in the following order:
+1) Generate a classification for the SENTENCE into one or more Sustainable Development Goals.
+Think if the sentence relates to one or more SDGs. There can be many SDGs applicable to the sentence, but list only the most relevant ones.
+Write each goal as two digits (01 to 17). If SENTENCE doesn't seem into any SDGs, write 00 instead of a goal
+2) Append T if the SENTENCE mentions Artificial Intelligence and related technologies, else F.
+3) Append P if the sentiment of the text is Positive, else N for Negative.
+
+Provide the answer strictly as a single string with no spaces or other text:
+<two-digit goals><T/F><P/N>
+
+example1 - 0105TN
+example2 - 1112FN
+example3 - 00FP
+"""
+
 
 def get_classifications(client, sentence, model="gpt-4.1-mini"):
     response = client.chat.completions.create(
@@ -30,16 +72,18 @@ def get_classifications(client, sentence, model="gpt-4.1-mini"):
                 "content": sentence
             }
         ],
-        max_tokens = 50
+        max_tokens = MAX_TOKENS
     )
-    print(response)
     return response.choices[0].message.content.strip()
 
-def create_batch_object(sentence: str, sentence_id: str, csv_path: str, model="gpt-4.1-mini"):
+def create_batch_object(sentence: str, sentence_id: str, csv_path: str, model="gpt-4.1-mini", custom_id=None):
+    """Single-sentence batch object; ``custom_id`` overrides the one derived from ``csv_path``."""
 
-    splits = csv_path.split("/")
+    if custom_id is None:
+        splits = csv_path.split("/")
+        custom_id = f"task-{sentence_id}-{splits[-3]}-{splits[-2]}"
     batch_obj = {
-        "custom_id": f"task-{sentence_id}-{splits[-3]}-{splits[-2]}",
+        "custom_id": custom_id,
         "method": "POST",
         "url": "/v1/chat/completions",
         "body": {
@@ -55,7 +99,41 @@ def create_batch_object(sentence: str, sentence_id: str, csv_path: str, model="g
                     "content": sentence
                 }
             ],
-            "max_output_tokens": 50
+            "max_output_tokens": MAX_TOKENS
+        }
+    }
+
+    return batch_obj
+
+def create_compact_batch_object(sentence: str, sentence_id: str, csv_path: str, model="gpt-4.1-mini"):
+    """Batch object using the compact ``c1`` output grammar and a tight ``max_tokens``."""
+    batch_obj = create_batch_object(sentence, sentence_id, csv_path, model=model)
+    body = batch_obj["body"]
+    body["messages"][0]["content"] = COMPACT_SYS_PROMPT
+    body.pop("max_output_tokens", None)
+    body["max_tokens"] = COMPACT_MAX_TOKENS
+    return batch_obj
+
+def create_packed_batch_object(sentences: List[str], pack_id: str, model="gpt-4.1-mini"):
+    """Batch object classifying several numbered sentences in one request."""
+    numbered = "\n".join(f"{i}. {' '.join(s.split())}" for i, s in enumerate(sentences, start=1))
+    batch_obj = {
+        "custom_id": pack_id,
+        "method": "POST",
+        "url": "/v1/chat/completions",
+        "body": {
+            "model": model,
+            "messages": [
+                {
+                    "role": "system",
+                    "content": PACKED_SYS_PROMPT
+                },
+                {
+                    "role": "user",
+                    "content": numbered
+                }
+            ],
+            "max_tokens": PACKED_TOKENS_PER_SENTENCE * len(sentences)
         }
     }
 
@@ -0,0 +1,218 @@
+"""Asyncio real-time classification for small incremental runs.
+
+Reads request shards in the batch input format (as written by
+``batch_requests.py``) and sends them to the Chat Completions endpoint
+concurrently instead of waiting for the 24h batch window. Throughput is held
+under the org limits by two token buckets, one for requests and one for
+tokens, and 429/5xx/connection errors are retried with exponential backoff.
+
+Every result is appended to ``data/batch_results/realtime_<shard>.jsonl`` in
+the batch output format, so ``extract_results.py`` picks it up unchanged. A
+rerun skips custom_ids that already have a successful line.
+
+Point ``OPENAI_BASE_URL`` at a local mock server to run it offline.
+
+Usage:
+    python src/classification/realtime.py data/batches_41_mini_pse/batch_0.jsonl [...]
+"""
+
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+import uuid
+from typing import Dict, List, Optional, Set
+
+import httpx
+import openai
+from openai import AsyncOpenAI
+
+from src.classification.sharding import TokenEstimator
+from src.utils.file_utils import iter_jsonl
+
+MODEL = "gpt-4.1-mini"
+RESULTS_DIR = os.path.join("data", "batch_results")
+
+CONCURRENCY = 32
+REQUESTS_PER_MIN = 5000
+TOKENS_PER_MIN = 2_000_000
+MAX_ATTEMPTS = 6
+BACKOFF_BASE = 1.0   # seconds, doubled per attempt
+BACKOFF_MAX = 60.0
+TIMEOUT = 60.0
+
+_RETRYABLE = (
+    openai.RateLimitError,
+    openai.InternalServerError,
+    openai.APIConnectionError,
+    openai.APITimeoutError,
+)
+
+
+class TokenBucket:
+    """Async token bucket refilled continuously at ``rate`` units per second.
+
+    Args:
+        rate: Refill rate in units per second.
+        capacity: Maximum burst size.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        amount = min(amount, self.capacity)  # an oversized request waits for a full bucket
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+
+def _retry_after(exc: Exception) -> Optional[float]:
+    response = getattr(exc, "response", None)
+    if response is None:
+        return None
+    try:
+        return float(response.headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+def _done_ids(out_path: str) -> Set[str]:
+    done = set()
+    if not os.path.exists(out_path):
+        return done
+    for obj in iter_jsonl(out_path):  # skips a torn last line from an interrupted run
+        if (obj.get("response") or {}).get("status_code") == 200:
+            done.add(obj.get("custom_id"))
+    return done
+
+
+class RealtimeClassifier:
+    """Concurrent, rate-limited Chat Completions client with JSONL checkpoints.
+
+    Args:
+        model: Model name used for token estimation.
+        concurrency: Number of in-flight requests and pooled connections.
+        requests_per_min: Request rate limit.
+        tokens_per_min: Token rate limit (input estimate plus ``max_tokens``).
+        base_url: API base URL; defaults to ``OPENAI_BASE_URL`` or the public API.
+    """
+
+    def __init__(
+        self,
+        model: str = MODEL,
+        concurrency: int = CONCURRENCY,
+        requests_per_min: int = REQUESTS_PER_MIN,
+        tokens_per_min: int = TOKENS_PER_MIN,
+        base_url: Optional[str] = None,
+    ):
+        self.concurrency = concurrency
+        self.estimate_tokens = TokenEstimator(model)
+        self.requests_per_min = requests_per_min
+        self.tokens_per_min = tokens_per_min
+        self.base_url = base_url
+        self.stats = {"ok": 0, "failed": 0, "retries": 0}
+
+    async def _call(self, client: AsyncOpenAI, obj: Dict) -> Dict:
+        body = obj["body"]
+        cost = self.estimate_tokens(obj) + (body.get("max_tokens") or body.get("max_output_tokens") or 0)
+        params = dict(body)
+        if "max_output_tokens" in params:  # batch shards use the Responses-API name
+            params["max_tokens"] = params.pop("max_output_tokens")
+
+        for attempt in range(MAX_ATTEMPTS):
+            await self.request_bucket.acquire(1)
+            await self.token_bucket.acquire(cost)
+            try:
+                raw = await client.chat.completions.with_raw_response.create(**params)
+                completion = raw.parse()
+                return {
+                    "status_code": 200,
+                    "request_id": raw.headers.get("x-request-id"),
+                    "body": completion.model_dump(),
+                }
+            except _RETRYABLE as e:
+                if attempt == MAX_ATTEMPTS - 1:
+                    return {"status_code": getattr(e, "status_code", None), "error": str(e)}
+                self.stats["retries"] += 1
+                delay = _retry_after(e) or min(BACKOFF_MAX, BACKOFF_BASE * 2 ** attempt)
+                await asyncio.sleep(delay * (1 + random.random() * 0.25))
+            except openai.APIStatusError as e:  # 4xx other than 429: not worth retrying
+                return {"status_code": e.status_code, "error": str(e)}
+
+    async def run(self, requests: List[Dict], out_path: str) -> Dict[str, int]:
+        """Classify ``requests`` and append results to ``out_path``.
+
+        Args:
+            requests: Batch input objects with ``custom_id`` and ``body``.
+            out_path: Checkpoint file in the batch output format.
+
+        Returns:
+            Dict[str, int]: Counts of successful, failed and retried calls.
+        """
+        self.stats = {"ok": 0, "failed": 0, "retries": 0}
+        # Buckets hold an asyncio.Lock, so they are created inside the running loop
+        self.request_bucket = TokenBucket(self.requests_per_min / 60, max(1, self.requests_per_min / 60))
+        self.token_bucket = TokenBucket(self.tokens_per_min / 60, self.tokens_per_min / 60)
+        done = _done_ids(out_path)
+        queue: asyncio.Queue = asyncio.Queue()
+        for obj in requests:
+            if obj.get("custom_id") not in done:
+                queue.put_nowait(obj)
+
+        limits = httpx.Limits(max_connections=self.concurrency,
+                              max_keepalive_connections=self.concurrency)
+        http_client = httpx.AsyncClient(limits=limits, timeout=TIMEOUT)
+        client = AsyncOpenAI(base_url=self.base_url, max_retries=0, http_client=http_client)
+
+        os.makedirs(os.path.dirname(out_path) or ".", exist_ok=True)
+        with open(out_path, "a", encoding="utf-8") as out:
+
+            async def worker():
+                while True:
+                    try:
+                        obj = queue.get_nowait()
+                    except asyncio.QueueEmpty:
+                        return
+                    result = await self._call(client, obj)
+                    ok = result["status_code"] == 200
+                    self.stats["ok" if ok else "failed"] += 1
+                    out.write(json.dumps({
+                        "id": f"rt_{uuid.uuid4().hex}",
+                        "custom_id": obj["custom_id"],
+                        "response": {k: v for k, v in result.items() if k != "error"},
+                        "error": None if ok else {"message": result.get("error")},
+                    }, ensure_ascii=False) + "\n")
+                    out.flush()
+
+            try:
+                await asyncio.gather(*(worker() for _ in range(self.concurrency)))
+            finally:
+                await client.close()
+
+        return dict(self.stats)
+
+
+def main(paths: List[str]):
+    classifier = RealtimeClassifier()
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        out_path = os.path.join(RESULTS_DIR, f"realtime_{name}.jsonl")
+        stats = asyncio.run(classifier.run(list(iter_jsonl(path)), out_path))
+        print(f"{path} -> {out_path}: {stats}")
+
+
+if __name__ == "__main__":
+    main(sys.argv[1:])
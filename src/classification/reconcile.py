@@ -0,0 +1,135 @@
+"""Reconcile request shards against batch results and write delta shards.
+
+Every custom_id in the request shards ends up in one of three buckets:
+
+- ``ok``: a ``status_code == 200`` line exists in any results file (batch,
+  real-time, unpacked or cache hits; a later success overrides a failure),
+- ``failed``: only non-200 lines in results or error files,
+- ``missing``: never came back at all (expired/cancelled batches, lost files).
+
+Failed and missing requests are copied into compact delta shards (via
+``ShardWriter``, so the same caps and manifest apply) under
+``data/batch_deltas/delta_<timestamp>``. Every run writes
+``data/batch_deltas/reconcile_report_<timestamp>.json``, also when nothing
+needs resubmitting; the delta dir only exists if it holds shards.
+"""
+
+import glob
+import json
+import os
+import shutil
+import time
+from collections import Counter, defaultdict
+from typing import Dict, List, Set, Tuple
+
+from tqdm import tqdm
+
+from src.classification.sharding import ShardWriter
+from src.utils.file_utils import iter_jsonl
+
+MODEL = "gpt-4.1-mini"
+REQUEST_DIRS = [os.path.join("data", "batches_41_mini", "patched_max_tokens_50")]
+RESULTS_DIR = os.path.join("data", "batch_results")
+ERRORS_DIR = os.path.join("data", "batch_errors")
+DELTA_ROOT = os.path.join("data", "batch_deltas")
+
+
+def _failure_reason(obj: Dict) -> str:
+    resp = obj.get("response") or {}
+    error = obj.get("error") or ((resp.get("body") or {}).get("error")) or {}
+    code = error.get("code") or error.get("type") if isinstance(error, dict) else None
+    return f"{resp.get('status_code')}:{code}" if code else str(resp.get("status_code"))
+
+
+def collect_outcomes(results_dir: str = RESULTS_DIR, errors_dir: str = ERRORS_DIR
+                     ) -> Tuple[Set[str], Dict[str, str]]:
+    """Return custom_ids with a successful result and failure reasons for the rest seen."""
+    ok: Set[str] = set()
+    failed: Dict[str, str] = {}
+    paths = sorted(glob.glob(os.path.join(results_dir, "*.jsonl"))) + \
+        sorted(glob.glob(os.path.join(errors_dir, "*.jsonl")))
+    for path in tqdm(paths, desc="Reading results"):
+        for obj in iter_jsonl(path):
+            cid = obj.get("custom_id")
+            if not cid:
+                continue
+            if (obj.get("response") or {}).get("status_code") == 200:
+                ok.add(cid)
+            else:
+                failed[cid] = _failure_reason(obj)
+    for cid in ok:
+        failed.pop(cid, None)
+    return ok, failed
+
+
+def reconcile(request_dirs: List[str] = REQUEST_DIRS, results_dir: str = RESULTS_DIR,
+              errors_dir: str = ERRORS_DIR, delta_root: str = DELTA_ROOT,
+              model: str = MODEL) -> Dict:
+    """Diff request shards against results and write delta shards of what to resubmit.
+
+    Args:
+        request_dirs: Directories with submitted ``batch_*.jsonl`` request shards.
+        results_dir: Directory with downloaded results.
+        errors_dir: Directory with downloaded error files.
+        delta_root: Parent directory for the new delta run.
+        model: Model name for token estimation in the delta shards.
+
+    Returns:
+        Dict: The reconciliation report.
+    """
+    ok, failed = collect_outcomes(results_dir, errors_dir)
+
+    stamp = time.strftime('%Y%m%d_%H%M%S')
+    delta_dir = os.path.join(delta_root, f"delta_{stamp}")
+    report_path = os.path.join(delta_root, f"reconcile_report_{stamp}.json")
+    per_shard = defaultdict(Counter)
+    reasons: Counter = Counter()
+    seen: Set[str] = set()
+    totals = Counter()
+
+    with ShardWriter(delta_dir, model=model) as writer:
+        for d in request_dirs:
+            for path in tqdm(sorted(glob.glob(os.path.join(d, "batch_*.jsonl"))), desc="Reconciling"):
+                for obj in iter_jsonl(path):
+                    cid = obj.get("custom_id")
+                    if not cid or cid in seen:
+                        continue
+                    seen.add(cid)
+                    if cid in ok:
+                        outcome = "ok"
+                    elif cid in failed:
+                        outcome = "failed"
+                        reasons[failed[cid]] += 1
+                        writer.write(obj)
+                    else:
+                        outcome = "missing"
+                        writer.write(obj)
+                    per_shard[path][outcome] += 1
+                    totals[outcome] += 1
+
+    report = {
+        "requests": len(seen),
+        "ok": totals["ok"],
+        "failed": totals["failed"],
+        "missing": totals["missing"],
+        "failure_reasons": dict(reasons),
+        "results_without_request": len(ok - seen),
+        "per_shard": {p: dict(c) for p, c in per_shard.items()},
+        "delta_dir": delta_dir if writer.shards else None,
+        "delta_shards": writer.shards,
+    }
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=2)
+    if not writer.shards:
+        shutil.rmtree(delta_dir)  # holds only an empty manifest
+
+    print(f"Requests: {report['requests']} | ok: {report['ok']} | failed: {report['failed']} | "
+          f"missing: {report['missing']}")
+    print(f"Report: {report_path}")
+    if writer.shards:
+        print(f"Wrote {len(writer.shards)} delta shards to {delta_dir}")
+    return report
+
+
+if __name__ == "__main__":
+    reconcile()
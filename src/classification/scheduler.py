@@ -0,0 +1,202 @@
+"""Submission scheduler that keeps batch shards in flight within a token budget.
+
+Instead of uploading every shard in one loop and hitting the org's
+enqueued-token limit, the scheduler keeps submitting shards (in manifest
+order) only while the estimated input tokens of in-flight batches plus the
+next shard fit ``ENQUEUED_TOKEN_BUDGET``. When batches finish, it submits the
+next shards. Shards whose batch failed or expired are retried up to
+``MAX_SHARD_ATTEMPTS`` times; batches rejected for exceeding the enqueued
+token limit are re-queued without using up an attempt.
+
+Queue state lives in the ``shard_queue`` table of the job ledger, next to
+the jobs themselves, so the daemon can be stopped and restarted at any
+time.
+
+Usage:
+    python src/classification/scheduler.py data/batches_41_mini_pse [...]
+"""
+
+import json
+import logging
+import os
+import sys
+import time
+from typing import Dict, List
+
+from openai import OpenAI
+
+from src.classification.job_ledger import TERMINAL, JobLedger, with_backoff
+from src.classification.sharding import TokenEstimator, load_manifest
+
+MODEL = "gpt-4.1-mini"
+BATCH_DIRS = [os.path.join("data", "batches_41_mini_pse")]
+ENQUEUED_TOKEN_BUDGET = 40_000_000
+POLL_SECONDS = 60
+MAX_SHARD_ATTEMPTS = 3
+TOKEN_LIMIT_ERROR = "token_limit_exceeded"
+
+logging.basicConfig(
+    filename=os.path.join("src", "classification", "scheduler.log"),
+    filemode="a",
+    level=logging.INFO,
+    format="%(asctime)s - %(levelname)s - %(message)s"
+)
+logger = logging.getLogger(__name__)
+
+
+def _shard_tokens(path: str, manifest: Dict[str, Dict], estimator: TokenEstimator) -> int:
+    entry = manifest.get(os.path.basename(path))
+    if entry:
+        return entry["input_tokens"]
+    with open(path, "r", encoding="utf-8") as f:
+        return sum(estimator(json.loads(line)) for line in f if line.strip())
+
+
+class Scheduler:
+    """Token-budgeted submission queue backed by the job ledger.
+
+    Args:
+        client: OpenAI client.
+        ledger: Job ledger holding jobs and the shard queue.
+        budget: Maximum estimated input tokens across in-flight batches.
+    """
+
+    def __init__(self, client, ledger: JobLedger, budget: int = ENQUEUED_TOKEN_BUDGET):
+        self.client = client
+        self.ledger = ledger
+        self.budget = budget
+        self.conn = ledger.conn
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS shard_queue ("
+            " shard_path TEXT PRIMARY KEY,"
+            " seq INTEGER,"
+            " input_tokens INTEGER,"
+            " state TEXT,"          # pending | in_flight | done | given_up
+            " attempts INTEGER DEFAULT 0,"
+            " last_error TEXT,"
+            " updated_at REAL)"
+        )
+        self.conn.commit()
+
+    def enqueue_dirs(self, batch_dirs: List[str], model: str = MODEL) -> int:
+        """Add shards from ``batch_dirs`` that are not queued yet; return how many."""
+        estimator = TokenEstimator(model)
+        seq = self.conn.execute("SELECT COALESCE(MAX(seq), -1) FROM shard_queue").fetchone()[0]
+        added = 0
+        for d in batch_dirs:
+            manifest = load_manifest(d)
+            names = list(manifest) or sorted(
+                f for f in os.listdir(d) if f.startswith("batch_") and f.endswith(".jsonl"))
+            for name in names:
+                path = os.path.normpath(os.path.join(d, name))
+                if self.conn.execute("SELECT 1 FROM shard_queue WHERE shard_path = ?", (path,)).fetchone():
+                    continue
+                # Shards submitted before the scheduler existed are picked up from the ledger
+                submitted = self.conn.execute(
+                    "SELECT COUNT(*) FROM jobs WHERE shard_path = ?", (path,)).fetchone()[0]
+                seq += 1
+                self.conn.execute(
+                    "INSERT INTO shard_queue (shard_path, seq, input_tokens, state, attempts, updated_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?)",
+                    (path, seq, _shard_tokens(path, manifest, estimator),
+                     "in_flight" if submitted else "pending", submitted, time.time()),
+                )
+                added += 1
+        self.conn.commit()
+        return added
+
+    def refresh(self) -> None:
+        """Move in-flight shards to done/pending/given_up from their latest job status."""
+        rows = self.conn.execute(
+            "SELECT shard_path, attempts FROM shard_queue WHERE state = 'in_flight'").fetchall()
+        for r in rows:
+            job = self.conn.execute(
+                "SELECT batch_id, status, errors FROM jobs WHERE shard_path = ?"
+                " ORDER BY submitted_at DESC LIMIT 1", (r["shard_path"],)).fetchone()
+            if job is None:
+                continue
+            attempts = r["attempts"]
+            if job["status"] is None:
+                # still status-less after sync: the API does not know the batch, so its
+                # results are unreachable and the shard has to go again
+                state, error = "pending", f"{job['batch_id']} unknown to the API"
+                logger.warning(f"Shard {r['shard_path']} -> {state} ({error})")
+            elif job["status"] not in TERMINAL:
+                continue
+            elif job["status"] == "completed":
+                state, error = "done", None
+            else:
+                error = f"{job['batch_id']} {job['status']}: {job['errors']}"
+                if TOKEN_LIMIT_ERROR in (job["errors"] or ""):
+                    attempts -= 1  # rejected for queue capacity, not for the shard itself
+                state = "given_up" if attempts >= MAX_SHARD_ATTEMPTS else "pending"
+                logger.warning(f"Shard {r['shard_path']} -> {state} ({error})")
+            self.conn.execute(
+                "UPDATE shard_queue SET state = ?, attempts = ?, last_error = ?, updated_at = ?"
+                " WHERE shard_path = ?",
+                (state, attempts, error, time.time(), r["shard_path"]),
+            )
+        self.conn.commit()
+
+    def in_flight_tokens(self) -> int:
+        return self.conn.execute(
+            "SELECT COALESCE(SUM(input_tokens), 0) FROM shard_queue WHERE state = 'in_flight'"
+        ).fetchone()[0]
+
+    def submit(self, shard_path: str) -> None:
+        with open(shard_path, "rb") as f:
+            batch_file = with_backoff(self.client.files.create, file=f, purpose="batch")
+        batch_job = with_backoff(
+            self.client.batches.create,
+            input_file_id=batch_file.id,
+            endpoint="/v1/chat/completions",
+            completion_window="24h",
+        )
+        self.ledger.record_submission(shard_path, batch_file.id, batch_job)
+        self.conn.execute(
+            "UPDATE shard_queue SET state = 'in_flight', attempts = attempts + 1, updated_at = ?"
+            " WHERE shard_path = ?", (time.time(), shard_path))
+        self.conn.commit()
+        logger.info(f"Submitted {shard_path} as {batch_job.id} (file {batch_file.id})")
+
+    def fill(self) -> int:
+        """Submit pending shards in order while they fit the budget; return how many."""
+        in_flight = self.in_flight_tokens()
+        submitted = 0
+        for r in self.conn.execute(
+                "SELECT shard_path, input_tokens FROM shard_queue WHERE state = 'pending' ORDER BY seq"
+        ).fetchall():
+            # An oversized shard may still go alone when nothing else is in flight
+            if in_flight + r["input_tokens"] > self.budget and in_flight > 0:
+                break
+            self.submit(r["shard_path"])
+            in_flight += r["input_tokens"]
+            submitted += 1
+        return submitted
+
+    def counts(self) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT state, COUNT(*) AS n FROM shard_queue GROUP BY state").fetchall()
+        return {r["state"]: r["n"] for r in rows}
+
+    def run(self, poll_seconds: int = POLL_SECONDS) -> Dict[str, int]:
+        """Sync, refresh and fill until no shard is pending or in flight."""
+        while True:
+            self.ledger.sync(self.client)
+            self.refresh()
+            submitted = self.fill()
+            counts = self.counts()
+            logger.info(f"Queue {counts}, in-flight tokens {self.in_flight_tokens()}, submitted {submitted}")
+            print(f"{time.strftime('%H:%M:%S')} queue {counts} in-flight tokens {self.in_flight_tokens()}")
+            if not counts.get("pending") and not counts.get("in_flight"):
+                return counts
+            time.sleep(poll_seconds)
+
+
+if __name__ == "__main__":
+    with JobLedger() as ledger:
+        scheduler = Scheduler(OpenAI(), ledger)
+        print(f"Queued {scheduler.enqueue_dirs(sys.argv[1:] or BATCH_DIRS)} new shards")
+        try:
+            print(scheduler.run())
+        except KeyboardInterrupt:
+            print("Stopped; queue state is kept in the job ledger")
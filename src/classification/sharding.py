@@ -0,0 +1,187 @@
+"""Streaming writer for OpenAI batch input files with size and token caps.
+
+Requests are written to ``batch_N.jsonl`` as they are produced. A shard is
+closed before a request would push it past the request, byte or estimated
+input-token cap, so every file stays within the provider's file-size and
+enqueued-token limits. ``manifest.json`` records each shard's custom_id range
+and totals and is rewritten whenever a shard closes.
+
+A writer owns its directory from ``start_num`` on: ``batch_N.jsonl`` files left
+there by an earlier, larger run are removed when it opens, so every shard in
+the directory is one the manifest lists.
+"""
+
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+import tiktoken
+
+MANIFEST_NAME = "manifest.json"
+
+MAX_REQUESTS = 20000                 # previous fixed cut, well under the 50k API limit
+MAX_BYTES = 190 * 1024 * 1024        # provider limit is 200 MB per input file
+MAX_INPUT_TOKENS = 5_000_000         # keep a shard well inside the enqueued-token limit
+
+# Chat format overhead as counted by the API: per message and for the reply primer
+TOKENS_PER_MESSAGE = 3
+TOKENS_PER_REPLY = 3
+
+_SHARD_RE = re.compile(r"batch_(\d+)\.jsonl")
+
+
+def get_encoding(model: str):
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+
+
+class TokenEstimator:
+    """Estimate input tokens of chat completions request objects with tiktoken.
+
+    The system prompt is the same for almost every request, so its count is
+    cached per distinct content.
+    """
+
+    def __init__(self, model: str):
+        self.enc = get_encoding(model)
+        self._system_tokens: Dict[str, int] = {}
+
+    def __call__(self, obj: Dict) -> int:
+        tokens = TOKENS_PER_REPLY
+        for m in obj.get("body", {}).get("messages", []):
+            content = m.get("content") or ""
+            if m.get("role") == "system":
+                if content not in self._system_tokens:
+                    self._system_tokens[content] = len(self.enc.encode(content))
+                n = self._system_tokens[content]
+            else:
+                n = len(self.enc.encode(content))
+            tokens += TOKENS_PER_MESSAGE + n
+        return tokens
+
+
+class ShardWriter:
+    """Write batch request objects to capped ``batch_N.jsonl`` shards.
+
+    Use as a context manager; the last shard and the manifest are finalized
+    on exit. Existing shards numbered ``start_num`` or higher are deleted.
+
+    Args:
+        out_dir: Directory for shards and ``manifest.json``.
+        model: Model name used to pick the tiktoken encoding.
+        max_requests: Maximum requests per shard.
+        max_bytes: Maximum shard size in bytes.
+        max_input_tokens: Maximum estimated input tokens per shard.
+        start_num: Index of the first shard file.
+    """
+
+    def __init__(
+        self,
+        out_dir: str,
+        model: str,
+        max_requests: int = MAX_REQUESTS,
+        max_bytes: int = MAX_BYTES,
+        max_input_tokens: int = MAX_INPUT_TOKENS,
+        start_num: int = 0,
+    ):
+        self.out_dir = out_dir
+        self.max_requests = max_requests
+        self.max_bytes = max_bytes
+        self.max_input_tokens = max_input_tokens
+        self.estimate_tokens = TokenEstimator(model)
+        self.shards: List[Dict] = []
+        self._num = start_num
+        self._file = None
+        self._current: Optional[Dict] = None
+        os.makedirs(out_dir, exist_ok=True)
+        remove_shards(out_dir, start_num)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def write(self, obj: Dict) -> None:
+        """Append one request, rolling over to a new shard if a cap would be exceeded."""
+        line = (json.dumps(obj) + "\n").encode("utf-8")
+        tokens = self.estimate_tokens(obj)
+
+        cur = self._current
+        if cur is not None and cur["requests"] > 0 and (
+            cur["requests"] + 1 > self.max_requests
+            or cur["bytes"] + len(line) > self.max_bytes
+            or cur["input_tokens"] + tokens > self.max_input_tokens
+        ):
+            self._close_shard()
+        if self._current is None:
+            self._open_shard()
+
+        self._file.write(line)
+        cur = self._current
+        cur["requests"] += 1
+        cur["bytes"] += len(line)
+        cur["input_tokens"] += tokens
+        if cur["first_custom_id"] is None:
+            cur["first_custom_id"] = obj.get("custom_id")
+        cur["last_custom_id"] = obj.get("custom_id")
+
+    def close(self) -> None:
+        if self._current is not None:
+            self._close_shard()
+        else:
+            self._write_manifest()  # also when nothing was written, replacing an old manifest
+
+    @property
+    def total_requests(self) -> int:
+        done = sum(s["requests"] for s in self.shards)
+        return done + (self._current["requests"] if self._current else 0)
+
+    def _open_shard(self) -> None:
+        name = f"batch_{self._num}.jsonl"
+        self._file = open(os.path.join(self.out_dir, name), "wb")
+        self._current = {
+            "file": name,
+            "requests": 0,
+            "bytes": 0,
+            "input_tokens": 0,
+            "first_custom_id": None,
+            "last_custom_id": None,
+        }
+        self._num += 1
+
+    def _close_shard(self) -> None:
+        self._file.close()
+        self.shards.append(self._current)
+        self._file, self._current = None, None
+        self._write_manifest()
+
+    def _write_manifest(self) -> None:
+        path = os.path.join(self.out_dir, MANIFEST_NAME)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"shards": self.shards}, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, path)
+
+
+def remove_shards(out_dir: str, start_num: int = 0) -> List[str]:
+    """Delete ``batch_N.jsonl`` files with ``N >= start_num`` in ``out_dir``; return their names."""
+    removed = []
+    for name in sorted(os.listdir(out_dir)):
+        m = _SHARD_RE.fullmatch(name)
+        if m and int(m.group(1)) >= start_num:
+            os.remove(os.path.join(out_dir, name))
+            removed.append(name)
+    return removed
+
+
+def load_manifest(out_dir: str) -> Dict[str, Dict]:
+    """Return manifest entries keyed by shard file name."""
+    path = os.path.join(out_dir, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as f:
+        return {s["file"]: s for s in json.load(f)["shards"]}
@@ -0,0 +1,173 @@
+"""Guard stage that catches table dumps and run-on segments after sentence splitting.
+
+``nltk.sent_tokenize`` has no notion of PDF layout, so whole tables, pages of
+figures or paragraphs without terminal punctuation come out as a single
+"sentence". Such segments are truncated by the encoder, hit the slow chunking
+paths in ``translate.py`` and waste LLM tokens. This stage re-splits them on
+layout cues and drops what is still numeric/tabular or over-length, recording
+every removal in a per-partition ``guard_report.json``.
+"""
+
+import os
+import re
+from collections import Counter
+from typing import Dict, List, Tuple
+
+from tqdm import tqdm
+
+from src.utils.file_utils import load_json, save_json
+
+MAX_WORDS = 120        # ~ encoder max_seq_length (128 word pieces) for typical prose
+MAX_CHARS = 1000
+MIN_ALPHA_RATIO = 0.4  # share of letters among non-space characters for prose
+MAX_DIGIT_RATIO = 0.4  # above this share of digits a segment is numeric
+MIN_FRAGMENT_WORDS = 3 # re-split pieces shorter than this are table cells/headings
+MAX_CELL_RUNS = 3      # runs of 3+ numeric cells: more than this looks like a table
+OVERLENGTH_POLICY = "chunk"  # "chunk": hard-split by words, "drop": discard
+REPORT_SAMPLE_CHARS = 200
+SCORES_DIR = os.path.join("data", "scores_csv")
+
+# ``clean_pdf_text`` collapses spaces and tabs, so table cells are recognised by
+# what survives cleaning: runs of three or more numbers ("12.4 13,1 (0.5) 7%").
+_NUMBER = r"[-+(]?\d[\d.,]*%?\)?"
+_CELL_RUN_RE = re.compile(rf"(?<!\S){_NUMBER}(?:\s+{_NUMBER}){{2,}}(?!\S)")
+
+# Layout cues, strongest first: line breaks, bullets, numeric cell runs, semicolons.
+# Cell runs are split off with a capturing group, so they come back as pieces of
+# their own (and are dropped as "numeric") instead of vanishing with the separator.
+_LAYOUT_CUES = [
+    re.compile(r"\n+"),
+    re.compile(r"\s*[•▪●◦■►]\s*"),
+    re.compile(rf"({_CELL_RUN_RE.pattern})"),
+    re.compile(r";\s+"),
+]
+
+
+def classify_segment(segment: str) -> str:
+    """Return ``"ok"``, ``"numeric"``, ``"tabular"`` or ``"overlength"`` for a segment.
+
+    Args:
+        segment: A sentence as produced by the splitter.
+
+    Returns:
+        str: The segment class.
+    """
+
+    chars = [c for c in segment if not c.isspace()]
+    if not chars:
+        return "numeric"
+    digits = sum(c.isdigit() for c in chars)
+    alpha = sum(c.isalpha() for c in chars)
+
+    if digits / len(chars) > MAX_DIGIT_RATIO or alpha / len(chars) < MIN_ALPHA_RATIO:
+        return "numeric"
+    if len(_CELL_RUN_RE.findall(segment)) > MAX_CELL_RUNS or segment.count("\n") > MAX_CELL_RUNS:
+        return "tabular"
+    if len(segment.split()) > MAX_WORDS or len(segment) > MAX_CHARS:
+        return "overlength"
+    return "ok"
+
+
+def _resplit(segment: str, cue_idx: int = 0) -> List[str]:
+    """Recursively split on layout cues until every piece is ``ok`` or cues run out."""
+    if classify_segment(segment) == "ok" or cue_idx >= len(_LAYOUT_CUES):
+        return [segment]
+    pieces = [p.strip() for p in _LAYOUT_CUES[cue_idx].split(segment) if p.strip()]
+    if len(pieces) <= 1:
+        return _resplit(segment, cue_idx + 1)
+    out = []
+    for piece in pieces:
+        out.extend(_resplit(piece, cue_idx + 1))
+    return out
+
+
+def _chunk_words(segment: str) -> List[str]:
+    words = segment.split()
+    return [" ".join(words[i:i + MAX_WORDS]) for i in range(0, len(words), MAX_WORDS)]
+
+
+def guard_sentences(sentences: List[str]) -> Tuple[List[str], Dict]:
+    """Re-split or drop outlier segments from a partition's sentences.
+
+    Args:
+        sentences: Sentences in document order.
+
+    Returns:
+        Tuple[List[str], Dict]: Kept sentences in document order and a report
+        with per-reason counts and truncated samples of removed text.
+    """
+
+    kept: List[str] = []
+    dropped: Counter = Counter()
+    removed = []
+    resplit = 0
+
+    for sentence in sentences:
+        if classify_segment(sentence) == "ok":
+            kept.append(sentence)
+            continue
+
+        pieces = _resplit(sentence)
+        if len(pieces) > 1:
+            resplit += 1
+        for piece in pieces:
+            reason = classify_segment(piece)
+            if reason == "ok" and len(pieces) > 1 and len(piece.split()) < MIN_FRAGMENT_WORDS:
+                reason = "fragment"
+            if reason == "overlength" and OVERLENGTH_POLICY == "chunk":
+                kept.extend(_chunk_words(piece))
+            elif reason == "ok":
+                kept.append(piece)
+            else:
+                dropped[reason] += 1
+                removed.append({
+                    "reason": reason,
+                    "chars": len(piece),
+                    "text": piece[:REPORT_SAMPLE_CHARS],
+                })
+
+    report = {
+        "input_sentences": len(sentences),
+        "kept_sentences": len(kept),
+        "resplit_segments": resplit,
+        "dropped": dict(dropped),
+        "dropped_chars": sum(r["chars"] for r in removed),
+        "removed": removed,
+    }
+    return kept, report
+
+
+def guard_existing_splits(base_dir: str, scores_dir: str = SCORES_DIR) -> None:
+    """Apply the guard to ``splits.json`` files that have not been scored yet.
+
+    Partitions with a ``similarity_scores.csv`` are left untouched so sentence
+    ids stay aligned with existing scores; only the report is written for them.
+
+    Args:
+        base_dir: Base directory containing ``splits.json`` files.
+        scores_dir: Base directory of the matching ``similarity_scores.csv`` files.
+    """
+
+    for dirname, _, filenames in tqdm(list(os.walk(base_dir))):
+        if "splits.json" not in filenames:
+            continue
+        splits_path = os.path.join(dirname, "splits.json")
+        report_path = os.path.join(dirname, "guard_report.json")
+        company, year = os.path.relpath(dirname, base_dir).split(os.sep)[-2:]
+        scores_path = os.path.join(scores_dir, company, year, "similarity_scores.csv")
+
+        splits = load_json(splits_path)
+        sentences = [splits[k] for k in sorted(splits, key=int)]
+        kept, report = guard_sentences(sentences)
+
+        if os.path.exists(scores_path):
+            report["applied"] = False
+        else:
+            report["applied"] = True
+            save_json(splits_path, {str(i): s for i, s in enumerate(kept)})
+        save_json(report_path, report)
+
+
+if __name__ == "__main__":
+    BASE_DIR = os.path.join("data", "texts")
+    guard_existing_splits(BASE_DIR)
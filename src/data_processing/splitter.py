@@ -9,6 +9,9 @@ from typing import List
 import nltk
 from tqdm import tqdm
 
+from src.data_processing.outlier_guard import guard_sentences
+from src.utils.file_utils import save_json
+
 nltk.download("punkt")
 
 logging.basicConfig(
@@ -60,6 +63,23 @@ def sentence_splitter(text_path: str) -> List[str]:
     return sentences
 
 
+def split_and_guard(text_path: str, save_path: str) -> None:
+    """Split a text file, drop table/run-on outliers and save splits plus report.
+
+    Args:
+        text_path: Path to the ``results.txt`` file.
+        save_path: Destination path for ``splits.json``.
+    """
+
+    sentences, report = guard_sentences(sentence_splitter(text_path))
+    save_splits_df(sentences, save_path)
+    save_json(save_path.replace("splits.json", "guard_report.json"), report)
+    logging.info(
+        f"Guard for {text_path}: kept {report['kept_sentences']}/{report['input_sentences']}, "
+        f"dropped {report['dropped']}"
+    )
+
+
 def save_splits_df(data: List[str], path: str) -> None:
     """Persist sentence splits as a JSON mapping.
 
@@ -98,14 +118,12 @@ def split_texts(base_dir: str) -> None:
     for file_path in tqdm(txt_files):
         save_path = file_path.replace("results.txt", "splits.json")
         if not os.path.exists(save_path):
-            sentences = sentence_splitter(file_path)
-            save_splits_df(sentences, save_path)
+            split_and_guard(file_path, save_path)
         else:
             with open(save_path, "r", encoding="utf-8") as f:
                 json_data = json.load(f)
             if not json_data:
-                sentences = sentence_splitter(file_path)
-                save_splits_df(sentences, save_path)
+                split_and_guard(file_path, save_path)
 
     logging.info('Saved all splits as dataframes in respective "splits.json"')
 
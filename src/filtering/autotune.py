@@ -0,0 +1,210 @@
+"""Per-host autotuning of CPU encode batches and torch thread count.
+
+The encoder's cost on CPU is driven by padded tokens per batch rather than
+by the number of sentences, so batches are cut by a token budget
+(batch size times the longest sentence in tokens) instead of a fixed size. The
+budget and the torch thread count are probed once per machine on a warm-up
+sample and persisted under ``data/autotune/<hostname>.json``.
+"""
+
+import json
+import os
+import random
+import socket
+import threading
+import time
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import psutil
+import torch
+
+from src.utils.file_utils import load_json, save_json
+
+PROFILE_DIR = os.path.join("data", "autotune")
+
+SAMPLE_SIZE = 2048                 # warm-up sentences drawn across partitions
+SAMPLE_PARTITIONS = 20             # number of splits.json files to draw from
+TOKEN_BUDGETS = [2048, 4096, 8192, 16384, 32768]
+MAX_BATCH_SIZE = 1024              # hard cap, matches the GPU default
+MAX_RSS_FRACTION = 0.5             # reject settings growing RSS beyond this share of RAM
+RSS_SAMPLE_SECONDS = 0.01         # RSS polling interval while a probe runs
+SEED = 0
+
+
+def _profile_path(host: Optional[str] = None) -> str:
+    host = host or socket.gethostname()
+    return os.path.join(PROFILE_DIR, f"{host}.json")
+
+
+def _thread_candidates() -> List[int]:
+    n_cores = psutil.cpu_count(logical=False) or os.cpu_count() or 1
+    candidates, t = [], 1
+    while t < n_cores:
+        candidates.append(t)
+        t *= 2
+    candidates.append(n_cores)
+    return candidates
+
+
+def token_lengths(model, texts: List[str]) -> List[int]:
+    """Return encoder token counts per text, capped at the model's max length."""
+    enc = model.tokenizer(
+        texts,
+        add_special_tokens=True,
+        truncation=True,
+        max_length=model.max_seq_length,
+    )
+    return [len(ids) for ids in enc["input_ids"]]
+
+
+def token_budget_batches(
+    lengths: List[int], token_budget: int, max_batch_size: int = MAX_BATCH_SIZE
+) -> Iterator[Tuple[int, int]]:
+    """Yield contiguous ``(start, end)`` slices whose padded size fits the budget.
+
+    Order is preserved so callers can keep writing rows in sentence-id order.
+    A single sentence longer than the budget still gets its own batch.
+    """
+    start, longest = 0, 0
+    for i, n in enumerate(lengths):
+        longest_if_added = max(longest, n)
+        size_if_added = i - start + 1
+        if size_if_added > 1 and (
+            longest_if_added * size_if_added > token_budget or size_if_added > max_batch_size
+        ):
+            yield start, i
+            start, longest = i, n
+        else:
+            longest = longest_if_added
+    if start < len(lengths):
+        yield start, len(lengths)
+
+
+def sample_sentences(base_dir: str, n: int = SAMPLE_SIZE) -> List[str]:
+    """Draw a reproducible warm-up sample of sentences from ``splits.json`` files."""
+    splits = []
+    for dirname, _, filenames in os.walk(base_dir):
+        if "splits.json" in filenames:
+            splits.append(os.path.join(dirname, "splits.json"))
+    splits.sort()
+
+    rng = random.Random(SEED)
+    rng.shuffle(splits)
+
+    pool: List[str] = []
+    for sp in splits[:SAMPLE_PARTITIONS]:
+        pool.extend(load_json(sp).values())
+    rng.shuffle(pool)
+    return pool[:n]
+
+
+class RSSSampler:
+    """Track the peak RSS of this process from a background thread.
+
+    Activations are freed when ``encode`` returns, so sampling between
+    batches would miss the peak inside a batch.
+    """
+
+    def __init__(self, interval: float = RSS_SAMPLE_SECONDS):
+        self.interval = interval
+        self.proc = psutil.Process()
+        self.before = self.peak = self.proc.memory_info().rss
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, self.proc.memory_info().rss)
+
+    def __enter__(self):
+        self._thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, self.proc.memory_info().rss)
+
+    @property
+    def growth_mb(self) -> float:
+        return round((self.peak - self.before) / 2**20, 1)
+
+
+def _probe(model, texts: List[str], lengths: List[int], num_threads: int, token_budget: int) -> Dict:
+    torch.set_num_threads(num_threads)
+
+    start = time.perf_counter()
+    with RSSSampler() as rss:
+        for s, e in token_budget_batches(lengths, token_budget):
+            model.encode(texts[s:e], convert_to_tensor=True, show_progress_bar=False,
+                         normalize_embeddings=True, batch_size=e - s)
+    elapsed = time.perf_counter() - start
+
+    return {
+        "num_threads": num_threads,
+        "token_budget": token_budget,
+        "sentences_per_sec": round(len(texts) / elapsed, 2),
+        "rss_growth_mb": rss.growth_mb,
+    }
+
+
+def tune(model, texts: List[str]) -> Dict:
+    """Probe thread counts and token budgets on ``texts`` and return the best profile.
+
+    Thread count is chosen first at a mid-range budget, then the budget is
+    swept at that thread count; settings whose RSS growth exceeds
+    ``MAX_RSS_FRACTION`` of physical memory are discarded.
+    """
+    lengths = token_lengths(model, texts)
+    rss_limit_mb = psutil.virtual_memory().total * MAX_RSS_FRACTION / 2**20
+
+    # Warm-up pass so one-off allocations do not skew the first probe
+    model.encode(texts[:32], show_progress_bar=False)
+
+    probes = []
+    mid_budget = TOKEN_BUDGETS[len(TOKEN_BUDGETS) // 2]
+    thread_probes = [_probe(model, texts, lengths, t, mid_budget) for t in _thread_candidates()]
+    probes.extend(thread_probes)
+    num_threads = max(thread_probes, key=lambda p: p["sentences_per_sec"])["num_threads"]
+
+    budget_probes = [
+        _probe(model, texts, lengths, num_threads, b) for b in TOKEN_BUDGETS if b != mid_budget
+    ]
+    probes.extend(budget_probes)
+    candidates = [p for p in budget_probes + thread_probes
+                  if p["num_threads"] == num_threads and p["rss_growth_mb"] <= rss_limit_mb]
+    best = max(candidates, key=lambda p: p["sentences_per_sec"]) if candidates else {
+        "token_budget": TOKEN_BUDGETS[0]
+    }
+
+    return {
+        "host": socket.gethostname(),
+        "physical_cores": psutil.cpu_count(logical=False),
+        "logical_cores": psutil.cpu_count(logical=True),
+        "total_ram_mb": round(psutil.virtual_memory().total / 2**20),
+        "torch_version": torch.__version__,
+        "sample_size": len(texts),
+        "num_threads": num_threads,
+        "token_budget": best["token_budget"],
+        "max_batch_size": MAX_BATCH_SIZE,
+        "probes": probes,
+    }
+
+
+def load_or_tune(model, base_dir: str, retune: bool = False) -> Dict:
+    """Return the persisted profile for this host, probing and saving it if missing."""
+    path = _profile_path()
+    if os.path.exists(path) and not retune:
+        return load_json(path)
+
+    profile = tune(model, sample_sentences(base_dir))
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    save_json(path, profile)
+    return profile
+
+
+if __name__ == "__main__":
+    from sentence_transformers import SentenceTransformer
+
+    st_model = SentenceTransformer("sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2", device="cpu")
+    print(json.dumps(load_or_tune(st_model, os.path.join("data", "texts"), retune=True), indent=2))
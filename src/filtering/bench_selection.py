@@ -0,0 +1,69 @@
+"""Benchmark vectorized candidate selection against the original ``iloc`` loop.
+
+Asserts that both produce the same passing and fallback sentence ids for
+every partition and reports the time spent by each.
+"""
+
+import os
+import sys
+import time
+
+import pandas as pd
+from tqdm import tqdm
+
+from src.filtering.selection import select_candidates
+
+BASE_DIR = os.path.join("data", "scores_csv")
+T = 0.5
+MAX_PARTITIONS = 50
+
+
+def select_candidates_loop(csv_df: pd.DataFrame, threshold: float):
+    """Cell-by-cell selection as done in ``batch_requests._create_batches``."""
+    columns = list(csv_df.columns)
+    passing, fallback = [], []
+    for i in range(len(csv_df)):
+        sentence_id = int(csv_df.iloc[i][columns[0]])
+        for j in range(1, len(columns)):
+            score = csv_df.iloc[i][columns[j]]
+            if score >= threshold:
+                passing.append(sentence_id)
+                break
+            if j == len(columns) - 1:
+                fallback.append(sentence_id)
+    return passing, fallback
+
+
+def main(max_partitions: int = MAX_PARTITIONS):
+    csvs = []
+    for dirname, _, filenames in os.walk(BASE_DIR):
+        for filename in filenames:
+            if filename.endswith(".csv"):
+                csvs.append(os.path.join(dirname, filename))
+    csvs = sorted(csvs)[:max_partitions]
+
+    t_loop = t_vec = 0.0
+    n_rows = n_pass = 0
+    for csv_path in tqdm(csvs):
+        csv_df = pd.read_csv(csv_path)
+
+        start = time.perf_counter()
+        loop_pass, loop_fallback = select_candidates_loop(csv_df, T)
+        t_loop += time.perf_counter() - start
+
+        start = time.perf_counter()
+        vec_pass, vec_fallback = select_candidates(csv_df, T)
+        t_vec += time.perf_counter() - start
+
+        assert loop_pass == vec_pass.tolist(), f"Passing ids differ for {csv_path}"
+        assert loop_fallback == vec_fallback.tolist(), f"Fallback ids differ for {csv_path}"
+        n_rows += len(csv_df)
+        n_pass += len(vec_pass)
+
+    print(f"{len(csvs)} partitions, {n_rows} sentences, {n_pass} pass T={T}: selections identical")
+    print(f"iloc loop:  {t_loop:.2f}s")
+    print(f"vectorized: {t_vec:.4f}s ({t_loop / max(t_vec, 1e-9):.0f}x)")
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else MAX_PARTITIONS)
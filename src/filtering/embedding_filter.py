@@ -10,6 +10,7 @@ from sentence_transformers import SentenceTransformer
 
 # --- Your utils ---
 from src.filtering.utils import detect_german, ai_embeddings, ai_embeddings_de, sdgs_embeddings_de, sdg_embeddings
+from src.filtering.autotune import load_or_tune, token_budget_batches, token_lengths
 from src.utils.file_utils import load_json
 
 BASE_DIR = Path("data/texts")
@@ -17,7 +18,7 @@ OUT_ROOT = Path("data/scores_csv")
 OUT_ROOT.mkdir(parents=True, exist_ok=True)
 
 MODEL_NAME = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
-BATCH_SIZE = 1024
+BATCH_SIZE = 1024  # GPU/MPS only; CPU batches come from the per-host autotune profile
 ROUND_DECIMALS = 2
 
 # ---------------- Device & model ----------------
@@ -32,6 +33,12 @@ if device == "cuda":
 
 model = SentenceTransformer(MODEL_NAME, device=device)
 
+# On CPU, batch by token budget and pin the thread count probed for this host
+cpu_profile = None
+if device == "cpu":
+    cpu_profile = load_or_tune(model, str(BASE_DIR))
+    torch.set_num_threads(cpu_profile["num_threads"])
+
 # ---------------- Helpers ----------------
 def _refs_for_lang(is_german: bool):
     if is_german:
@@ -61,12 +68,19 @@ def _refs_for_lang(is_german: bool):
 def encode_texts(texts: List[str]) -> torch.Tensor:
     return model.encode(
         texts,
+        batch_size=len(texts) if cpu_profile else 32,
         convert_to_tensor=True,
         device=device,
         show_progress_bar=False,
         normalize_embeddings=True
     )
 
+def batch_slices(texts: List[str]):
+    if cpu_profile is None:
+        return [(i, min(i + BATCH_SIZE, len(texts))) for i in range(0, len(texts), BATCH_SIZE)]
+    lengths = token_lengths(model, texts)
+    return token_budget_batches(lengths, cpu_profile["token_budget"], cpu_profile["max_batch_size"])
+
 # ---------------- Main ----------------
 def process_partition(results_txt: Path):
     company = results_txt.parts[-3]
@@ -102,8 +116,8 @@ def process_partition(results_txt: Path):
         w = csv.writer(f)
         w.writerow(header)
 
-        for i in range(0, len(items), BATCH_SIZE):
-            chunk = items[i:i+BATCH_SIZE]
+        for start, end in batch_slices([v for _, v in items]):
+            chunk = items[start:end]
             sent_ids = [c[0] for c in chunk]
             texts    = [c[1] for c in chunk]
 
@@ -0,0 +1,34 @@
+"""Vectorized selection of LLM candidates from a partition's similarity scores."""
+
+from typing import Tuple
+
+import numpy as np
+import pandas as pd
+
+
+def row_max_scores(csv_df: pd.DataFrame) -> np.ndarray:
+    """Return the max over all SDG/AI score columns for every sentence.
+
+    NaN cells are ignored (``np.fmax``), matching the per-cell ``score >= T``
+    check in which a NaN never passes but does not hide other columns.
+    """
+    values = csv_df.iloc[:, 1:].to_numpy(dtype=np.float64)
+    if values.shape[1] == 0:
+        return np.full(len(csv_df), np.nan)
+    return np.fmax.reduce(values, axis=1)
+
+
+def select_candidates(csv_df: pd.DataFrame, threshold: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Split a partition's sentence ids by whether any score clears ``threshold``.
+
+    Args:
+        csv_df: Contents of a ``similarity_scores.csv`` (``sentence_id`` first).
+        threshold: Similarity threshold ``T``.
+
+    Returns:
+        Tuple[np.ndarray, np.ndarray]: Sentence ids that pass, and the
+        complement that goes to the fuzzy fallback, both in file order.
+    """
+    sentence_ids = csv_df.iloc[:, 0].to_numpy().astype(np.int64)
+    passing = row_max_scores(csv_df) >= threshold
+    return sentence_ids[passing], sentence_ids[~passing]
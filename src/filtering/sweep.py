@@ -0,0 +1,215 @@
+"""Single-pass threshold sweep over the similarity scores.
+
+Scores are written with two decimals (``embedding_filter.ROUND_DECIMALS``), so
+a histogram with 0.01 bins over [-1, 1] is exact. For every partition one
+vectorized pass stores
+
+- the histogram of row-max scores (what ``select_candidates`` thresholds),
+- the histogram of every score column (per SDG / AI reference),
+- the same histograms weighted by each sentence's token count,
+
+in ``data/sweep/<company>/<year>/sweep.npz``. Sentence counts and token cost
+estimates for any threshold, column, company or year then come from
+reverse cumulative sums over a few hundred bins instead of re-reading
+110M+ rows.
+
+Usage:
+    python src/filtering/sweep.py              # build missing/stale partitions, print a sweep
+    python src/filtering/sweep.py 0.3 0.4 0.5  # thresholds to print
+"""
+
+import glob
+import os
+import sys
+from typing import Dict, List, Optional
+
+import numpy as np
+import pandas as pd
+from tqdm import tqdm
+
+from src.classification.prompts import create_batch_object
+from src.classification.sharding import TokenEstimator, get_encoding
+from src.filtering.selection import row_max_scores
+from src.utils.file_utils import load_json
+
+SCORES_DIR = os.path.join("data", "scores_csv")
+TEXTS_DIR = os.path.join("data", "texts")
+SWEEP_DIR = os.path.join("data", "sweep")
+MODEL = "gpt-4.1-mini"
+
+N_BINS = 201  # scores -1.00 .. 1.00 in steps of 0.01
+THRESHOLDS = [0.3, 0.4, 0.45, 0.5, 0.55, 0.6]
+
+
+def score_bins(scores: np.ndarray) -> np.ndarray:
+    """Bin index of each score; NaN maps to -1."""
+    out = np.full(scores.shape, -1, dtype=np.int64)
+    valid = ~np.isnan(scores)
+    out[valid] = np.clip(np.rint(scores[valid] * 100).astype(np.int64) + 100, 0, N_BINS - 1)
+    return out
+
+
+def threshold_bin(threshold: float) -> int:
+    """First bin whose scores are ``>= threshold``."""
+    return int(np.clip(np.ceil(threshold * 100 - 1e-9) + 100, 0, N_BINS))
+
+
+def _hist(bins: np.ndarray, weights: Optional[np.ndarray] = None) -> np.ndarray:
+    valid = bins >= 0
+    return np.bincount(bins[valid], weights=None if weights is None else weights[valid],
+                       minlength=N_BINS).astype(np.int64)
+
+
+def build_partition(csv_path: str, json_path: str, enc) -> Dict[str, np.ndarray]:
+    """Histograms of one partition in one pass over its score matrix."""
+    df = pd.read_csv(csv_path)
+    columns = list(df.columns[1:])
+    values = df.iloc[:, 1:].to_numpy(dtype=np.float64)
+
+    if enc is not None and os.path.exists(json_path):
+        splits = load_json(json_path)
+        texts = [str(splits.get(str(int(sid)), "")) for sid in df.iloc[:, 0]]
+        tokens = np.asarray([len(t) for t in enc.encode_batch(texts)], dtype=np.int64) if texts \
+            else np.zeros(0, dtype=np.int64)
+    else:
+        tokens = np.zeros(len(df), dtype=np.int64)
+
+    row_bins = score_bins(row_max_scores(df))
+    col_bins = score_bins(values)  # (rows, columns)
+    flat = np.where(col_bins >= 0, col_bins + np.arange(len(columns)) * N_BINS, -1).ravel()
+    flat_tokens = np.repeat(tokens, len(columns))
+    size = len(columns) * N_BINS
+    valid = flat >= 0
+    return {
+        "columns": np.asarray(columns, dtype=str),
+        "n_sentences": np.int64(len(df)),
+        "has_tokens": np.bool_(enc is not None),
+        "tokens_total": np.int64(tokens.sum()),
+        "hist_rowmax": _hist(row_bins),
+        "tok_rowmax": _hist(row_bins, tokens),
+        "hist_col": np.bincount(flat[valid], minlength=size).reshape(len(columns), N_BINS).astype(np.int64),
+        "tok_col": np.bincount(flat[valid], weights=flat_tokens[valid], minlength=size)
+        .reshape(len(columns), N_BINS).astype(np.int64),
+    }
+
+
+def build(scores_dir: str = SCORES_DIR, sweep_dir: str = SWEEP_DIR, model: str = MODEL,
+          with_tokens: bool = True) -> int:
+    """Build sweep files for partitions whose scores changed since; return how many.
+
+    Files built with ``with_tokens=False`` hold zero token counts and are
+    rebuilt by a later call that asks for tokens.
+    """
+    enc = get_encoding(model) if with_tokens else None
+    built = 0
+    for csv_path in tqdm(sorted(glob.glob(os.path.join(scores_dir, "*", "*", "similarity_scores.csv"))),
+                         desc="Sweep"):
+        company, year = csv_path.split(os.sep)[-3:-1]
+        out = os.path.join(sweep_dir, company, year, "sweep.npz")
+        if os.path.getsize(csv_path) == 0:
+            continue
+        if os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(csv_path):
+            with np.load(out) as f:
+                if not with_tokens or f["has_tokens"]:
+                    continue
+        json_path = os.path.join(TEXTS_DIR, company, year, "splits.json")
+        data = build_partition(csv_path, json_path, enc)
+        os.makedirs(os.path.dirname(out), exist_ok=True)
+        np.savez(out + ".part.npz", **data)
+        os.replace(out + ".part.npz", out)
+        built += 1
+    return built
+
+
+class Sweep:
+    """Histograms of all (or a subset of) partitions, queried by threshold.
+
+    Args:
+        partitions: ``(company, year, data)`` triples as loaded by ``load``.
+        model: Model for the per-request prompt overhead in token estimates.
+    """
+
+    def __init__(self, partitions: List, model: str = MODEL):
+        self.partitions = partitions
+        self.model = model
+        self._overhead = None
+
+    @classmethod
+    def load(cls, sweep_dir: str = SWEEP_DIR, model: str = MODEL) -> "Sweep":
+        partitions = []
+        for path in sorted(glob.glob(os.path.join(sweep_dir, "*", "*", "sweep.npz"))):
+            company, year = path.split(os.sep)[-3:-1]
+            with np.load(path) as f:
+                partitions.append((company, year, {k: f[k] for k in f.files}))
+        return cls(partitions, model)
+
+    def select(self, company: Optional[str] = None, year=None) -> "Sweep":
+        return Sweep([p for p in self.partitions
+                      if (company is None or p[0] == company) and (year is None or p[1] == str(year))],
+                     self.model)
+
+    @property
+    def total_sentences(self) -> int:
+        return int(sum(p[2]["n_sentences"] for p in self.partitions))
+
+    @property
+    def request_overhead(self) -> int:
+        """Estimated prompt tokens of a request with an empty sentence (system prompt + framing)."""
+        if self._overhead is None:
+            empty = create_batch_object("", "0", "data/scores_csv/x/0000/similarity_scores.csv", model=self.model)
+            self._overhead = TokenEstimator(self.model)(empty)
+        return self._overhead
+
+    def _histograms(self, column: Optional[str]):
+        hist = np.zeros(N_BINS, dtype=np.int64)
+        tok = np.zeros(N_BINS, dtype=np.int64)
+        for _, _, d in self.partitions:
+            if column is None:
+                hist += d["hist_rowmax"]
+                tok += d["tok_rowmax"]
+                continue
+            idx = np.flatnonzero(d["columns"] == column)
+            if len(idx):
+                hist += d["hist_col"][idx[0]]
+                tok += d["tok_col"][idx[0]]
+        return hist, tok
+
+    def at(self, threshold: float, column: Optional[str] = None) -> Dict[str, int]:
+        """Sentences with a score ``>= threshold`` (row max, or one column) and their token cost."""
+        hist, tok = self._histograms(column)
+        b = threshold_bin(threshold)
+        sentences = int(hist[b:].sum())
+        sentence_tokens = int(tok[b:].sum())
+        return {
+            "threshold": threshold,
+            "sentences": sentences,
+            "sentence_tokens": sentence_tokens,
+            "request_tokens": sentence_tokens + sentences * self.request_overhead,
+        }
+
+    def table(self, thresholds=THRESHOLDS, column: Optional[str] = None) -> pd.DataFrame:
+        hist, tok = self._histograms(column)
+        # reverse cumulative sums: entry b = count of bins >= b
+        ge_hist = np.append(np.cumsum(hist[::-1])[::-1], 0)
+        ge_tok = np.append(np.cumsum(tok[::-1])[::-1], 0)
+        rows = []
+        for t in thresholds:
+            b = threshold_bin(t)
+            rows.append({"threshold": t, "sentences": int(ge_hist[b]), "sentence_tokens": int(ge_tok[b]),
+                         "request_tokens": int(ge_tok[b] + ge_hist[b] * self.request_overhead)})
+        return pd.DataFrame(rows)
+
+    def columns(self) -> List[str]:
+        seen = {}
+        for _, _, d in self.partitions:
+            for c in d["columns"]:
+                seen.setdefault(str(c), None)
+        return list(seen)
+
+
+if __name__ == "__main__":
+    thresholds = [float(t) for t in sys.argv[1:]] or THRESHOLDS
+    print(f"Built {build()} partitions")
+    sweep = Sweep.load()
+    print(f"Partitions: {len(sweep.partitions)} | sentences: {sweep.total_sentences}")
+    print(sweep.table(thresholds).to_string(index=False))
@@ -0,0 +1,130 @@
+"""Headless rendering of the SDG/AI sentiment chart family.
+
+Renders the chart of ``sdg_sentiments.py`` for the whole corpus, for every
+company and for every year from ``company_year_sentiment_counts.csv``, on a
+process pool, to ``results/plots/<family>/<name>.<fmt>``.
+
+Each figure's input slice (the Positive/Negative totals it plots, its title
+and formats) is hashed; figures whose hash matches the one recorded in
+``results/plots/manifest.json`` and whose files exist are skipped, so after
+a small data update only the affected company and year charts are redrawn.
+
+Usage:
+    python src/plots/render.py                         # all families, PNG
+    python src/plots/render.py company year --svg      # selected families, PNG and SVG
+    python src/plots/render.py --force                 # redraw everything
+"""
+
+import hashlib
+import json
+import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List
+from urllib.parse import quote
+
+import pandas as pd
+from tqdm import tqdm
+
+from src.plots.sdg_sentiments import IN_CSV, draw, sdg_cols, sentiment_totals
+
+OUT_DIR = os.path.join("results", "plots")
+MANIFEST_PATH = os.path.join(OUT_DIR, "manifest.json")
+FAMILIES = ["global", "company", "year"]
+FORMATS = ["png"]
+WORKERS = os.cpu_count() or 1
+STYLE_VERSION = 1  # bump when draw() changes so every figure is redrawn
+
+
+def figure_jobs(df: pd.DataFrame, families=FAMILIES, formats=FORMATS) -> List[Dict]:
+    """One job per figure: output stem, title and the totals it plots."""
+    slices = []
+    if "global" in families:
+        slices.append(("global", "all", "Positive vs Negative Counts per SDG and AI", df))
+    if "company" in families:
+        for company, part in df.groupby("company"):
+            slices.append(("company", company, f"{company}: Positive vs Negative Counts per SDG and AI", part))
+    if "year" in families:
+        for year, part in df.groupby("year"):
+            slices.append(("year", year, f"{year}: Positive vs Negative Counts per SDG and AI", part))
+
+    jobs = []
+    for family, name, title, part in slices:
+        positive, negative = sentiment_totals(part)
+        job = {
+            "stem": os.path.join(OUT_DIR, family, quote(str(name), safe="")),
+            "title": title,
+            "positive": [int(v) for v in positive],
+            "negative": [int(v) for v in negative],
+            "formats": list(formats),
+        }
+        material = json.dumps([STYLE_VERSION, sdg_cols, job], sort_keys=True, ensure_ascii=False)
+        job["hash"] = hashlib.sha256(material.encode("utf-8")).hexdigest()
+        jobs.append(job)
+    return jobs
+
+
+def render_job(job: Dict) -> str:
+    """Draw one figure and write it in every requested format; return its stem."""
+    import matplotlib.pyplot as plt
+
+    fig = draw(job["positive"], job["negative"], title=job["title"])
+    os.makedirs(os.path.dirname(job["stem"]), exist_ok=True)
+    for fmt in job["formats"]:
+        path = f"{job['stem']}.{fmt}"
+        fig.savefig(path + ".part", format=fmt)
+        os.replace(path + ".part", path)
+    plt.close(fig)
+    return job["stem"]
+
+
+def load_manifest(path: str = MANIFEST_PATH) -> Dict[str, str]:
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_manifest(manifest: Dict[str, str], path: str = MANIFEST_PATH) -> None:
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path + ".part", "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1, sort_keys=True)
+    os.replace(path + ".part", path)
+
+
+def is_current(job: Dict, manifest: Dict[str, str]) -> bool:
+    return manifest.get(job["stem"]) == job["hash"] and all(
+        os.path.exists(f"{job['stem']}.{fmt}") for fmt in job["formats"])
+
+
+def render(in_csv: str = IN_CSV, families=FAMILIES, formats=FORMATS, workers: int = WORKERS,
+           force: bool = False) -> int:
+    """Render the figures whose input changed; return how many were drawn."""
+    df = pd.read_csv(in_csv, dtype={"company": str, "year": str})
+    manifest = load_manifest()
+    jobs = [j for j in figure_jobs(df, families, formats) if force or not is_current(j, manifest)]
+    if not jobs:
+        return 0
+
+    hashes = {j["stem"]: j["hash"] for j in jobs}
+    try:
+        if workers <= 1:
+            done = (render_job(j) for j in jobs)
+            for stem in tqdm(done, total=len(jobs), desc="Figures"):
+                manifest[stem] = hashes[stem]
+        else:
+            with ProcessPoolExecutor(max_workers=workers) as pool:
+                for stem in tqdm(pool.map(render_job, jobs, chunksize=8), total=len(jobs), desc="Figures"):
+                    manifest[stem] = hashes[stem]
+    finally:
+        # figures drawn before a failure are not redrawn next time
+        save_manifest(manifest)
+    return len(jobs)
+
+
+if __name__ == "__main__":
+    args = sys.argv[1:]
+    families = [a for a in args if a in FAMILIES] or FAMILIES
+    formats = ["png", "svg"] if "--svg" in args else FORMATS
+    drawn = render(families=families, formats=formats, force="--force" in args)
+    print(f"Rendered {drawn} figures to {OUT_DIR}")
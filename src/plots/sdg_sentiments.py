@@ -1,37 +1,56 @@
+import os
+
 import pandas as pd
+import matplotlib
+
+matplotlib.use("Agg")  # headless; figures are written to files
 import matplotlib.pyplot as plt
 
-# Load CSV
-df = pd.read_csv("src/classification/results/company_year_sentiment_counts.csv")
+IN_CSV = os.path.join("src", "classification", "results", "company_year_sentiment_counts.csv")
+OUT_PNG = os.path.join("results", "plots", "sdg_sentiments.png")
 
 # Columns of interest: SDG 1–17 and AI
 sdg_cols = [str(i) for i in range(1, 18)] + ["AI"]
 
-# Group by sentiment and sum counts
-grouped = df.groupby("sentiment")[sdg_cols].sum()
-
-# Ensure Positive and Negative rows exist
-for sentiment in ["Positive", "Negative"]:
-    if sentiment not in grouped.index:
-        grouped.loc[sentiment] = 0
-
-# Extract counts
-positive_counts = grouped.loc["Positive"]
-negative_counts = -grouped.loc["Negative"]  # flip for mirror effect
-
-# Plot
-x = range(len(sdg_cols))
-plt.figure(figsize=(12, 6))
-
-plt.bar(x, positive_counts, color="green", label="Positive")
-plt.bar(x, negative_counts, color="red", label="Negative")
-
-# Formatting
-plt.axhline(0, color="black", linewidth=1)
-plt.xticks(x, sdg_cols, rotation=45)
-plt.ylabel("Counts")
-plt.xlabel("SDGs and AI")
-plt.title("Positive vs Negative Counts per SDG and AI")
-plt.legend()
-plt.tight_layout()
-plt.show()
+
+def sentiment_totals(df):
+    """Positive and Negative counts per SDG/AI column, summed over all rows of ``df``."""
+    # Group by sentiment and sum counts
+    grouped = df.groupby("sentiment")[sdg_cols].sum()
+
+    # Ensure Positive and Negative rows exist
+    for sentiment in ["Positive", "Negative"]:
+        if sentiment not in grouped.index:
+            grouped.loc[sentiment] = 0
+
+    return grouped.loc["Positive"], grouped.loc["Negative"]
+
+
+def draw(positive_counts, negative_counts, title="Positive vs Negative Counts per SDG and AI"):
+    """Mirrored bar chart of Positive (up) vs Negative (down) counts; returns the figure."""
+    x = range(len(sdg_cols))
+    fig, ax = plt.subplots(figsize=(12, 6))
+
+    ax.bar(x, list(positive_counts), color="green", label="Positive")
+    ax.bar(x, [-v for v in negative_counts], color="red", label="Negative")  # flip for mirror effect
+
+    # Formatting
+    ax.axhline(0, color="black", linewidth=1)
+    ax.set_xticks(list(x))
+    ax.set_xticklabels(sdg_cols, rotation=45)
+    ax.set_ylabel("Counts")
+    ax.set_xlabel("SDGs and AI")
+    ax.set_title(title)
+    ax.legend()
+    fig.tight_layout()
+    return fig
+
+
+if __name__ == "__main__":
+    # Load CSV
+    df = pd.read_csv(IN_CSV)
+    fig = draw(*sentiment_totals(df))
+    os.makedirs(os.path.dirname(OUT_PNG), exist_ok=True)
+    fig.savefig(OUT_PNG)
+    plt.close(fig)
+    print(f"Saved {OUT_PNG}")
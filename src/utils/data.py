@@ -1,46 +1,73 @@
-# handle data merge
 #!/usr/bin/env python3
+# handle data merge
+#
+# Inputs and results are ingested incrementally: byte-offset watermarks (see
+# src/utils/watermarks.py) remember how far each batch/result file was read,
+# and the rows live in SQLite tables next to the watermarks. Each run reads only
+# new lines and re-exports the CSV only if something changed.
 import os
-import re
-import json
+import sys
 import glob
 import csv
 
 import pandas as pd
 
+from src.utils.registry import LEGACY_RE, load_registry
+from src.utils.watermarks import Watermarks
+
 # ---- Config ----
 BATCH_INPUT_DIR = os.path.join("data", "batches_41_mini", "patched_max_tokens_50")
-BATCH_INPUT_PATTERN = os.path.join(BATCH_INPUT_DIR, "batch_[0-4].jsonl")  # skip batch_5
+BATCH_INPUT_PATTERN = os.path.join(BATCH_INPUT_DIR, "batch_*.jsonl")
 RESULTS_DIR = os.path.join("data", "batch_results")
 RESULTS_PATTERN = os.path.join(RESULTS_DIR, "*.jsonl")
 OUT_DIR = os.path.join("data", "compiled")
 OUT_CSV = os.path.join(OUT_DIR, "batch_merged.csv")
 
-# Regex: task-<numbers>-<company>-<year>
-CID_RE = re.compile(r"^task-(?P<number>\d+)-(?P<company>.+)-(?P<year>\d{4})$")
+INPUTS_CONSUMER = "data.inputs"
+RESULTS_CONSUMER = "data.results"
 
-def iter_jsonl(path_pattern):
+# Legacy ids: task-<numbers>-<company>-<year>; compact ids: s<gid> (see src/utils/registry.py)
+CID_RE = LEGACY_RE
+
+def iter_new_jsonl(wm, consumer, path_pattern):
+    """Yield ``(path, obj)`` for lines not consumed yet; offsets are staged per file."""
     for path in sorted(glob.glob(path_pattern)):
-        with open(path, "r", encoding="utf-8") as f:
-            for line_no, line in enumerate(f, start=1):
-                line=line.strip()
-                if not line:
-                    continue
-                try:
-                    yield path, line_no, json.loads(line)
-                except json.JSONDecodeError:
-                    # tolerate partial/truncated lines
-                    continue
+        end = None
+        for obj, end in wm.iter_new(consumer, path):
+            if obj is not None:
+                # tolerate partial/truncated lines
+                yield path, obj
+        if end is not None:
+            wm.set(consumer, path, end, commit=False)
 
 def parse_custom_id(custom_id: str):
-    m = CID_RE.match(custom_id.strip())
-    if not m:
+    company, year, number = load_registry().resolve(custom_id)
+    if company is None:
         return None, None, None
-    return m.group("number"), m.group("company"), m.group("year")
+    return str(number), company, str(year)
+
+def open_tables(conn):
+    conn.executescript(
+        """
+        CREATE TABLE IF NOT EXISTS batch_inputs (
+            CustomID TEXT PRIMARY KEY,
+            SomeNumber TEXT,
+            Company TEXT,
+            Year TEXT,
+            Sentence TEXT
+        );
+        CREATE TABLE IF NOT EXISTS batch_results (
+            CustomID TEXT PRIMARY KEY,
+            AssistantContent TEXT,
+            PromptTokens INTEGER,
+            CompletionTokens INTEGER
+        );
+        """
+    )
 
-def collect_inputs():
-    rows = []
-    for path, line_no, obj in iter_jsonl(BATCH_INPUT_PATTERN):
+def collect_inputs(wm):
+    rows = 0
+    for path, obj in iter_new_jsonl(wm, INPUTS_CONSUMER, BATCH_INPUT_PATTERN):
         custom_id = obj.get("custom_id")
         if not custom_id:
             continue
@@ -60,18 +87,16 @@ def collect_inputs():
         except Exception:
             sentence = None
 
-        rows.append({
-            "CustomID": custom_id,
-            "SomeNumber": number,
-            "Company": company,
-            "Year": year,
-            "Sentence": sentence
-        })
-    return pd.DataFrame(rows)
-
-def collect_results():
-    recs = {}
-    for path, line_no, obj in iter_jsonl(RESULTS_PATTERN):
+        wm.conn.execute(
+            "INSERT OR IGNORE INTO batch_inputs VALUES (?, ?, ?, ?, ?)",
+            (custom_id, number, company, year, sentence),
+        )
+        rows += 1
+    return rows
+
+def collect_results(wm):
+    rows = 0
+    for path, obj in iter_new_jsonl(wm, RESULTS_CONSUMER, RESULTS_PATTERN):
         custom_id = obj.get("custom_id")
         if not custom_id:
             continue
@@ -94,33 +119,42 @@ def collect_results():
         prompt_tokens = usage.get("prompt_tokens")
         completion_tokens = usage.get("completion_tokens")
 
-        recs[custom_id] = {
-            "AssistantContent": content,
-            "PromptTokens": prompt_tokens,
-            "CompletionTokens": completion_tokens
-        }
-    # make a DataFrame
-    if not recs:
-        return pd.DataFrame(columns=["CustomID","AssistantContent","PromptTokens","CompletionTokens"])
-    df = pd.DataFrame.from_dict(recs, orient="index").reset_index().rename(columns={"index":"CustomID"})
-    return df
-
-def main():
-    os.makedirs(OUT_DIR, exist_ok=True)
-
-    df_in = collect_inputs()
-    df_res = collect_results()
+        # later results for the same request win
+        wm.conn.execute(
+            "INSERT OR REPLACE INTO batch_results VALUES (?, ?, ?, ?)",
+            (custom_id, content, prompt_tokens, completion_tokens),
+        )
+        rows += 1
+    return rows
 
-    # Merge on CustomID
-    df = df_in.merge(df_res, on="CustomID", how="left")
+def main(rebuild=False):
+    os.makedirs(OUT_DIR, exist_ok=True)
 
-    # Reorder/final columns
-    cols = [
-        "Company", "Year", "SomeNumber", "Sentence",
-        "AssistantContent", "PromptTokens", "CompletionTokens",
-        "CustomID"
-    ]
-    df = df[cols]
+    with Watermarks() as wm:
+        open_tables(wm.conn)
+        if rebuild:
+            wm.conn.execute("DELETE FROM batch_inputs")
+            wm.conn.execute("DELETE FROM batch_results")
+            wm.reset(consumer=INPUTS_CONSUMER)
+            wm.reset(consumer=RESULTS_CONSUMER)
+
+        new_inputs = collect_inputs(wm)
+        new_results = collect_results(wm)
+        wm.conn.commit()
+        print(f"New input rows: {new_inputs} | new result rows: {new_results}")
+
+        if not (new_inputs or new_results or rebuild) and os.path.exists(OUT_CSV):
+            print(f"No new data, {OUT_CSV} is up to date")
+            return
+
+        # Merge on CustomID, in input order
+        df = pd.read_sql_query(
+            "SELECT i.Company, i.Year, i.SomeNumber, i.Sentence,"
+            " r.AssistantContent, r.PromptTokens, r.CompletionTokens, i.CustomID"
+            " FROM batch_inputs i LEFT JOIN batch_results r ON r.CustomID = i.CustomID"
+            " ORDER BY i.rowid",
+            wm.conn,
+        )
 
     # Save
     df.to_csv(
@@ -135,4 +169,4 @@ def main():
     print(f"Saved {len(df)} rows to {OUT_CSV}")
 
 if __name__ == "__main__":
-    main()
+    main(rebuild="--rebuild" in sys.argv[1:])
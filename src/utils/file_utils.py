@@ -14,5 +14,17 @@ def load_text(text_file):
     with open(text_file) as text_file:
         return text_file.read()
 
+def iter_jsonl(jsonl_file):
+    """Yield one dict per line of a JSONL file, skipping blank and malformed lines."""
+    with open(jsonl_file, "r", encoding="utf-8") as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError:
+                continue
+
 
 
@@ -0,0 +1,175 @@
+"""Corpus registry of dense integer partition and sentence ids.
+
+Every ``data/texts/<company>/<year>/splits.json`` partition gets a partition id
+``pid`` (in registration order, never renumbered) and a contiguous range of
+global sentence ids starting at ``offset``; a partition re-split into more
+sentences than its range holds gets a new pid and range, and the old one
+stays decodable::
+
+    gid = offsets[pid] + int(sentence_id)
+
+Compact custom_ids are ``s<gid>`` and decode by a binary search over the
+sorted offsets, so they carry no company names to parse. Arrays of gids
+decode in one vectorized call, which makes integer-keyed joins and
+group-bys across stages cheap. Legacy ``task-{sentence_id}-{company}-{year}``
+ids are still understood everywhere.
+
+Usage:
+    python src/utils/registry.py    # register partitions that are new or outgrew their range since the last run
+"""
+
+import json
+import os
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+BASE_DIR = os.path.join("data", "texts")
+REGISTRY_PATH = os.path.join("data", "registry", "partitions.json")
+
+COMPACT_RE = re.compile(r"^s(\d+)$")
+LEGACY_RE = re.compile(r"^task-(?P<number>\d+)-(?P<company>.+)-(?P<year>\d{4})$")
+
+
+class Registry:
+    """Partitions as parallel lists: company dir, year, first gid, id range size, sentence count.
+
+    Args:
+        partitions: Rows of ``[company, year, offset, size, count]`` in pid order.
+    """
+
+    def __init__(self, partitions: Optional[List[list]] = None):
+        self.partitions = [list(p) for p in partitions or []]
+        self._reindex()
+
+    def _reindex(self) -> None:
+        self.offsets = np.asarray([p[2] for p in self.partitions], dtype=np.int64)
+        self.sizes = np.asarray([p[3] for p in self.partitions], dtype=np.int64)
+        self.counts = np.asarray([p[4] for p in self.partitions], dtype=np.int64)
+        self._pids = {(p[0], str(p[1])): pid for pid, p in enumerate(self.partitions)}
+
+    def __len__(self) -> int:
+        return len(self.partitions)
+
+    @property
+    def total_ids(self) -> int:
+        return int(self.offsets[-1] + self.sizes[-1]) if self.partitions else 0
+
+    # ---------------- Persistence ----------------
+    @classmethod
+    def load(cls, path: str = REGISTRY_PATH) -> "Registry":
+        if not os.path.exists(path):
+            return cls()
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["partitions"])
+
+    def save(self, path: str = REGISTRY_PATH) -> None:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".part"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"version": 1, "partitions": self.partitions}, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def update(self, base_dir: str = BASE_DIR) -> int:
+        """Register partitions under ``base_dir`` that are new or outgrew their range; return how many.
+
+        Known partitions keep their id range and get their current sentence
+        count. A partition re-split into sentence ids beyond its range is
+        registered again with a new range at the end: its old gids still
+        decode, new ones are issued from the new range.
+        """
+        added = 0
+        next_offset = self.total_ids
+        for company in sorted(os.listdir(base_dir)):
+            company_dir = os.path.join(base_dir, company)
+            if not os.path.isdir(company_dir):
+                continue
+            for year in sorted(os.listdir(company_dir)):
+                splits_path = os.path.join(company_dir, year, "splits.json")
+                if not os.path.exists(splits_path):
+                    continue
+                with open(splits_path, "r", encoding="utf-8") as f:
+                    ids = [int(k) for k in json.load(f)]
+                size = max(ids) + 1 if ids else 0
+                pid = self._pids.get((company, str(year)))
+                if pid is not None and size <= self.partitions[pid][3]:
+                    self.partitions[pid][4] = len(ids)
+                    continue
+                self.partitions.append([company, year, next_offset, size, len(ids)])
+                self._pids[(company, year)] = len(self.partitions) - 1
+                next_offset += size
+                added += 1
+        self._reindex()
+        return added
+
+    def live_pids(self) -> List[int]:
+        """Current pid of every partition (ranges superseded by a re-split are left out)."""
+        return sorted(self._pids.values())
+
+    # ---------------- Encoding ----------------
+    def pid(self, company: str, year) -> Optional[int]:
+        return self._pids.get((company, str(year)))
+
+    def gid(self, company: str, year, sentence_id) -> int:
+        pid = self._pids[(company, str(year))]
+        sid = int(sentence_id)
+        if not 0 <= sid < self.partitions[pid][3]:
+            raise KeyError(f"sentence {sid} outside the registered range of {company}/{year}")
+        return int(self.offsets[pid]) + sid
+
+    def custom_id(self, company: str, year, sentence_id) -> str:
+        return f"s{self.gid(company, year, sentence_id)}"
+
+    # ---------------- Decoding ----------------
+    def decode_many(self, gids) -> Tuple[np.ndarray, np.ndarray]:
+        """Vectorized ``gid -> (pid, sentence_id)``."""
+        gids = np.asarray(gids, dtype=np.int64)
+        pids = np.searchsorted(self.offsets, gids, side="right") - 1
+        return pids, gids - self.offsets[pids]
+
+    def decode(self, gid: int) -> Tuple[str, str, int]:
+        """``gid -> (company, year, sentence_id)``."""
+        if not 0 <= gid < self.total_ids:
+            raise KeyError(f"gid {gid} is not registered")
+        pid = int(np.searchsorted(self.offsets, gid, side="right") - 1)
+        company, year = self.partitions[pid][:2]
+        return company, year, gid - int(self.offsets[pid])
+
+    def resolve(self, custom_id: str) -> Tuple[Optional[str], Optional[str], Optional[int]]:
+        """``(company, year, sentence_id)`` of a compact or legacy custom_id, or Nones."""
+        s = (custom_id or "").strip()
+        m = COMPACT_RE.match(s)
+        if m:
+            try:
+                return self.decode(int(m.group(1)))
+            except KeyError:
+                return None, None, None
+        m = LEGACY_RE.match(s)
+        if m:
+            return m.group("company"), m.group("year"), int(m.group("number"))
+        return None, None, None
+
+
+@lru_cache(maxsize=1)
+def load_registry(path: str = REGISTRY_PATH) -> Registry:
+    """Registry loaded once per process."""
+    return Registry.load(path)
+
+
+def to_legacy_id(custom_id: str) -> str:
+    """Rewrite a compact ``s<gid>`` id as ``task-{sentence_id}-{company}-{year}``; others pass through."""
+    if not custom_id or not COMPACT_RE.match(custom_id.strip()):
+        return custom_id
+    company, year, sid = load_registry().resolve(custom_id)
+    return f"task-{sid}-{company}-{year}" if company is not None else custom_id
+
+
+if __name__ == "__main__":
+    registry = Registry.load()
+    added = registry.update()
+    registry.save()
+    live = registry.live_pids()
+    print(f"Registered {added} new or outgrown partitions; {len(live)} partitions, "
+          f"{int(registry.counts[live].sum()) if live else 0} sentences, {registry.total_ids} ids")
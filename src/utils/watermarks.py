@@ -0,0 +1,107 @@
+"""Byte-offset watermarks for incremental consumption of append-only JSONL files.
+
+Each consumer (``extract_results``, ``aggregate_store``, ``data``, ...) records,
+per input file, the byte offset up to which it has consumed complete lines.
+The next run seeks straight to that offset, so a poll cycle only reads what
+was appended or downloaded since. A trailing line without newline (a file
+still being written) is left for the next run. A file that shrank below its
+watermark is treated as replaced and read again from the start.
+"""
+
+import json
+import os
+import sqlite3
+from typing import Dict, Iterator, Tuple
+
+WATERMARKS_PATH = os.path.join("data", "compiled", "watermarks.sqlite")
+
+
+class Watermarks:
+    """SQLite table of ``(consumer, path) -> offset``.
+
+    Args:
+        path: Database file, created if missing. Consumers may keep their own
+            tables in ``conn`` to commit state and offsets in one transaction.
+    """
+
+    def __init__(self, path: str = WATERMARKS_PATH):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS watermarks ("
+            " consumer TEXT,"
+            " path TEXT,"
+            " offset INTEGER,"
+            " PRIMARY KEY (consumer, path))"
+        )
+        self.conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self) -> None:
+        self.conn.commit()
+        self.conn.close()
+
+    def has(self, consumer: str, path: str) -> bool:
+        return self.conn.execute(
+            "SELECT 1 FROM watermarks WHERE consumer = ? AND path = ?", (consumer, path)).fetchone() is not None
+
+    def offset(self, consumer: str, path: str) -> int:
+        row = self.conn.execute(
+            "SELECT offset FROM watermarks WHERE consumer = ? AND path = ?", (consumer, path)).fetchone()
+        return row[0] if row else 0
+
+    def set(self, consumer: str, path: str, offset: int, commit: bool = True) -> None:
+        self.conn.execute("INSERT OR REPLACE INTO watermarks VALUES (?, ?, ?)", (consumer, path, offset))
+        if commit:
+            self.conn.commit()
+
+    def reset(self, consumer: str = None, path: str = None) -> None:
+        """Forget the watermarks of a consumer, of a path, or of both combined."""
+        clauses, args = [], []
+        if consumer is not None:
+            clauses.append("consumer = ?")
+            args.append(consumer)
+        if path is not None:
+            clauses.append("path = ?")
+            args.append(path)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        self.conn.execute(f"DELETE FROM watermarks{where}", args)
+        self.conn.commit()
+
+    def offsets(self, consumer: str) -> Dict[str, int]:
+        rows = self.conn.execute("SELECT path, offset FROM watermarks WHERE consumer = ?", (consumer,))
+        return dict(rows.fetchall())
+
+    def iter_new_lines(self, consumer: str, path: str) -> Iterator[Tuple[bytes, int]]:
+        """Yield ``(raw_line, end_offset)`` for complete, non-blank lines after the watermark."""
+        start = self.offset(consumer, path)
+        if start > os.path.getsize(path):
+            start = 0
+        with open(path, "rb") as f:
+            f.seek(start)
+            pos = start
+            for line in f:
+                if not line.endswith(b"\n"):
+                    break  # still being written
+                pos += len(line)
+                if line.strip():
+                    yield line, pos
+
+    def iter_new(self, consumer: str, path: str) -> Iterator[Tuple[dict, int]]:
+        """Yield ``(obj, end_offset)`` for complete lines after the watermark.
+
+        Malformed lines are yielded as None so ``end_offset`` still moves past
+        them. The caller stores the last ``end_offset`` with ``set`` once the
+        rows are safely processed.
+        """
+        for line, pos in self.iter_new_lines(consumer, path):
+            try:
+                obj = json.loads(line)
+            except json.JSONDecodeError:
+                obj = None
+            yield obj, pos
@@ -0,0 +1,144 @@
+import csv
+import json
+import os
+from collections import defaultdict
+
+import pytest
+
+from src.analysis import aggregate_store, parsing, warehouse
+from src.analysis.labels import (LABEL_MAX, LABEL_MIN, LABELS, RESULTS_JSONL, core_is_malformed,
+                                 extract_company_year, normalize_sentiment)
+from src.utils.file_utils import iter_jsonl
+
+CSV_NAMES = ["company_year_sentiment_counts.csv", "company_year_pos_minus_neg.csv", "entries_all_zero_1_17.csv"]
+
+# (custom_id, assistant_content) in merged_classifications.jsonl order
+MERGED = [
+    ("task-1-acme-2020", "[3, True, Positive]"),
+    ("task-2-acme-2020", "[0, False, Negative]"),
+    ("task-3-beta_$1 b_energy-2021", "[1, 2, False, Positive]"),
+    ("task-4-beta_$1 b_energy-2021", "[7, False, Negative]"),
+    ("task-5-acme-2021", "[0, 4, True, Positive]"),
+    ("task-1-acme-2020", "[5, False, Negative]"),           # relabelled: moves to Negative
+    ("task-3-beta_$1 b_energy-2021", "[1, 2, False, Positive]"),  # repeated as is
+    ("task-4-beta_$1 b_energy-2021", "garbage"),             # unlabelled: the earlier row stays
+    ("task-6-gamma-2019", "[0, False, Positive]"),
+    ("task-6-gamma-2019", "[0, True, Positive]"),
+]
+
+# one row per custom_id, answers in the formats the legacy parser handles
+UNIQUE = [
+    ("task-1-acme-2020", "[3, True, Positive]"),
+    ("task-2-acme-2020", "[5, 5, 3, False, Positive]"),
+    ("task-3-acme-2020", "[0, 4, True, Negative]"),
+    ("task-4-acme-2020", "[18, False, Negative]"),
+    ("task-5-acme-2020", "```json\n[4, true, \"Negative\"]\n```"),
+    ("task-6-acme-2020", "3, True, Positive"),
+    ("task-7-acme-2020", "['12', 'False', 'positive']"),
+    ("task-8-acme-2020", "[2, True, Neutral]"),
+    ("task-16-8.munich re_$63.39_financials-2019", "[13, 7, False, Negative]"),
+    ("task-16-9.munich re_$63.39_financials-2019", "[False, Positive]"),
+    ("no-year-here", "[1, True, Positive]"),
+    ("task-9-acme-2021", None),
+]
+
+
+def baseline_counts_csv(rows, out_csv):
+    """The aggregation and CSV writing of the original generate_scores.py, kept as it was."""
+    agg = defaultdict(lambda: {str(k): 0 for k in LABELS} | {"AI": 0})
+    for row in rows:
+        cid = row.get("custom_id")
+        company, year = extract_company_year(cid)
+        if not company or not year:
+            continue
+        parsed = parsing.parse_assistant_content(row.get("assistant_content"))
+        if not isinstance(parsed, (list, tuple)) or len(parsed) < 1:
+            continue
+        ai_flag = parsed[-2] if len(parsed) >= 2 else None
+        sentiment = parsed[-1] if len(parsed) >= 1 else None
+        sentiment = normalize_sentiment(sentiment)
+        if sentiment is None:
+            continue
+        key = (company, year, sentiment)
+        bucket = agg[key]
+        core = list(parsed[:-2]) if len(parsed) > 2 else []
+        if (0 in core) or core_is_malformed(core):
+            bucket["0"] += 1
+        else:
+            for v in set(core):
+                if isinstance(v, int) and LABEL_MIN <= v <= LABEL_MAX:
+                    bucket[str(v)] += 1
+        if isinstance(ai_flag, bool) and ai_flag is True:
+            bucket["AI"] += 1
+
+    fieldnames = ["company", "year", "sentiment"] + [str(k) for k in LABELS] + ["AI"]
+
+    def sentiment_order(s): return 0 if s == "Positive" else 1
+    sorted_keys = sorted(agg.keys(), key=lambda k: (k[0], k[1], sentiment_order(k[2])))
+
+    with open(out_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fieldnames)
+        writer.writeheader()
+        for (company, year, sentiment) in sorted_keys:
+            row = {"company": company, "year": year, "sentiment": sentiment}
+            row.update(agg[(company, year, sentiment)])
+            writer.writerow(row)
+
+
+def write_merged(rows):
+    os.makedirs(os.path.dirname(RESULTS_JSONL), exist_ok=True)
+    with open(RESULTS_JSONL, "w", encoding="utf-8") as f:
+        for custom_id, content in rows:
+            f.write(json.dumps({"custom_id": custom_id, "user_content": "A sentence.",
+                                "assistant_content": content}) + "\n")
+
+
+def read_bytes(directory, name):
+    with open(os.path.join(directory, name), "rb") as f:
+        return f.read()
+
+
+def test_store_matches_warehouse_export_with_duplicated_ids(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_merged(MERGED)
+
+    aggregate_store.main()
+    warehouse.build()
+    warehouse.export("exports")
+
+    for name in CSV_NAMES:
+        assert read_bytes(aggregate_store.RESULTS_DIR, name) == read_bytes("exports", name), name
+    counts = read_bytes(aggregate_store.RESULTS_DIR, CSV_NAMES[0]).decode().splitlines()
+    assert "acme,2020,Negative,1,0,0,0,0,1,0,0,0,0,0,0,0,0,0,0,0,0,0" in counts
+    assert "beta_$1 b_energy,2021,Negative,0,0,0,0,0,0,0,1,0,0,0,0,0,0,0,0,0,0,0" in counts
+    assert not any(line.startswith("acme,2020,Positive") for line in counts)
+
+
+def test_store_counts_equal_the_original_generate_scores(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_merged(UNIQUE)
+    # the pool folds chunks of two rows in file order
+    with aggregate_store.Watermarks() as wm:
+        store = aggregate_store.AggregateStore(wm.conn)
+        aggregate_store.sync(wm, store, workers=2, chunk_rows=2)
+        wm.conn.commit()
+        store.export()
+
+    baseline_counts_csv(list(iter_jsonl(RESULTS_JSONL)), "baseline.csv")
+    baseline = read_bytes(".", "baseline.csv")
+    assert len(baseline.splitlines()) == 5
+    assert read_bytes(aggregate_store.RESULTS_DIR, CSV_NAMES[0]) == baseline
+    aggregate_store.check()
+
+
+def test_check_counts_the_last_labelled_row_per_custom_id(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    write_merged(MERGED)
+    aggregate_store.main()
+    aggregate_store.check()
+
+    with aggregate_store.Watermarks() as wm:
+        wm.conn.execute("UPDATE agg_sentiment_counts SET \"AI\" = \"AI\" + 1")
+        wm.conn.commit()
+    with pytest.raises(AssertionError):
+        aggregate_store.check()
@@ -0,0 +1,34 @@
+import os
+
+from src.classification.cache import CacheHitWriter
+from src.classification.extract_results import open_index, result_row
+from src.utils.file_utils import iter_jsonl
+
+
+def test_hits_are_written_once_with_their_sentence(tmp_path):
+    results_dir = str(tmp_path / "results")
+    with CacheHitWriter(results_dir) as hits:
+        hits.write("task-1-co-2020", ("[0, False, Positive]", 10, 5), "First sentence.")
+        hits.write("task-2-co-2020", ("[3, True, Negative]", 12, 6), "Second sentence.")
+    with CacheHitWriter(results_dir) as hits:
+        hits.write("task-2-co-2020", ("[3, True, Negative]", 12, 6), "Second sentence.")
+        hits.write("task-3-co-2020", ("[0, False, Negative]", 9, 5), "Third sentence.")
+        assert (hits.count, hits.new) == (2, 1)
+
+    assert os.listdir(results_dir) == ["cache_hits.jsonl"]
+    lines = list(iter_jsonl(os.path.join(results_dir, "cache_hits.jsonl")))
+    assert [o["custom_id"] for o in lines] == ["task-1-co-2020", "task-2-co-2020", "task-3-co-2020"]
+
+    conn = open_index(str(tmp_path / "index" / "requests.sqlite"))
+    row = result_row(lines[1], conn)
+    assert row["user_content"] == "Second sentence."
+    assert row["source"] == "cache_hits"
+    assert row["assistant_content"] == "[3, True, Negative]"
+
+
+def test_torn_last_line_is_not_glued_to_the_next_hit(tmp_path):
+    path = tmp_path / "cascade.jsonl"
+    path.write_text('{"custom_id": "task-1-co-2020", "resp')
+    with CacheHitWriter(str(tmp_path), prefix="cascade") as hits:
+        hits.write("task-2-co-2020", ("[0, False, Positive]", None, None), "A sentence.")
+    assert [o["custom_id"] for o in iter_jsonl(str(path))] == ["task-2-co-2020"]
@@ -0,0 +1,49 @@
+import pytest
+
+httpx = pytest.importorskip("httpx")
+
+from src.classification import download, job_ledger
+
+
+class _Stream:
+    def __init__(self, chunks, fail_after=None):
+        self.chunks, self.fail_after = chunks, fail_after
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def iter_bytes(self, size):
+        for i, chunk in enumerate(self.chunks):
+            if i == self.fail_after:
+                raise httpx.ReadError("connection reset")
+            yield chunk
+
+
+class _Client:
+    """Fake client whose first download drops the connection mid-stream."""
+
+    def __init__(self, chunks):
+        self.chunks, self.calls = chunks, 0
+        self.files = self
+        self.with_streaming_response = self
+
+    def content(self, file_id):
+        self.calls += 1
+        return _Stream(self.chunks, fail_after=1 if self.calls == 1 else None)
+
+
+def test_mid_stream_error_is_retried_and_counts_match_rerun(tmp_path, monkeypatch):
+    monkeypatch.setattr(job_ledger, "BACKOFF_BASE", 0)
+    chunks = [b'{"a": 1}\n{"a"', b': 2}\n\n', b'{"a": 3}']
+    client = _Client(chunks)
+    dest = str(tmp_path / "out" / "batch_1.jsonl")
+
+    first = download.download_file(client, "file-1", dest)
+    assert client.calls == 2
+    with open(dest, "rb") as f:
+        assert f.read() == b"".join(chunks)
+    assert first == download.download_file(client, "file-1", dest) == 3
+    assert client.calls == 2
@@ -0,0 +1,31 @@
+import re
+from collections import Counter
+
+from src.data_processing.outlier_guard import guard_sentences
+
+
+def _words(texts):
+    return Counter(w for t in texts for w in re.findall(r"\w+", t))
+
+
+def test_removed_and_kept_text_add_up_to_input():
+    table = ("Revenue rose in every segment this year 12.4 13.1 14.2 while costs were 1.2 1.3 1.4 and"
+             " margins were 2.1 2.2 2.3 and cash flow was 3 4 5 in the period under review")
+    prose = " ".join(["The company expanded its sustainability programme across sites"] * 20)
+    bullets = "Our goals:\n• reduce emissions by half\n• 7 8 9\n• train all employees on data ethics"
+    sentences = ["A plain sentence about artificial intelligence.", table, prose, bullets]
+
+    kept, report = guard_sentences(sentences)
+
+    assert all(len(r["text"]) == r["chars"] for r in report["removed"])  # samples not truncated
+    assert _words(kept) + _words(r["text"] for r in report["removed"]) == _words(sentences)
+    assert report["dropped_chars"] == sum(len(r["text"]) for r in report["removed"])
+    assert report["dropped"]["numeric"] >= 4
+    assert "Revenue rose in every segment this year" in kept
+
+
+def test_kept_sentences_keep_their_numbers():
+    sentence = "In 2023 revenue grew by 12.4% to 3.1 billion euros, driven by AI products."
+    kept, report = guard_sentences([sentence])
+    assert kept == [sentence]
+    assert report["removed"] == []
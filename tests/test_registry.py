@@ -0,0 +1,29 @@
+import json
+
+from src.utils.registry import Registry
+
+
+def write_splits(base_dir, company, year, n):
+    path = base_dir / company / year
+    path.mkdir(parents=True, exist_ok=True)
+    (path / "splits.json").write_text(json.dumps({str(i): f"Sentence {i}." for i in range(n)}))
+
+
+def test_resplit_partition_gets_a_new_range(tmp_path):
+    write_splits(tmp_path, "acme", "2020", 3)
+    write_splits(tmp_path, "beta", "2021", 2)
+    registry = Registry()
+    assert registry.update(str(tmp_path)) == 2
+    old_id = registry.custom_id("acme", "2020", 2)
+
+    write_splits(tmp_path, "acme", "2020", 5)  # re-split into more sentences
+    write_splits(tmp_path, "beta", "2021", 1)
+    assert registry.update(str(tmp_path)) == 1
+    registry = Registry(registry.partitions)  # as saved and loaded
+
+    new_id = registry.custom_id("acme", "2020", 4)
+    assert registry.resolve(new_id) == ("acme", "2020", 4)
+    assert registry.resolve(old_id) == ("acme", "2020", 2)
+    assert registry.custom_id("acme", "2020", 2) != old_id
+    assert [registry.counts[pid] for pid in registry.live_pids()] == [1, 5]
+    assert registry.update(str(tmp_path)) == 0
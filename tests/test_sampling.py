@@ -0,0 +1,58 @@
+import json
+import os
+
+import pytest
+
+pytest.importorskip("langdetect")
+
+from src.analysis import sampling  # noqa: E402
+from src.analysis.aggregate_store import AggregateStore  # noqa: E402
+from src.utils.registry import REGISTRY_PATH, Registry, load_registry  # noqa: E402
+from src.utils.watermarks import Watermarks  # noqa: E402
+
+
+def write_splits(company, year, n):
+    path = os.path.join(sampling.TEXTS_DIR, company, year)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "splits.json"), "w", encoding="utf-8") as f:
+        json.dump({str(i): f"Sentence {i}." for i in range(n)}, f)
+
+
+@pytest.fixture
+def corpus(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs(os.path.dirname(sampling.LANGUAGES_PATH))
+    with open(sampling.LANGUAGES_PATH, "w", encoding="utf-8") as f:
+        json.dump({"acme": {"2020": "en"}, "14.basf_$42.93 b_industrials": {"2020": "de"}}, f)
+    load_registry.cache_clear()
+    yield
+    load_registry.cache_clear()
+
+
+def test_resplit_after_registration_uses_the_current_splits(corpus):
+    write_splits("acme", "2020", 3)
+    registry = Registry()
+    registry.update(sampling.TEXTS_DIR)
+    registry.save()
+    os.utime(REGISTRY_PATH, (0, 0))  # splits.json is rewritten after the registry was saved
+    write_splits("acme", "2020", 5)
+
+    sample = sampling.draw_sample(min_per_stratum=10, with_tokens=False, with_scores=False)
+    assert sample["N"].tolist() == [5] * 5
+    assert sample["sentence_id"].tolist() == [0, 1, 2, 3, 4]
+
+
+def test_labelled_sentence_is_sampled_as_classified(corpus):
+    company = "14.basf_$42.93 b_industrials"
+    write_splits(company, "2020", 3)
+    with Watermarks() as wm:
+        store = AggregateStore(wm.conn)
+        store.upsert([{"custom_id": f"task-1-{company}-2020", "assistant_content": "[3, True, Positive]"},
+                      {"custom_id": f"task-2-{company}-2020", "assistant_content": "[4, False, Negative]"}])
+        wm.conn.commit()
+
+    sample = sampling.draw_sample(with_tokens=False, with_scores=False)
+    assert sample["sentence_id"].tolist() == [0, 1, 2]
+    assert sample["classified"].tolist() == [0, 1, 1]
+    assert sample["ai"].tolist() == [0, 1, 0]
+    assert sample["positive"].tolist() == [0, 1, 0]
@@ -0,0 +1,39 @@
+import json
+import os
+
+from src.classification import sharding
+from src.classification.sharding import ShardWriter, load_manifest
+
+
+class _WordEncoding:
+    def encode(self, text):
+        return text.split()
+
+
+def _request(i):
+    return {"custom_id": f"task-{i}", "body": {"messages": [{"role": "user", "content": f"sentence {i}"}]}}
+
+
+def _write(out_dir, n):
+    with ShardWriter(out_dir, model="test", max_requests=2) as writer:
+        for i in range(n):
+            writer.write(_request(i))
+
+
+def test_rerun_removes_shards_of_a_larger_run(tmp_path, monkeypatch):
+    monkeypatch.setattr(sharding, "get_encoding", lambda model: _WordEncoding())
+    out_dir = str(tmp_path)
+    (tmp_path / "notes.txt").write_text("kept")
+
+    _write(out_dir, 6)
+    assert sorted(load_manifest(out_dir)) == ["batch_0.jsonl", "batch_1.jsonl", "batch_2.jsonl"]
+
+    _write(out_dir, 3)
+    shards = sorted(f for f in os.listdir(out_dir) if f.endswith(".jsonl"))
+    assert shards == sorted(load_manifest(out_dir)) == ["batch_0.jsonl", "batch_1.jsonl"]
+    assert (tmp_path / "notes.txt").exists()
+
+    _write(out_dir, 0)
+    assert not [f for f in os.listdir(out_dir) if f.endswith(".jsonl")]
+    with open(os.path.join(out_dir, sharding.MANIFEST_NAME)) as f:
+        assert json.load(f) == {"shards": []}
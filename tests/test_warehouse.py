@@ -0,0 +1,30 @@
+import os
+
+from src.analysis import warehouse
+
+SDG_HEADER = ",".join(f"sdg_{i}" for i in range(1, 18))
+
+
+def write_scores(company, year, header, rows):
+    path = os.path.join(warehouse.SCORES_DIR, company, year)
+    os.makedirs(path, exist_ok=True)
+    with open(os.path.join(path, "similarity_scores.csv"), "w", encoding="utf-8") as f:
+        f.write(",".join(["sentence_id", SDG_HEADER] + header) + "\n")
+        for sid, sdg, ai in rows:
+            f.write(",".join([str(sid)] + [str(sdg)] * 17 + [str(v) for v in ai]) + "\n")
+
+
+def test_ai_hits_count_the_same_terms_for_german_reports(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    english = sorted(warehouse.AI_TERMS)
+    german = sorted(warehouse.AI_TERMS + ["Künstliche Intelligenz", "Maschinelles Lernen"])
+    write_scores("acme", "2020", english, [(0, 0.1, [0.9] + [0.1] * 5), (1, 0.6, [0.1] * 6)])
+    hits = ("Artificial Intelligence", "Künstliche Intelligenz", "Maschinelles Lernen")
+    write_scores("beta", "2020", german, [(0, 0.1, [0.9 if t in hits else 0.1 for t in german]),
+                                          (1, 0.6, [0.1] * 8)])
+    warehouse.build_scores()
+
+    df = warehouse.embedding_scores(warehouse.connect(), 0.5)
+    assert df["Company"].tolist() == ["acme", "beta"]
+    assert df["AI_Hits"].tolist() == [1, 1]
+    assert df["sdg_1"].tolist() == [1, 1]